@@ -0,0 +1,168 @@
+# mofcom_json_bench.py
+# 说明：
+# - 商务部价格接口响应的 JSON 解码基准：对比原来的 json.loads(response.text)（先把整个 body
+#   解码成 str 再用标准库解析）与 jiaomei.fast_json 的几条路径（直接解析 body 字节：
+#   标准库 / orjson / msgspec 结构体），以及加上 normalize_row() 后整个回调解析阶段的耗时。
+# - 载荷：--payload 指定录制下来的 priceQueryList 响应（文件或目录下的 *.json，例如在
+#   `scrapy shell` 里把 response.body 写到文件）；不指定时按 --page-sizes 生成同形的合成页。
+# - 每次迭代都新建 TextResponse（response.text 会被缓存），只计解码与归一化本身的时间。
+#
+# 用法：
+#   python benchmarks/mofcom_json_bench.py --page-sizes 15,200,500 --repeat 2000
+#   python benchmarks/mofcom_json_bench.py --payload recorded/ --json json_bench.json
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scrapy.http import TextResponse  # noqa: E402
+
+from jiaomei import fast_json  # noqa: E402
+from jiaomei.spiders.mofcom_base import API_ROOT, PRICE_QUERY_LIST, normalize_row  # noqa: E402
+
+
+_REGIONS = ("山西", "河北", "内蒙古", "山东", "河南", "辽宁", "唐山", "天津港")
+_UNITS = ("元/吨", "元/千克")
+
+
+def synthetic_payload(rows: int, page: int = 1, seed: int = 0) -> bytes:
+    """A priceQueryList-shaped page, including fields the spiders never read."""
+    rnd = random.Random(seed + rows * 1000 + page)
+    records = []
+    for i in range(rows):
+        records.append({
+            "seqno": 387,
+            "prod_name": "动力煤",
+            "prod_spec": f"Q{5000 + 500 * (i % 3)}",
+            "region": rnd.choice(_REGIONS),
+            "unit": rnd.choice(_UNITS),
+            "price": f"{rnd.uniform(600, 1500):,.2f}",
+            "yyyy": "2024",
+            "mm": str(1 + i % 12),
+            "dd": str(1 + i % 28),
+            "prod_id": 10_000 + i,
+            "price_type": "出厂价",
+            "market_name": f"{rnd.choice(_REGIONS)}煤炭交易市场",
+            "remark": "",
+        })
+    total = rows * 40
+    body = {
+        "rows": records,
+        "pageNumber": page,
+        "pageSize": rows,
+        "maxPageNum": 40,
+        "nextPage": page + 1,
+        "total": total,
+    }
+    return json.dumps(body, ensure_ascii=False).encode("utf-8")
+
+
+def load_payloads(paths: Sequence[str], page_sizes: Sequence[int]) -> List[Tuple[str, bytes]]:
+    if not paths:
+        return [(f"synthetic-{n}", synthetic_payload(n)) for n in page_sizes]
+    payloads = []
+    for raw in paths:
+        path = Path(raw)
+        files = sorted(path.glob("*.json")) if path.is_dir() else [path]
+        payloads.extend((f.name, f.read_bytes()) for f in files)
+    return payloads
+
+
+def _rows_of(data: Any) -> List[Any]:
+    return data.get("rows") or []
+
+
+# 每条路径：解码函数（输入 TextResponse，输出带 .get() 的页对象）
+def _paths() -> Dict[str, Callable[[TextResponse], Any]]:
+    paths: Dict[str, Callable[[TextResponse], Any]] = {
+        "text+json": lambda r: json.loads(r.text),
+        "body+json": lambda r: json.loads(r.body),
+    }
+    if fast_json.orjson is not None:
+        paths["body+orjson"] = lambda r: fast_json.orjson.loads(r.body)
+    if fast_json.msgspec is not None:
+        paths["msgspec-struct"] = lambda r: fast_json._page_decoder.decode(r.body)
+    paths["price_page"] = fast_json.price_page
+    return paths
+
+
+def run_path(decode: Callable[[TextResponse], Any], body: bytes, repeat: int, normalize: bool) -> float:
+    url = API_ROOT + PRICE_QUERY_LIST
+    headers = {"Content-Type": "application/json;charset=UTF-8"}
+    elapsed = 0.0
+    for _ in range(repeat):
+        response = TextResponse(url, body=body, headers=headers)
+        start = time.perf_counter()
+        data = decode(response)
+        if normalize:
+            for row in _rows_of(data):
+                normalize_row(row)
+        elapsed += time.perf_counter() - start
+    return elapsed / repeat
+
+
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark JSON decoding of mofcom price API responses")
+    parser.add_argument("--payload", action="append", default=[], help="recorded response body (file or directory of *.json); repeatable")
+    parser.add_argument("--page-sizes", default="15,200,500", help="rows per synthetic page when no --payload is given")
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument("--json", dest="json_path", help="also write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    page_sizes = [int(n) for n in args.page_sizes.split(",") if n.strip()]
+    payloads = load_payloads(args.payload, page_sizes)
+    paths = _paths()
+
+    # 各路径结果须一致，否则基准没有意义
+    for name, body in payloads:
+        sample = TextResponse(API_ROOT, body=body, headers={"Content-Type": "application/json;charset=UTF-8"})
+        expected = [normalize_row(r) for r in _rows_of(json.loads(sample.text))]
+        for path_name, decode in paths.items():
+            got = [normalize_row(r) for r in _rows_of(decode(sample))]
+            if got != expected:
+                print(f"  ! {path_name} differs from text+json on {name}", file=sys.stderr)
+                return 1
+
+    print(f"backend={fast_json.JSON_BACKEND} repeat={args.repeat}")
+    header = f"{'payload':<22}{'rows':>6}{'KB':>8}{'path':>16}{'decode us':>12}{'+normalize us':>15}{'speedup':>9}"
+    print(header)
+    print("-" * len(header))
+    results = []
+    for name, body in payloads:
+        rows = len(_rows_of(json.loads(body)))
+        baseline = None
+        for path_name, decode in paths.items():
+            decode_s = run_path(decode, body, args.repeat, normalize=False)
+            total_s = run_path(decode, body, args.repeat, normalize=True)
+            if baseline is None:
+                baseline = total_s
+            result = {
+                "payload": name,
+                "rows": rows,
+                "bytes": len(body),
+                "path": path_name,
+                "decode_us": round(decode_s * 1e6, 2),
+                "decode_normalize_us": round(total_s * 1e6, 2),
+                "speedup": round(baseline / total_s, 2) if total_s else None,
+            }
+            results.append(result)
+            print(
+                f"{name:<22}{rows:>6}{len(body) / 1024:>8.1f}{path_name:>16}"
+                f"{result['decode_us']:>12.1f}{result['decode_normalize_us']:>15.1f}{result['speedup']:>8.2f}x"
+            )
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
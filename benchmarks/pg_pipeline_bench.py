@@ -0,0 +1,352 @@
+# pg_pipeline_bench.py
+# 说明：
+# - PostgresPipeline 写入基准：用与真实 spider 同形的合成 item（中文键经 IRON_ORE_PG_FIELD_MAP
+#   映射；乘用车数据按 CAR_FIELD_MAP 并以 `_pg_table` 分表）驱动管道，对比
+#   VALUES（默认多行 INSERT）/ COPY（pg_spool.copy_rows）/ pipeline 模式，在不同批量大小、
+#   有无 upsert 键、不同列数下的 rows/s、每行 CPU 时间与峰值内存（tracemalloc）。
+# - 数据库：--dsn 或环境变量 PG_BENCH_DSN；都未设置时用 PATH（或 --pg-bin）中的 initdb/pg_ctl
+#   在临时目录起一个一次性实例，结束后删除。不要指向生产库：每轮都会 DROP 基准表。
+#
+# 用法：
+#   python benchmarks/pg_pipeline_bench.py --rows 20000 --batch-sizes 1,50,500,5000
+#   python benchmarks/pg_pipeline_bench.py --dataset car --modes values,copy --upsert on --json bench.json
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import datetime as dt
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Sequence
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import psycopg  # noqa: E402
+from psycopg import sql  # noqa: E402
+
+from jiaomei.pg_pipeline import PostgresPipeline  # noqa: E402
+from jiaomei.pg_spool import copy_rows  # noqa: E402
+from jiaomei.spiders.car_total_market import CAR_FIELD_MAP, METRIC_LABELS  # noqa: E402
+from jiaomei.spiders.iron_ore_mofcom import IRON_ORE_PG_FIELD_MAP  # noqa: E402
+
+
+MODES = ("values", "copy", "pipeline")
+
+_BASE_DAY = dt.date(2015, 1, 1)
+
+
+class _Stats(dict):
+    """Minimal stand-in for Scrapy's stats collector."""
+
+    def inc_value(self, key, count=1, start=0):
+        self[key] = self.get(key, start) + count
+
+    def set_value(self, key, value):
+        self[key] = value
+
+
+class _BenchSpider:
+    def __init__(self, name: str, pg_pipeline: Dict[str, Any]) -> None:
+        self.name = name
+        self.pg_pipeline = pg_pipeline
+
+
+class _CopyPipeline(PostgresPipeline):
+    """PostgresPipeline that writes each prepared batch with COPY instead of INSERT ... VALUES."""
+
+    def _write_rows(self, conn, table, columns, rows, written=None, settled=None):
+        self._stat_inc("pg/statements")
+        try:
+            with conn.cursor() as cur:
+                copy_rows(cur, self.schema, table, columns, rows, upsert_keys=self.upsert_keys)
+            conn.commit()
+        except psycopg.Error:
+            if conn.broken:
+                raise
+            # 坏行交给 INSERT 路径二分定位
+            conn.rollback()
+            super()._write_rows(conn, table, columns, rows, written, settled)
+            return
+        self._record_written(table, len(rows))
+        if written is not None:
+            written.extend(rows)
+        if settled is not None:
+            settled.extend(rows)
+
+
+# ---------- Synthetic datasets ----------
+
+class Dataset:
+    name = ""
+    upsert_keys: Sequence[str] = ()
+
+    def __init__(self, extra_columns: int) -> None:
+        self.extra = [f"指标{k}" for k in range(extra_columns)]
+
+    def tables(self) -> Dict[str, List[tuple]]:
+        """Table name -> [(column, type)] in the shape the real spider writes."""
+        raise NotImplementedError
+
+    def items(self, n: int) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def pg_pipeline(self, upsert: bool) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class IronOreDataset(Dataset):
+    name = "iron_ore"
+    upsert_keys = ("prod_name", "date")
+    table = "bench_iron_ore_price"
+
+    def tables(self):
+        cols = [
+            ("prod_name", "TEXT"), ("date", "DATE"), ("unit", "TEXT"), ("price", "NUMERIC"),
+            ("datasourcelink", "TEXT"), ("source", "TEXT"),
+        ]
+        return {self.table: cols + [(c, "NUMERIC") for c in self.extra]}
+
+    def items(self, n):
+        out = []
+        for i in range(n):
+            item = {
+                "商品名称": f"铁矿石(品种{i % 50:02d})",
+                "交易时间": (_BASE_DAY + dt.timedelta(days=i // 50)).isoformat(),
+                "单位名称": "元/吨",
+                "价格": f"{800 + (i * 37) % 900:,}.50",
+                "详情链接": f"https://price.mofcom.gov.cn/price_2021/pricequotation/detail.shtml?id={i}",
+            }
+            for k, col in enumerate(self.extra):
+                item[col] = f"{(i * (k + 3)) % 10_000:,}.25"
+            out.append(item)
+        return out
+
+    def pg_pipeline(self, upsert):
+        return {
+            "pg_table": self.table,
+            "pg_field_map": IRON_ORE_PG_FIELD_MAP,
+            "pg_static_fields": {"source": "iron_ore_api"},
+            "pg_upsert_keys": list(self.upsert_keys) if upsert else [],
+        }
+
+
+class CarDataset(Dataset):
+    name = "car"
+    upsert_keys = ("vehicle_scope", "date")
+
+    def tables(self):
+        cols = [
+            ("category", "TEXT"), ("vehicle_scope", "TEXT"), ("scope_index", "INTEGER"),
+            ("metric", "TEXT"), ("metric_cn", "TEXT"), ("year", "TEXT"), ("month_label", "TEXT"),
+            ("price", "DOUBLE PRECISION"), ("date", "DATE"), ("datasourcelink", "TEXT"),
+            ("created", "TIMESTAMPTZ"), ("updated", "TIMESTAMPTZ"),
+        ]
+        cols += [(c, "NUMERIC") for c in self.extra]
+        return {f"bench_car_{metric}": cols for _, metric in METRIC_LABELS}
+
+    def items(self, n):
+        now = dt.datetime.now(dt.timezone.utc)
+        out = []
+        for i in range(n):
+            cn_label, metric = METRIC_LABELS[i % len(METRIC_LABELS)]
+            seq = i // len(METRIC_LABELS)
+            scope = ("狭义乘用车", "广义乘用车")[seq % 2]
+            day = _BASE_DAY + dt.timedelta(days=seq // 2)
+            item = {
+                "category": "乘用车",
+                "vehicle_scope": scope,
+                "scope_index": 0,
+                "metric": metric,
+                "metric_cn": cn_label,
+                "year": str(day.year),
+                "month_label": f"{day.month}月",
+                "price": float(100 + (i * 13) % 500),
+                "date": day.isoformat(),
+                "datasourcelink": f"http://data.cpcadata.com/api/chartlist?charttype=1&type={i % 4 + 1}",
+                "created": now,
+                "updated": now,
+                "_origin": "bench",
+                "_pg_table": f"bench_car_{metric}",
+            }
+            for k, col in enumerate(self.extra):
+                item[col] = f"{(i * (k + 3)) % 10_000:,}.25"
+            out.append(item)
+        return out
+
+    def pg_pipeline(self, upsert):
+        return {
+            "pg_field_map": CAR_FIELD_MAP,
+            "pg_upsert_keys": list(self.upsert_keys) if upsert else [],
+        }
+
+
+DATASETS = {"iron_ore": IronOreDataset, "car": CarDataset}
+
+
+# ---------- Throwaway PostgreSQL ----------
+
+@contextlib.contextmanager
+def local_postgres(pg_bin: str = None) -> Iterator[str]:
+    """initdb + pg_ctl a temporary cluster listening on a Unix socket only; yields its DSN."""
+    initdb = shutil.which("initdb", path=pg_bin)
+    pg_ctl = shutil.which("pg_ctl", path=pg_bin)
+    if not initdb or not pg_ctl:
+        raise SystemExit("initdb/pg_ctl not found: pass --dsn, set PG_BENCH_DSN or --pg-bin")
+    root = Path(tempfile.mkdtemp(prefix="pg_bench_"))
+    data = root / "data"
+    try:
+        init = subprocess.run(
+            [initdb, "-D", str(data), "-U", "postgres", "--auth=trust", "-E", "UTF8", "--no-sync"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+        if init.returncode:
+            # 常见原因：以 root 运行时 initdb 拒绝初始化，此时请改用 --dsn
+            raise SystemExit(f"initdb failed: {init.stderr.strip()}")
+        subprocess.run(
+            [pg_ctl, "-D", str(data), "-l", str(root / "postgres.log"), "-w", "start",
+             "-o", f"-k {root} -c listen_addresses=''"],
+            check=True, stdout=subprocess.DEVNULL,
+        )
+        try:
+            yield f"host={root} dbname=postgres user=postgres"
+        finally:
+            subprocess.run([pg_ctl, "-D", str(data), "-m", "fast", "-w", "stop"], stdout=subprocess.DEVNULL)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def reset_tables(dsn: str, dataset: Dataset, upsert: bool) -> None:
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        for table, cols in dataset.tables().items():
+            conn.execute(sql.SQL("DROP TABLE IF EXISTS {} CASCADE").format(sql.Identifier(table)))
+            conn.execute(
+                sql.SQL("CREATE TABLE {} ({})").format(
+                    sql.Identifier(table),
+                    sql.SQL(", ").join(sql.SQL("{} " + t).format(sql.Identifier(c)) for c, t in cols),
+                )
+            )
+            if upsert:
+                conn.execute(
+                    sql.SQL("CREATE UNIQUE INDEX ON {} ({})").format(
+                        sql.Identifier(table),
+                        sql.SQL(", ").join(sql.Identifier(k) for k in dataset.upsert_keys),
+                    )
+                )
+
+
+# ---------- Runs ----------
+
+def run_once(dsn: str, dataset: Dataset, items: List[Dict[str, Any]], mode: str, batch_size: int,
+             upsert: bool, writers: int, measure_memory: bool) -> Dict[str, Any]:
+    reset_tables(dsn, dataset, upsert)
+    stats = _Stats()
+    cls = _CopyPipeline if mode == "copy" else PostgresPipeline
+    pipeline = cls(
+        dsn=dsn,
+        batch_size=batch_size,
+        use_existing_table=True,
+        pipeline_mode=mode == "pipeline",
+        max_writers=writers,
+        stats_interval=0,
+        stats=stats,
+    )
+    spider = _BenchSpider(f"bench_{dataset.name}", dataset.pg_pipeline(upsert))
+
+    if measure_memory:
+        tracemalloc.start()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    pipeline.open_spider(spider)
+    for item in items:
+        # 管道会弹出 `_pg_table`，每轮使用副本
+        pipeline.process_item(dict(item), spider)
+    pipeline.close_spider(spider)
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+    peak = None
+    if measure_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    written = stats.get("pg/rows_written", 0)
+    if written != len(items):
+        print(f"  ! {mode} batch={batch_size}: wrote {written}/{len(items)} rows", file=sys.stderr)
+    return {
+        "dataset": dataset.name,
+        "mode": mode,
+        "batch_size": batch_size,
+        "upsert": upsert,
+        "columns": len(next(iter(dataset.tables().values()))),
+        "rows": len(items),
+        "seconds": round(wall, 4),
+        "rows_per_sec": round(len(items) / wall, 1) if wall else None,
+        "cpu_us_per_row": round(cpu / len(items) * 1e6, 2),
+        "peak_mem_mb": round(peak / 2**20, 2) if peak is not None else None,
+        "statements": stats.get("pg/statements", 0),
+    }
+
+
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark PostgresPipeline write paths")
+    parser.add_argument("--dsn", default=os.getenv("PG_BENCH_DSN"), help="PostgreSQL DSN (default: PG_BENCH_DSN or a throwaway local cluster)")
+    parser.add_argument("--pg-bin", help="directory containing initdb/pg_ctl for the throwaway cluster")
+    parser.add_argument("--dataset", choices=sorted(DATASETS), default="iron_ore")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--batch-sizes", default="1,50,500,5000")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--upsert", choices=("on", "off", "both"), default="both")
+    parser.add_argument("--extra-columns", type=int, default=0, help="add N numeric columns to every row")
+    parser.add_argument("--writers", type=int, default=1, help="PG_MAX_WRITERS for the pipeline")
+    parser.add_argument("--skip-memory", action="store_true", help="skip the separate tracemalloc pass")
+    parser.add_argument("--json", dest="json_path", help="also write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",") if b.strip()]
+    upserts = {"on": [True], "off": [False], "both": [False, True]}[args.upsert]
+
+    dataset = DATASETS[args.dataset](args.extra_columns)
+    items = dataset.items(args.rows)
+
+    with contextlib.ExitStack() as stack:
+        dsn = args.dsn or stack.enter_context(local_postgres(args.pg_bin))
+        results = []
+        header = f"{'mode':<9}{'batch':>7}{'upsert':>8}{'cols':>6}{'rows/s':>12}{'cpu us/row':>12}{'peak MB':>10}{'stmts':>8}"
+        print(f"dataset={dataset.name} rows={args.rows} writers={args.writers}")
+        print(header)
+        print("-" * len(header))
+        for upsert in upserts:
+            for mode in modes:
+                for batch_size in batch_sizes:
+                    result = run_once(dsn, dataset, items, mode, batch_size, upsert, args.writers, False)
+                    if not args.skip_memory:
+                        # 单独一轮测峰值内存，避免 tracemalloc 的开销影响吞吐数字
+                        result["peak_mem_mb"] = run_once(
+                            dsn, dataset, items, mode, batch_size, upsert, args.writers, True,
+                        )["peak_mem_mb"]
+                    results.append(result)
+                    print(
+                        f"{mode:<9}{batch_size:>7}{'on' if upsert else 'off':>8}{result['columns']:>6}"
+                        f"{result['rows_per_sec']:>12,.0f}{result['cpu_us_per_row']:>12.1f}"
+                        f"{result['peak_mem_mb'] if result['peak_mem_mb'] is not None else '-':>10}"
+                        f"{result['statements']:>8}"
+                    )
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
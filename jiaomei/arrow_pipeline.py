@@ -0,0 +1,273 @@
+# arrow_pipeline.py
+# 说明：
+# - 与 PostgresPipeline 并列的列式导出管道：按 `_pg_table` / pg_table 路由，沿用 spider 的
+#   pg_field_map / pg_static_fields，把 item 追加到按列类型转换后的列缓冲区。
+# - 输出 Hive 风格分区的 Parquet：<ARROW_OUTPUT_DIR>/<表名>/year=2025/part-*.parquet，
+#   每 ARROW_ROW_GROUP_SIZE 行写一个 row group，pandas / pyarrow.dataset 可直接向量化读取。
+# - 依赖 pyarrow（可选）；未安装时管道以 NotConfigured 跳过，不影响其他管道。
+# - 每张表只有一个 schema（按各列首次推断的类型），同一张表的所有文件列类型一致，缺失的列写 null；
+#   seqno 等编号列固定为字符串；`_page`、`_source` 等以下划线开头的内部字段不导出。
+# - 需放在 PostgresPipeline 之前（例如 290），因为后者会从 dict item 中弹出 `_pg_table`。
+
+from __future__ import annotations
+
+import datetime as dt
+import itertools
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from scrapy.exceptions import NotConfigured
+
+from jiaomei.pg_pipeline import converter_for_type, infer_value_type, is_id_column, spider_pg_config
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # 可选依赖
+    pa = None
+    pq = None
+
+
+logger = logging.getLogger(__name__)
+
+# pyarrow.dataset 对 Hive 分区中空值使用的目录名
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+_part_ids = itertools.count(1)
+
+
+def _arrow_type(data_type: str):
+    return {
+        "boolean": pa.bool_(),
+        "bigint": pa.int64(),
+        "double precision": pa.float64(),
+        "date": pa.date32(),
+        "timestamp": pa.timestamp("us"),
+    }.get(data_type, pa.string())
+
+
+def _to_json_text(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+class _Partition:
+    """Column buffers and the open Parquet file of one ``table/year=YYYY`` directory."""
+
+    __slots__ = ("directory", "columns", "rows", "writer", "schema", "path")
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.columns: Dict[str, List[Any]] = {}
+        self.rows = 0
+        self.writer = None
+        self.schema = None
+        self.path: Optional[Path] = None
+
+    def append(self, row: Dict[str, Any]) -> None:
+        n = self.rows
+        for col, value in row.items():
+            values = self.columns.get(col)
+            if values is None:
+                values = self.columns[col] = [None] * n
+            values.append(value)
+        self.rows = n + 1
+        for values in self.columns.values():
+            if len(values) == n:
+                values.append(None)
+
+
+class _ArrowTable:
+    __slots__ = ("name", "types", "schema", "converters", "partitions", "warned")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.types: Dict[str, str] = {}
+        # 由 types 生成，出现新列时重建
+        self.schema = None
+        self.converters: Dict[str, Callable[[Any], Any]] = {}
+        self.partitions: Dict[str, _Partition] = {}
+        self.warned: set[str] = set()
+
+
+class ArrowPipeline:
+    """
+    Scrapy item pipeline writing items as partitioned Parquet.
+
+    Routing and projection follow PostgresPipeline: the target table is
+    ``item["_pg_table"]``, else the spider's ``pg_table``, else its name;
+    ``pg_field_map`` renames fields and ``pg_static_fields`` adds constants.
+    Column types are inferred from the first non-empty value of each column
+    (numeric and date strings are parsed) unless ARROW_COLUMN_TYPES or the
+    spider's ``arrow_column_types`` pins them; id-like columns (``seqno``,
+    ``*_id``, ...) stay strings. Values that cannot be converted are written
+    as null. Every file of a table shares the table's schema, with null
+    columns for fields a partition has not seen; item keys starting with
+    ``_`` are internal and not exported.
+    """
+
+    def __init__(
+        self,
+        output_dir: str = "outputs/parquet",
+        row_group_size: int = 50_000,
+        partition_column: str = "date",
+        compression: str = "zstd",
+        column_types: Optional[Dict[str, str]] = None,
+        stats=None,
+    ) -> None:
+        if pa is None:
+            raise NotConfigured("pyarrow is not installed")
+        self.output_dir = Path(output_dir)
+        self.row_group_size = max(1, row_group_size)
+        self.partition_column = partition_column
+        self.compression = compression
+        self.column_types = {k: v.lower() for k, v in (column_types or {}).items()}
+        self.stats = stats
+
+        self.table: Optional[str] = None
+        self.field_map: Dict[str, str] = {}
+        self.static_fields: Dict[str, Any] = {}
+        self._tables: Dict[str, _ArrowTable] = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = crawler.settings
+        return cls(
+            output_dir=s.get("ARROW_OUTPUT_DIR", "outputs/parquet"),
+            row_group_size=s.getint("ARROW_ROW_GROUP_SIZE", 50_000),
+            partition_column=s.get("ARROW_PARTITION_COLUMN", "date"),
+            compression=s.get("ARROW_COMPRESSION", "zstd"),
+            column_types=s.getdict("ARROW_COLUMN_TYPES", {}),
+            stats=crawler.stats,
+        )
+
+    # ---------- Scrapy lifecycle ----------
+
+    def open_spider(self, spider):
+        config = spider_pg_config(spider, ("pg_table", "pg_field_map", "pg_static_fields"))
+        self.table = config.get("pg_table")
+        self.field_map = dict(config.get("pg_field_map") or {})
+        self.static_fields = dict(config.get("pg_static_fields") or {})
+        pinned = getattr(spider, "arrow_column_types", None) or {}
+        self.column_types.update({k: v.lower() for k, v in pinned.items()})
+        self._tables = {}
+
+    def close_spider(self, spider):
+        for table in self._tables.values():
+            for part in table.partitions.values():
+                self._write_row_group(table, part)
+                self._close_file(part)
+
+    def process_item(self, item, spider):
+        data = dict(item)
+        table_name = data.get("_pg_table") or self.table or spider.name
+        table = self._tables.get(table_name)
+        if table is None:
+            table = self._tables[table_name] = _ArrowTable(table_name)
+
+        row: Dict[str, Any] = {}
+        for key, value in data.items():
+            if key.startswith("_"):
+                continue
+            col = self.field_map.get(key, key)
+            if col not in self.static_fields:
+                row[col] = value
+        row.update(self.static_fields)
+
+        for col, value in row.items():
+            row[col] = self._convert(table, col, value)
+
+        part_key = self._partition_key(row.get(self.partition_column))
+        part = table.partitions.get(part_key)
+        if part is None:
+            part = table.partitions[part_key] = _Partition(self.output_dir / table_name / f"year={part_key}")
+        part.append(row)
+        self._stat_inc("arrow/rows")
+        if part.rows >= self.row_group_size:
+            self._write_row_group(table, part)
+        return item
+
+    # ---------- Typed columns ----------
+
+    def _convert(self, table: _ArrowTable, col: str, value: Any) -> Any:
+        conv = table.converters.get(col)
+        if conv is None:
+            data_type = self.column_types.get(col) or ("text" if is_id_column(col) else infer_value_type(value))
+            if data_type is None:
+                # 空值无法推断类型，等待该列第一个非空值
+                return None
+            table.types[col] = data_type
+            table.schema = None
+            conv = table.converters[col] = _to_json_text if data_type in ("jsonb", "json", "text") \
+                else converter_for_type(data_type)
+        try:
+            return conv(value)
+        except (ValueError, TypeError, ArithmeticError) as e:
+            self._stat_inc("arrow/values_nulled")
+            if col not in table.warned:
+                table.warned.add(col)
+                logger.warning(
+                    "[Arrow] table=%s column=%s (%s): cannot convert %r (%s), writing null",
+                    table.name, col, table.types[col], value, e,
+                )
+            return None
+
+    @staticmethod
+    def _partition_key(value: Any) -> str:
+        if isinstance(value, (dt.date, dt.datetime)):
+            return f"{value.year:04d}"
+        return NULL_PARTITION
+
+    # ---------- Parquet output ----------
+
+    @staticmethod
+    def _table_schema(table: _ArrowTable):
+        # 尚未推断出类型的列目前全为空值，不写入
+        if table.schema is None:
+            table.schema = pa.schema([(c, _arrow_type(t)) for c, t in table.types.items()])
+        return table.schema
+
+    def _write_row_group(self, table: _ArrowTable, part: _Partition) -> None:
+        if not part.rows:
+            return
+        schema = self._table_schema(table)
+        if part.writer is not None and part.schema is not schema:
+            # 表上出现新列：当前文件的 schema 已固定，换一个新文件继续写
+            self._close_file(part)
+        if part.writer is None:
+            part.schema = schema
+            part.directory.mkdir(parents=True, exist_ok=True)
+            stamp = dt.datetime.now().strftime("%Y%m%dT%H%M%S")
+            part.path = part.directory / f"part-{stamp}-{os.getpid()}-{next(_part_ids):04d}.parquet"
+            # 以 "." 开头的文件会被 pyarrow.dataset 忽略，关闭后才改为正式文件名
+            part.writer = pq.ParquetWriter(
+                str(part.directory / ("." + part.path.name)), part.schema, compression=self.compression,
+            )
+
+        arrays = []
+        for field in part.schema:
+            values = part.columns.get(field.name) or [None] * part.rows
+            arrays.append(pa.array(values, type=field.type))
+        part.writer.write_table(pa.Table.from_arrays(arrays, schema=part.schema), row_group_size=part.rows)
+        self._stat_inc("arrow/row_groups")
+
+        part.columns = {}
+        part.rows = 0
+
+    def _close_file(self, part: _Partition) -> None:
+        if part.writer is None:
+            return
+        part.writer.close()
+        os.replace(part.directory / ("." + part.path.name), part.path)
+        self._stat_inc("arrow/files")
+        logger.info("[Arrow] wrote %s", part.path)
+        part.writer = None
+        part.schema = None
+
+    def _stat_inc(self, key: str, count: int = 1) -> None:
+        if self.stats is not None:
+            self.stats.inc_value(key, count)
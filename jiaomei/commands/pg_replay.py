@@ -0,0 +1,253 @@
+# pg_replay.py
+# 说明：
+# - `scrapy pg_replay`：把 PostgresPipeline 在数据库不可达时写下的 spool 分段文件
+#   用 COPY 批量回灌到 PostgreSQL，每个分段一个事务。
+# - 离线时落盘的行可能未经类型转换（如 "1,000"），回灌前按目标表的列类型逐列转换；
+#   转换失败或被 PG 拒绝的行（COPY 失败时二分定位）写入死信（PG_DEAD_LETTER_TABLE /
+#   PG_DEAD_LETTER_PATH），其余行照常回灌。
+# - 成功的分段默认删除（--keep 时改名为 *.done）；连接中断等失败的分段回滚并原样保留，可重复执行。
+
+from __future__ import annotations
+
+import datetime as dt
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import psycopg
+from psycopg import sql
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+
+from jiaomei.pg_pipeline import (
+    converter_for_type,
+    dead_letter_record,
+    dsn_from_settings,
+    insert_dead_letter,
+    partition_bounds,
+    partition_ddl,
+)
+from jiaomei.pg_spool import copy_rows, iter_segments, read_segment
+
+
+logger = logging.getLogger(__name__)
+
+_TABLE_INFO_SQL = """
+    SELECT c.relkind, a.attname, format_type(a.atttypid, NULL)
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    WHERE n.nspname = coalesce(%s, current_schema()) AND c.relname = %s
+"""
+
+
+def _as_date(value: Any) -> Optional[dt.date]:
+    if isinstance(value, dt.datetime):
+        return value.date()
+    if isinstance(value, dt.date):
+        return value
+    if isinstance(value, str) and len(value) >= 10:
+        try:
+            return dt.date.fromisoformat(value[:10])
+        except ValueError:
+            return None
+    return None
+
+
+class _Replayer:
+    """
+    Load spool records into PostgreSQL, pruning columns the table no longer
+    has and converting values to the table's column types. Rows that cannot
+    be converted or that PostgreSQL rejects go to the dead-letter sink.
+    """
+
+    def __init__(
+        self,
+        conn: psycopg.Connection,
+        dead_letter_table: Optional[str] = None,
+        dead_letter_path: Optional[str] = None,
+    ) -> None:
+        self.conn = conn
+        self.dead_letter_table = dead_letter_table
+        self.dead_letter_path = dead_letter_path
+        self.dead_lettered = 0
+        self._tables: Dict[tuple, tuple] = {}
+        self._dead_letter_ready = False
+        # 死信文件只在分段提交后追加，回滚的分段下次重放时重新判定
+        self._pending_file: List[Dict[str, Any]] = []
+
+    def _table_info(self, cur, schema: Optional[str], table: str) -> tuple:
+        key = (schema, table)
+        info = self._tables.get(key)
+        if info is None:
+            cur.execute(_TABLE_INFO_SQL, (schema, table))
+            rows = cur.fetchall()
+            if not rows:
+                raise RuntimeError(f"table {schema or 'public'}.{table} does not exist; run the spider once with PostgreSQL up")
+            info = self._tables[key] = (rows[0][0] == "p", {r[1]: r[2] for r in rows})
+        return info
+
+    def _convert(self, schema: Optional[str], table: str, types: Dict[str, str], columns: Sequence[str], rows) -> list:
+        convs = [(c, converter_for_type(types.get(c))) for c in columns]
+        out = []
+        for row in rows:
+            converted = []
+            for (column, conv), v in zip(convs, row):
+                try:
+                    converted.append(conv(v))
+                except (ValueError, TypeError, ArithmeticError):
+                    message = f"cannot convert column {column!r} ({types.get(column)}): {v!r}"
+                    self._dead_letter(schema, table, columns, row, ValueError(message))
+                    break
+            else:
+                out.append(converted)
+        return out
+
+    def _copy(self, cur, schema: Optional[str], table: str, columns: Sequence[str], rows, upsert_keys) -> int:
+        """COPY ``rows`` under a savepoint; on failure bisect down to the rejected rows."""
+        try:
+            with self.conn.transaction():
+                return copy_rows(cur, schema, table, columns, rows, upsert_keys=upsert_keys)
+        except psycopg.Error as e:
+            if self.conn.broken or isinstance(e, psycopg.errors.QueryCanceled):
+                raise
+            if len(rows) == 1:
+                self._dead_letter(schema, table, columns, rows[0], e)
+                return 0
+            logger.warning(
+                "[PG][Replay] %s: COPY of %s rows failed (%s: %s); bisecting",
+                table, len(rows), type(e).__name__, str(e).strip(),
+            )
+            mid = len(rows) // 2
+            return (self._copy(cur, schema, table, columns, rows[:mid], upsert_keys)
+                    + self._copy(cur, schema, table, columns, rows[mid:], upsert_keys))
+
+    def _dead_letter(self, schema: Optional[str], table: str, columns: Sequence[str], row, error: Exception) -> None:
+        record = dead_letter_record(schema, table, columns, row, error)
+        self.dead_lettered += 1
+        logger.error(
+            "[PG][BadRow] table=%s pgcode=%s error=%s row=%s",
+            record["table"], record["pgcode"], record["error"], record["row"],
+        )
+        if self.dead_letter_table:
+            # 与回灌数据同一事务：分段回滚时死信也一并撤销
+            tbl = sql.Identifier(*filter(None, (schema, self.dead_letter_table)))
+            insert_dead_letter(self.conn, tbl, record, create=not self._dead_letter_ready)
+            self._dead_letter_ready = True
+        elif self.dead_letter_path:
+            self._pending_file.append(record)
+
+    def commit(self) -> None:
+        self.conn.commit()
+        if self._pending_file:
+            path = Path(self.dead_letter_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            failed_at = dt.datetime.now(dt.timezone.utc).isoformat()
+            with path.open("a", encoding="utf-8") as f:
+                for record in self._pending_file:
+                    f.write(json.dumps(dict(record, failed_at=failed_at), ensure_ascii=False, default=str) + "\n")
+        self._pending_file = []
+
+    def rollback(self) -> None:
+        self.conn.rollback()
+        self._pending_file = []
+        # 回滚可能撤销了死信表的建表语句
+        self._dead_letter_ready = False
+
+    def _ensure_partitions(self, cur, record: Dict[str, Any], columns: Sequence[str], rows) -> None:
+        try:
+            idx = list(columns).index(record["partition_column"])
+        except ValueError:
+            return
+        bounds = set()
+        for row in rows:
+            day = _as_date(row[idx])
+            if day is not None:
+                bounds.add(partition_bounds(day, record["partition_by"]))
+        for start, end, suffix in sorted(bounds):
+            cur.execute(partition_ddl(record["schema"], record["table"], start, end, suffix))
+
+    def replay_segment(self, path) -> int:
+        total = 0
+        with self.conn.cursor() as cur:
+            for record in read_segment(path):
+                schema, table = record["schema"], record["table"]
+                partitioned, existing = self._table_info(cur, schema, table)
+
+                columns = record["columns"]
+                keep = [i for i, c in enumerate(columns) if c in existing]
+                if len(keep) < len(columns):
+                    dropped = [c for c in columns if c not in existing]
+                    logger.warning("[PG][Replay] %s: dropping unknown columns %s", table, dropped)
+                    columns = [columns[i] for i in keep]
+                    rows = [[r[i] for i in keep] for r in record["rows"]]
+                else:
+                    rows = record["rows"]
+                if not columns:
+                    continue
+                rows = self._convert(schema, table, existing, columns, rows)
+                if not rows:
+                    continue
+
+                if partitioned and record.get("partition_by"):
+                    self._ensure_partitions(cur, record, columns, rows)
+                upsert_keys = [k for k in record.get("upsert_keys") or [] if k in existing]
+                total += self._copy(cur, schema, table, columns, rows, upsert_keys or None)
+        return total
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    default_settings = {"LOG_ENABLED": True}
+
+    def syntax(self) -> str:
+        return "[options]"
+
+    def short_desc(self) -> str:
+        return "Load spooled PostgreSQL batches with COPY"
+
+    def add_options(self, parser) -> None:
+        super().add_options(parser)
+        parser.add_argument("--dir", dest="spool_dir", metavar="DIR", help="spool directory (default: PG_SPOOL_DIR)")
+        parser.add_argument("--dsn", dest="dsn", metavar="DSN", help="PostgreSQL DSN (default: PG_DSN / PG_* settings)")
+        parser.add_argument("--keep", action="store_true", help="rename replayed segments to *.done instead of deleting")
+
+    def run(self, args, opts) -> None:
+        if args:
+            raise UsageError()
+        spool_dir = opts.spool_dir or self.settings.get("PG_SPOOL_DIR", "outputs/pg_spool")
+        segments = iter_segments(spool_dir)
+        if not segments:
+            print(f"No spooled segments in {spool_dir}")
+            return
+
+        dsn = opts.dsn or dsn_from_settings(self.settings)
+        loaded = failed = 0
+        with psycopg.connect(dsn, autocommit=False) as conn:
+            replayer = _Replayer(
+                conn,
+                dead_letter_table=self.settings.get("PG_DEAD_LETTER_TABLE"),
+                dead_letter_path=self.settings.get("PG_DEAD_LETTER_PATH"),
+            )
+            for path in segments:
+                try:
+                    rows = replayer.replay_segment(path)
+                    replayer.commit()
+                except (psycopg.Error, RuntimeError, ValueError) as e:
+                    replayer.rollback()
+                    failed += 1
+                    logger.error("[PG][Replay] %s failed, kept for retry: %s: %s", path.name, type(e).__name__, e)
+                    continue
+                loaded += rows
+                if opts.keep:
+                    path.rename(path.with_name(path.name + ".done"))
+                else:
+                    path.unlink()
+                print(f"{path.name}: {rows} rows")
+
+        print(f"Replayed {loaded} rows from {len(segments) - failed}/{len(segments)} segments")
+        if replayer.dead_lettered:
+            print(f"{replayer.dead_lettered} rejected rows sent to the dead-letter sink")
+        if failed:
+            self.exitcode = 1
@@ -0,0 +1,218 @@
+# dedup_store.py
+# 说明：
+# - 跨运行的去重键存储：spider 内存里的 _seen 集合每次运行都从空开始，挡不住重复产出历史数据；
+#   这里把已产出的行键持久化到本地 SQLite 文件（DEDUP_STORE_PATH），重启后依然有效。
+# - 键先做 64 位摘要（blake2b）再入库，按命名空间（默认 spider 名）区分；同名的 spider 共享同一组键。
+# - 前置一个固定大小的 Bloom 过滤器（DEDUP_STORE_BLOOM_BITS），“肯定没见过”的键不查 SQLite；
+#   内存占用只取决于过滤器大小与写缓冲，不随键数量增长，百万级键也可用。
+# - 过滤器在关闭时连同键数一起存入 SQLite，打开时直接加载；尺寸配置变化或键数对不上（上次
+#   未正常关闭、其他进程写入）时按已存摘要重建。
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOOM_BITS = 1 << 24    # 2 MiB，约 100 万键时误判率 < 0.1%
+DEFAULT_BLOOM_HASHES = 7
+DEFAULT_FLUSH_EVERY = 5000
+
+_MASK64 = (1 << 64) - 1
+
+# 进程级注册表：同一进程内按 (路径, 命名空间) 共享同一个实例
+_STORES: Dict[Tuple[str, str], "DedupStore"] = {}
+
+
+def key_digest(key: Hashable) -> int:
+    """Signed 64-bit digest of ``key`` (a tuple of plain values), as stored in SQLite."""
+    digest = hashlib.blake2b(repr(key).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+class DedupStore:
+    """
+    Disk-backed set of row keys for one namespace, with an in-memory Bloom
+    filter in front of the SQLite lookup. ``add(key)`` returns False for keys
+    stored by this or any earlier run.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str,
+        bloom_bits: int = DEFAULT_BLOOM_BITS,
+        bloom_hashes: int = DEFAULT_BLOOM_HASHES,
+        flush_every: int = DEFAULT_FLUSH_EVERY,
+    ) -> None:
+        self.path = Path(path)
+        self.namespace = namespace
+        self.bloom_bits = max(8, int(bloom_bits))
+        self.bloom_hashes = max(1, int(bloom_hashes))
+        self.flush_every = max(1, int(flush_every))
+        self.added = 0
+        self._refs = 0
+        self._pending: Set[int] = set()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS dedup_keys ("
+            " ns TEXT NOT NULL, h INTEGER NOT NULL, PRIMARY KEY (ns, h)) WITHOUT ROWID"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS dedup_bloom ("
+            " ns TEXT PRIMARY KEY, bits INTEGER NOT NULL, hashes INTEGER NOT NULL,"
+            " keys INTEGER NOT NULL, filter BLOB NOT NULL)"
+        )
+        self.conn.commit()
+        self._bloom = self._load_bloom()
+
+    # ---------- Bloom filter ----------
+
+    def _positions(self, h: int) -> List[int]:
+        u = h & _MASK64
+        h1, h2 = u & 0xFFFFFFFF, (u >> 32) | 1
+        m = self.bloom_bits
+        return [(h1 + i * h2) % m for i in range(self.bloom_hashes)]
+
+    def _bloom_add(self, h: int) -> None:
+        bloom = self._bloom
+        for pos in self._positions(h):
+            bloom[pos >> 3] |= 1 << (pos & 7)
+
+    def _bloom_maybe(self, h: int) -> bool:
+        bloom = self._bloom
+        return all(bloom[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(h))
+
+    def _load_bloom(self) -> bytearray:
+        self._stored = self.conn.execute(
+            "SELECT count(*) FROM dedup_keys WHERE ns = ?", (self.namespace,)
+        ).fetchone()[0]
+        row = self.conn.execute(
+            "SELECT bits, hashes, keys, filter FROM dedup_bloom WHERE ns = ?", (self.namespace,)
+        ).fetchone()
+        if row and (row[0], row[1], row[2]) == (self.bloom_bits, self.bloom_hashes, self._stored):
+            return bytearray(row[3])
+        # 首次打开、尺寸变化或过滤器过期：按已存摘要重建
+        self._bloom = bytearray((self.bloom_bits + 7) // 8)
+        count = 0
+        for (h,) in self.conn.execute("SELECT h FROM dedup_keys WHERE ns = ?", (self.namespace,)):
+            self._bloom_add(h)
+            count += 1
+        if count:
+            logger.info("[DedupStore] %s: rebuilt bloom filter from %s stored keys", self.namespace, count)
+        return self._bloom
+
+    # ---------- Set operations ----------
+
+    def _contains_digest(self, h: int) -> bool:
+        if not self._bloom_maybe(h):
+            return False
+        if h in self._pending:
+            return True
+        return self.conn.execute(
+            "SELECT 1 FROM dedup_keys WHERE ns = ? AND h = ?", (self.namespace, h)
+        ).fetchone() is not None
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._contains_digest(key_digest(key))
+
+    def add(self, key: Hashable) -> bool:
+        """Record ``key``; return True if it was new."""
+        h = key_digest(key)
+        if self._contains_digest(h):
+            return False
+        self._bloom_add(h)
+        self._pending.add(h)
+        self.added += 1
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+        return True
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        cur = self.conn.executemany(
+            "INSERT OR IGNORE INTO dedup_keys (ns, h) VALUES (?, ?)",
+            [(self.namespace, h) for h in self._pending],
+        )
+        self._stored += cur.rowcount
+        self.conn.commit()
+        self._pending.clear()
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO dedup_bloom (ns, bits, hashes, keys, filter) VALUES (?, ?, ?, ?, ?)",
+            (self.namespace, self.bloom_bits, self.bloom_hashes, self._stored, bytes(self._bloom)),
+        )
+        self.conn.commit()
+        self.conn.close()
+
+
+def open_store(path: str, namespace: str, **kwargs: Any) -> DedupStore:
+    """Shared :class:`DedupStore` for ``(path, namespace)``; pair every call with :func:`release_store`."""
+    key = (str(Path(path).resolve()), namespace)
+    store = _STORES.get(key)
+    if store is None:
+        store = _STORES[key] = DedupStore(path, namespace, **kwargs)
+    store._refs += 1
+    return store
+
+
+def release_store(store: DedupStore) -> None:
+    store._refs -= 1
+    if store._refs > 0:
+        store.flush()
+        return
+    _STORES.pop((str(store.path.resolve()), store.namespace), None)
+    store.close()
+
+
+class PersistentDedupMixin:
+    """
+    Spider mixin: ``-a dedup_store=1`` enables the store under the spider's
+    name, ``-a dedup_store=<name>`` under a shared name. ``persistent_dedup()``
+    returns the store (None when disabled); stores are released on close.
+    """
+
+    dedup_store = None
+
+    def persistent_dedup(self, owner: Any = None) -> Optional[DedupStore]:
+        """The store for ``owner`` (default: this spider; a delegate spider gets its own namespace)."""
+        owner = owner if owner is not None else self
+        if "_persistent_dedup" in owner.__dict__:
+            return owner.__dict__["_persistent_dedup"]
+
+        value = str(getattr(self, "dedup_store", None) or "").strip()
+        store = None
+        if value and value.lower() not in ("0", "false", "no", "off"):
+            if value.lower() in ("1", "true", "yes", "on"):
+                namespace = owner.name
+            else:
+                namespace = value if owner is self else f"{value}/{owner.name}"
+            settings = getattr(self, "settings", None)
+            get = settings.get if settings is not None else (lambda name, default=None: default)
+            store = open_store(
+                get("DEDUP_STORE_PATH", "outputs/dedup_store.sqlite3"),
+                namespace,
+                bloom_bits=int(get("DEDUP_STORE_BLOOM_BITS", DEFAULT_BLOOM_BITS)),
+                bloom_hashes=int(get("DEDUP_STORE_BLOOM_HASHES", DEFAULT_BLOOM_HASHES)),
+            )
+            self.__dict__.setdefault("_opened_dedup_stores", []).append(store)
+            self.logger.info("[DedupStore] %s: using namespace %r in %s", owner.name, namespace, store.path)
+        owner.__dict__["_persistent_dedup"] = store
+        return store
+
+    def closed(self, reason):
+        for store in self.__dict__.pop("_opened_dedup_stores", []):
+            self.logger.info("[DedupStore] %s: %s new keys", store.namespace, store.added)
+            release_store(store)
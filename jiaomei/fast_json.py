@@ -0,0 +1,104 @@
+# fast_json.py
+# 说明：
+# - API 回调统一的 JSON 解码入口：直接解析 response.body 字节，不再先让 Scrapy 把整个响应
+#   解码成 str（response.text）再交给标准库 json。
+# - 解析器按可用性选择：orjson > msgspec > 标准库 json（均为可选依赖，未安装时自动退回）。
+#   body 不是合法 UTF-8（如 GBK 响应）时退回 response.text，行为与原来一致。
+# - price_page()：安装了 msgspec 时把商务部 priceQuery / priceQueryList 响应直接解码成
+#   PricePage / PriceRow 结构体（只解析用到的字段）；结构体提供 dict 式的 .get()，
+#   parse_page_info() / normalize_row() 等按 dict 写的代码无需改动。
+
+from __future__ import annotations
+
+import json
+from typing import Any, List, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # 可选依赖
+    msgspec = None
+
+
+if orjson is not None:
+    _loads = orjson.loads
+    JSON_BACKEND = "orjson"
+elif msgspec is not None:
+    _loads = msgspec.json.Decoder().decode
+    JSON_BACKEND = "msgspec"
+else:
+    _loads = json.loads
+    JSON_BACKEND = "json"
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """Parse JSON from bytes or str with the fastest available backend; raises ValueError on bad input."""
+    return _loads(data)
+
+
+def response_json(response) -> Any:
+    """Parse ``response.body`` directly, falling back to ``response.text`` for non-UTF-8 bodies."""
+    try:
+        return _loads(response.body)
+    except ValueError:
+        return _loads(response.text)
+
+
+if msgspec is not None:
+
+    class PriceRow(msgspec.Struct):
+        """One mofcom price row; only the fields the spiders read are decoded."""
+
+        yyyy: Any = None
+        mm: Any = None
+        dd: Any = None
+        price: Any = None
+        prod_name: Any = None
+        prod_spec: Any = None
+        unit: Any = None
+        region: Any = None
+        seqno: Any = None
+
+        def get(self, name: str, default: Any = None) -> Any:
+            value = getattr(self, name, None)
+            return default if value is None else value
+
+    class PricePage(msgspec.Struct):
+        """A priceQuery / priceQueryList response page."""
+
+        rows: Optional[List[PriceRow]] = None
+        pageNumber: Any = None
+        nextPage: Any = None
+        maxPageNum: Any = None
+        totalPages: Any = None
+        pages: Any = None
+
+        def get(self, name: str, default: Any = None) -> Any:
+            value = getattr(self, name, None)
+            return default if value is None else value
+
+    _page_decoder = msgspec.json.Decoder(PricePage)
+
+else:
+    PriceRow = None
+    PricePage = None
+    _page_decoder = None
+
+
+def price_page(response) -> Any:
+    """
+    Decode a mofcom price API response: a :class:`PricePage` with typed
+    rows when msgspec is installed, otherwise the plain dict from
+    :func:`response_json`. Both support ``.get()``.
+    """
+    if _page_decoder is None:
+        return response_json(response)
+    try:
+        return _page_decoder.decode(response.body)
+    except ValueError:
+        # 结构与预期不符（如 rows 不是对象数组）或非 UTF-8：退回普通 dict；确实不是 JSON 时照常抛出 ValueError
+        return response_json(response)
@@ -0,0 +1,141 @@
+# mofcom_catalog.py
+# 说明：
+# - 商务部价格品种目录的本地索引：品名 → seqno（以及单位、地区、规格），存为本地 JSON
+#   （MOFCOM_CATALOG_PATH），由 `scrapy crawl mofcom_catalog` 生成 / 刷新，带有效期
+#   （MOFCOM_CATALOG_TTL_DAYS）。
+# - 用途：开启 MOFCOM_CATALOG_RESOLVE 后，按品名检索的 spider（priceQuery，如 pro_name=铁矿石）在索引未过期时把品名解析成 seqno，
+#   改走按 seqno 查询的 priceQueryList 接口；索引缺失、过期或查不到该品名时照旧走检索接口。
+# - 品名按包含匹配（与站内检索的模糊匹配一致，pro_name=铁矿石 也会命中“铁矿石(进口)”）；
+#   pro_region 按该 seqno 出现过的地区过滤。
+# - 刷新时按 seqno 合并：新抓到的覆盖旧值，近期没有报价的旧条目保留。
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_TTL_DAYS = 7
+# 目录爬取默认扫描最近多少天的报价
+DEFAULT_CATALOG_DAYS = 30
+
+
+def _seqno_order(seqno: str):
+    return (0, int(seqno), "") if seqno.isdigit() else (1, 0, seqno)
+
+
+class CatalogIndex:
+    """
+    Local index of mofcom price series keyed by ``seqno``. Each entry holds
+    the latest ``prod_name`` / ``prod_spec`` / ``unit`` / ``region`` seen for
+    the series plus every region and spec it was quoted under; ``built`` is
+    the time of the last complete catalog crawl.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl_days: float = DEFAULT_CATALOG_TTL_DAYS) -> None:
+        self.path = Path(path) if path else None
+        self.ttl = max(0.0, float(ttl_days)) * 86400
+        self.built = 0
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning("[Catalog] ignoring unreadable index %s: %s", self.path, e)
+            return
+        if not isinstance(data, dict):
+            return
+        self.built = int(data.get("built") or 0)
+        entries = data.get("entries")
+        if isinstance(entries, dict):
+            self.entries = {str(k): v for k, v in entries.items() if isinstance(v, dict)}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def fresh(self) -> bool:
+        """True when the index has entries and its last full crawl is within the TTL."""
+        if not self.entries or not self.built:
+            return False
+        return not self.ttl or time.time() - self.built <= self.ttl
+
+    # ---------- Building ----------
+
+    def add(self, row: Dict[str, Any]) -> None:
+        """Record one normalized price row (see ``normalize_row``); rows without ``seqno`` are ignored."""
+        seqno = row.get("seqno")
+        if not seqno:
+            return
+        entry = self.entries.get(seqno)
+        if entry is None:
+            entry = self.entries[seqno] = {
+                "seqno": seqno, "prod_name": "", "prod_spec": "", "unit": "", "region": "",
+                "regions": [], "specs": [], "last_date": "",
+            }
+        date = row.get("date") or ""
+        # 规格 / 单位 / 地区以最近一天的报价为准
+        if date >= entry["last_date"] or not entry["prod_name"]:
+            for field in ("prod_name", "prod_spec", "unit", "region"):
+                if row.get(field):
+                    entry[field] = row[field]
+            entry["last_date"] = max(date, entry["last_date"])
+        if row.get("region") and row["region"] not in entry["regions"]:
+            entry["regions"].append(row["region"])
+        if row.get("prod_spec") and row["prod_spec"] not in entry["specs"]:
+            entry["specs"].append(row["prod_spec"])
+
+    def merge(self, other: "CatalogIndex") -> None:
+        """Take over ``other``'s entries, keeping entries of series it did not see."""
+        for seqno, entry in other.entries.items():
+            old = self.entries.get(seqno)
+            if old is None:
+                self.entries[seqno] = entry
+                continue
+            merged = dict(entry if entry.get("last_date", "") >= old.get("last_date", "") else old)
+            for field in ("regions", "specs"):
+                seen = list(old.get(field) or [])
+                merged[field] = seen + [v for v in entry.get(field) or [] if v not in seen]
+            self.entries[seqno] = merged
+
+    def save(self, built: Optional[float] = None) -> None:
+        if built is not None:
+            self.built = int(built)
+        if self.path is None:
+            return
+        data = {
+            "built": self.built,
+            "entries": {k: self.entries[k] for k in sorted(self.entries, key=_seqno_order)},
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+            tmp.replace(self.path)
+        except OSError as e:
+            logger.warning("[Catalog] cannot write %s: %s", self.path, e)
+
+    # ---------- Lookup ----------
+
+    def resolve(self, name: str, region: str = "") -> List[Dict[str, Any]]:
+        """Entries whose product name contains ``name``, optionally quoted in a region containing ``region``."""
+        name = str(name or "").strip()
+        if not name:
+            return []
+        entries = [e for e in self.entries.values() if name in (e.get("prod_name") or "")]
+        region = str(region or "").strip()
+        if region:
+            entries = [e for e in entries if any(region in r for r in e.get("regions") or [e.get("region") or ""])]
+        return sorted(entries, key=lambda e: _seqno_order(e["seqno"]))
+
+    def seqnos(self, name: str, region: str = "") -> List[str]:
+        return [e["seqno"] for e in self.resolve(name, region)]
@@ -0,0 +1,369 @@
+# mofcom_pagination.py
+# 说明：
+# - 商务部价格接口（priceQuery / priceQueryList）的并发翻页引擎。第 1 页返回 maxPageNum 后，
+#   不再等第 N 页解析完才请求第 N+1 页，而是在每个查询最多 MOFCOM_PAGE_CONCURRENCY 个在途请求
+#   的滑动窗口内派发 2..maxPageNum。
+# - 停止条件统一在引擎里判定：空页、nextPage 不前进（或服务端返回的页码与请求不符）、
+#   保险丝（_max_guard）以及 spider 的 max_pages；命中后不再派发更后面的页。
+# - 实际并发仍受 CONCURRENT_REQUESTS / DOWNLOAD_DELAY / AUTOTHROTTLE 约束，引擎只去掉
+#   “解析完一页才能请求下一页”的串行依赖。
+# - 提前停止：stop() 之后，已排队但尚未下载的更后面的页由 MofcomPagerMiddleware 丢弃
+#   （计入 mofcom/pages_cancelled），不再占用下载配额。
+# - PageSizeCache：按接口记录服务端实际接受的最大 pageSize（本地 JSON，带有效期），
+#   由 MofcomPriceBaseSpider 在第 1 页探测后写入，后续运行直接复用。
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import scrapy
+from scrapy.exceptions import IgnoreRequest
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_CONCURRENCY = 4
+DEFAULT_MAX_GUARD = 2000
+DEFAULT_PAGE_SIZE_CANDIDATES = (500, 200, 100)
+DEFAULT_PAGE_SIZE_TTL_DAYS = 7
+
+# 进程级缓存：同一进程内多个 spider 共享
+_PAGE_SIZES: Dict[str, Dict[str, Any]] = {}
+_LOADED_PAGE_SIZE_PATHS: Set[str] = set()
+
+
+def to_int(value: Any) -> Optional[int]:
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_page_info(data: Dict[str, Any], requested_page: int) -> Tuple[int, Optional[int], int]:
+    """Return ``(page, next_page, max_pages)`` from a mofcom price API response."""
+    cur_page = to_int(data.get("pageNumber")) or requested_page
+    next_page = to_int(data.get("nextPage"))
+    max_pages = to_int(data.get("maxPageNum") or data.get("totalPages") or data.get("pages")) or 1
+    return cur_page, next_page, max(1, max_pages)
+
+
+class PageFanout:
+    """
+    Sliding-window pagination state for one query.
+
+    ``make_request(page)`` builds the request for a page. Page 1 is requested
+    first; once its response reports ``maxPageNum``, pages 2..max are
+    scheduled so that at most ``concurrency`` are in flight. Every response
+    or failure frees a slot and schedules the next unscheduled page, until a
+    stop condition caps the last page.
+    """
+
+    def __init__(
+        self,
+        make_request: Callable[[int], scrapy.Request],
+        concurrency: int = DEFAULT_PAGE_CONCURRENCY,
+        max_guard: int = DEFAULT_MAX_GUARD,
+        max_pages: Optional[int] = None,
+        name: str = "",
+        log: Optional[logging.Logger] = None,
+    ) -> None:
+        self.make_request = make_request
+        self.concurrency = max(1, concurrency)
+        self.max_guard = max_guard
+        self.max_pages = max_pages
+        self.name = name
+        self.logger = log or logger
+
+        self.last_page = 1          # 目前已知的最大页码（来自 maxPageNum）
+        self.stop_at: Optional[int] = None
+        self.stop_reason: Optional[str] = None
+        self.next_page = 1          # 下一个尚未派发的页码
+        self.in_flight: Set[int] = set()
+        self.done: Set[int] = set()
+        self.failed: Set[int] = set()
+        self._guard_logged = False
+
+    # ---------- Bounds ----------
+
+    @property
+    def bound(self) -> int:
+        """Highest page that may still be scheduled."""
+        bound = min(self.last_page, self.max_guard)
+        if self.max_pages is not None:
+            bound = min(bound, self.max_pages)
+        if self.stop_at is not None:
+            bound = min(bound, self.stop_at)
+        return bound
+
+    @property
+    def finished(self) -> bool:
+        return not self.in_flight and self.next_page > self.bound
+
+    @property
+    def complete(self) -> bool:
+        """
+        True when the query ended on its own (empty page, maxPageNum, early
+        stop...) with no failed page, rather than being cut short by the
+        ``max_guard`` fuse or ``max_pages``.
+        """
+        if self.failed:
+            return False
+        cap = self.max_guard if self.max_pages is None else min(self.max_guard, self.max_pages)
+        if self.stop_at is not None and self.stop_at < cap:
+            return True
+        return self.last_page <= cap
+
+    def cancelled(self, page: int) -> bool:
+        """True once a stop condition placed ``page`` beyond the last page worth fetching."""
+        return page > self.bound
+
+    def stop(self, page: int, reason: str) -> None:
+        """Schedule nothing beyond ``page``."""
+        if self.stop_at is None or page < self.stop_at:
+            self.stop_at = page
+            self.stop_reason = reason
+            self.logger.info("[Pager] %s stop after page %s: %s", self.name, page, reason)
+
+    # ---------- Scheduling ----------
+
+    def first_request(self) -> scrapy.Request:
+        return self._schedule(self.next_page)
+
+    def on_page(self, page: int, data: Dict[str, Any], rows: List[Any]) -> List[scrapy.Request]:
+        """Record a parsed page and return the follow-up requests to yield."""
+        self.in_flight.discard(page)
+        self.done.add(page)
+
+        cur_page, next_page, max_pages = parse_page_info(data, page)
+        if not rows:
+            self.stop(page, "empty page")
+        elif cur_page != page:
+            # 服务端把越界页码折回到已有页（常见于数据在翻页期间减少）
+            self.stop(page, f"server answered page {cur_page}")
+        elif next_page is not None and next_page <= cur_page:
+            self.stop(page, f"nextPage={next_page} does not advance")
+        else:
+            # 翻页期间新增数据会让 maxPageNum 变大，取已见最大值
+            self.last_page = max(self.last_page, max_pages)
+        return self._fill()
+
+    def on_cancel(self, page: int) -> List[scrapy.Request]:
+        """A scheduled page was dropped before download because of a stop."""
+        self.in_flight.discard(page)
+        return self._fill()
+
+    def on_failure(self, page: int) -> List[scrapy.Request]:
+        """A page could not be fetched or decoded; free its slot and keep going."""
+        self.in_flight.discard(page)
+        self.failed.add(page)
+        return self._fill()
+
+    def _fill(self) -> List[scrapy.Request]:
+        if not self._guard_logged and self.last_page > self.max_guard:
+            self._guard_logged = True
+            self.logger.warning(
+                "[Pager] %s maxPageNum=%s exceeds hard guard %s, stopping there",
+                self.name, self.last_page, self.max_guard,
+            )
+        requests = []
+        bound = self.bound
+        while len(self.in_flight) < self.concurrency and self.next_page <= bound:
+            requests.append(self._schedule(self.next_page))
+        return requests
+
+    def _schedule(self, page: int) -> scrapy.Request:
+        self.in_flight.add(page)
+        self.next_page = page + 1
+        return self.make_request(page)
+
+
+class PageSizeCache:
+    """Process-level (and optionally on-disk) cache of the largest ``pageSize`` each endpoint honors."""
+
+    def __init__(self, path: Optional[str] = None, ttl_days: float = DEFAULT_PAGE_SIZE_TTL_DAYS) -> None:
+        self.path = Path(path) if path else None
+        self.ttl = max(0.0, float(ttl_days)) * 86400
+        if self.path is not None and str(self.path) not in _LOADED_PAGE_SIZE_PATHS:
+            _LOADED_PAGE_SIZE_PATHS.add(str(self.path))
+            self._load()
+
+    def _load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning("[Pager][PageSizeCache] ignoring unreadable cache %s: %s", self.path, e)
+            return
+        for endpoint, entry in data.items():
+            if isinstance(entry, dict):
+                _PAGE_SIZES.setdefault(endpoint, entry)
+
+    def _entry(self, endpoint: str) -> Optional[Dict[str, Any]]:
+        entry = _PAGE_SIZES.get(endpoint)
+        if not entry:
+            return None
+        # 过期后重新探测：服务端上限可能调整
+        if self.ttl and time.time() - float(entry.get("checked") or 0) > self.ttl:
+            return None
+        return entry
+
+    def get(self, endpoint: str) -> Optional[int]:
+        entry = self._entry(endpoint)
+        return to_int(entry.get("page_size")) if entry else None
+
+    def empty(self, endpoint: str) -> bool:
+        """True when the last probe of ``endpoint`` found no rows at all (within the TTL)."""
+        entry = self._entry(endpoint)
+        return bool(entry and entry.get("empty"))
+
+    def put(self, endpoint: str, page_size: int) -> None:
+        self._store(endpoint, {"page_size": int(page_size), "checked": int(time.time())})
+
+    def put_empty(self, endpoint: str) -> None:
+        """Remember that probing ``endpoint`` saw no rows, so runs within the TTL skip the probe."""
+        self._store(endpoint, {"page_size": None, "empty": True, "checked": int(time.time())})
+
+    def forget(self, endpoint: str) -> None:
+        """Drop ``endpoint``'s entry so the next run probes again."""
+        if _PAGE_SIZES.pop(endpoint, None) is not None:
+            self._save()
+
+    def _store(self, endpoint: str, entry: Dict[str, Any]) -> None:
+        _PAGE_SIZES[endpoint] = entry
+        self._save()
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp.write_text(json.dumps(_PAGE_SIZES, ensure_ascii=False, indent=2, sort_keys=True), encoding="utf-8")
+            tmp.replace(self.path)
+        except OSError as e:
+            logger.warning("[Pager][PageSizeCache] cannot write %s: %s", self.path, e)
+
+
+class MofcomPaginationMixin:
+    """
+    Spider mixin wiring :class:`PageFanout` into Scrapy callbacks.
+
+    ``start_pagination(build)`` returns the page-1 request, where
+    ``build(page)`` returns the spider's API request for that page (with
+    ``meta["page"]``). The callback yields its items and then
+    ``yield from self.paginate(response, data, rows)``; decode failures use
+    ``self.page_failed(response.request)``. Several independent queries can
+    run side by side under different ``key`` values.
+    """
+
+    # -a page_concurrency=N 覆盖 MOFCOM_PAGE_CONCURRENCY
+    page_concurrency = None
+
+    def _page_concurrency(self) -> int:
+        value = to_int(getattr(self, "page_concurrency", None))
+        if value is None:
+            settings = getattr(self, "settings", None)
+            value = settings.getint("MOFCOM_PAGE_CONCURRENCY", DEFAULT_PAGE_CONCURRENCY) \
+                if settings is not None else DEFAULT_PAGE_CONCURRENCY
+        return max(1, value)
+
+    def _pagers(self) -> Dict[str, PageFanout]:
+        return self.__dict__.setdefault("_mofcom_pagers", {})
+
+    def start_pagination(
+        self,
+        build: Callable[[int], scrapy.Request],
+        key: str = "default",
+        max_pages: Optional[int] = None,
+    ) -> scrapy.Request:
+        def make_request(page: int) -> scrapy.Request:
+            request = build(page)
+            request.meta["mofcom_pager"] = key
+            # 靠前的页先下载（默认调度器是 LIFO）：接口按日期倒序，提前停止后排队的靠后页可直接丢弃
+            request.priority = -page
+            if request.errback is None:
+                request = request.replace(errback=self._page_errback)
+            self._stat_inc_pager("mofcom/pages_requested")
+            return request
+
+        pager = PageFanout(
+            make_request,
+            concurrency=self._page_concurrency(),
+            max_guard=getattr(self, "_max_guard", DEFAULT_MAX_GUARD),
+            max_pages=max_pages,
+            name=f"{self.name}:{key}",
+            log=self.logger,
+        )
+        self._pagers()[key] = pager
+        return pager.first_request()
+
+    def pagination_complete(self) -> bool:
+        """True when at least one query ran and every query fetched all of its pages."""
+        pagers = self._pagers()
+        return bool(pagers) and all(pager.complete for pager in pagers.values())
+
+    def pager_for(self, request: scrapy.Request) -> Optional[PageFanout]:
+        return self._pagers().get(request.meta.get("mofcom_pager", "default"))
+
+    def paginate(self, response, data: Dict[str, Any], rows: List[Any]) -> List[scrapy.Request]:
+        pager = self.pager_for(response.request)
+        if pager is None:
+            return []
+        return pager.on_page(int(response.meta.get("page", 1)), data, rows)
+
+    def page_failed(self, request: scrapy.Request) -> List[scrapy.Request]:
+        pager = self.pager_for(request)
+        if pager is None:
+            return []
+        self._stat_inc_pager("mofcom/pages_failed")
+        return pager.on_failure(int(request.meta.get("page", 1)))
+
+    def _page_errback(self, failure):
+        request = failure.request
+        if failure.check(PageCancelled):
+            pager = self.pager_for(request)
+            self._stat_inc_pager("mofcom/pages_cancelled")
+            return pager.on_cancel(int(request.meta.get("page", 1))) if pager is not None else []
+        self.logger.error("[Pager] page %s failed: %s", request.meta.get("page"), failure.value)
+        return self.page_failed(request)
+
+    def _stat_inc_pager(self, key: str) -> None:
+        crawler = getattr(self, "crawler", None)
+        if crawler is not None and crawler.stats is not None:
+            crawler.stats.inc_value(key)
+
+
+class PageCancelled(IgnoreRequest):
+    """Raised for a queued page that a stop condition made unnecessary."""
+
+
+class MofcomPagerMiddleware:
+    """
+    Downloader middleware dropping queued mofcom page requests once their
+    pager has stopped before them (e.g. an early stop on already-known rows),
+    so they cost neither a download slot nor ``DOWNLOAD_DELAY``.
+    """
+
+    def __init__(self, crawler=None) -> None:
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def process_request(self, request, spider=None):
+        key = request.meta.get("mofcom_pager")
+        if key is None:
+            return None
+        spider = spider or getattr(self.crawler, "spider", None)
+        pager_for = getattr(spider, "pager_for", None)
+        pager = pager_for(request) if pager_for is not None else None
+        page = to_int(request.meta.get("page"))
+        if pager is not None and page is not None and pager.cancelled(page):
+            raise PageCancelled(f"{pager.name} page {page} cancelled: {pager.stop_reason}")
+        return None
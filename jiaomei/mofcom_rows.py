@@ -0,0 +1,242 @@
+# mofcom_rows.py
+# 说明：
+# - 商务部价格接口整页行的归一化：把一页 rows 按列一次处理成 PriceColumns，
+#   日期为 datetime.date，价格为 Decimal（或 float），品名 / 规格 / 单位 / 地区为驻留字符串。
+# - 按列处理：同一日期三元组、同一价格文本、同一文本值只解析一次（进程级缓存，超过上限时清空），
+#   命中缓存的值经 map() 在 C 层查表，一页内大量重复的单位、地区、日期不再逐行 strip / zfill / 拼接。
+# - 同时保留与 normalize_row() 完全一致的文本列（date_text / price_text），spider 产出的 item 不变。
+# - rows 可以是 dict，也可以是 fast_json 解码出的 PriceRow 结构体。
+# - 可选输出：to_numpy()（需 numpy）、to_arrow()（需 pyarrow），供管道整批写入时免去逐行再解析。
+
+from __future__ import annotations
+
+import datetime as dt
+import math
+import operator
+import sys
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # 可选依赖
+    np = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # 可选依赖
+    pa = None
+
+
+ROW_FIELDS = ("yyyy", "mm", "dd", "price", "prod_name", "prod_spec", "unit", "region", "seqno")
+TEXT_COLUMNS = ("prod_name", "prod_spec", "unit", "region")
+
+# 进程级缓存的条目上限，超过后整体清空
+CACHE_LIMIT = 100_000
+
+_struct_values = operator.attrgetter(*ROW_FIELDS)
+_dict_values = operator.itemgetter(*ROW_FIELDS)
+
+
+class _Cache(dict):
+    """``cache[key]`` computes ``parse(key)`` once; hits stay in C when looked up through ``map()``."""
+
+    def __init__(self, parse: Callable[[Any], Any]) -> None:
+        super().__init__()
+        self.parse = parse
+        self._typed: Dict[Tuple[Any, ...], "_Cache"] = {}
+
+    def typed(self, kinds: Tuple[Any, ...]) -> "_Cache":
+        """Sub-cache for keys of one value type per column (1 / 1.0 / True are equal keys but format differently)."""
+        cache = self._typed.get(kinds)
+        if cache is None:
+            cache = self._typed[kinds] = _Cache(self.parse)
+        return cache
+
+    def __missing__(self, key: Any) -> Any:
+        if len(self) >= CACHE_LIMIT:
+            self.clear()
+        value = self[key] = self.parse(key)
+        return value
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value.strip()
+    return str(value).strip()
+
+
+def _parse_date(key: Tuple[Any, Any, Any]) -> Tuple[Optional[dt.date], str]:
+    y, m, d = _text(key[0]), _text(key[1]), _text(key[2])
+    if not (y and m and d):
+        return None, ""
+    text = f"{y}-{m.zfill(2)}-{d.zfill(2)}"
+    try:
+        return dt.date(int(y), int(m), int(d)), text
+    except (TypeError, ValueError):
+        return None, text
+
+
+def _price_parser(price_type: type) -> Callable[[Any], Tuple[str, Any]]:
+    def parse(value: Any) -> Tuple[str, Any]:
+        # 与 normalize_row 一致：0 等假值视为无价格
+        text = _text(value).replace(",", "") if value else ""
+        if not text:
+            return text, None
+        try:
+            number = price_type(text)
+            # NaN / Infinity 不是有效价格
+            return text, number if math.isfinite(number) else None
+        except (ValueError, InvalidOperation):
+            return text, None
+    return parse
+
+
+def _seqno(value: Any) -> Optional[str]:
+    return None if value is None else sys.intern(_text(value))
+
+
+_DATES = _Cache(_parse_date)
+_TEXTS = _Cache(lambda value: sys.intern(_text(value)))
+_SEQNOS = _Cache(_seqno)
+_PRICES: Dict[type, _Cache] = {}
+
+_NONE = type(None)
+
+
+def _mapped(cache: _Cache, values: List[Any], *more: List[Any]) -> List[Any]:
+    """``[cache[v] for v in values]``; with ``more`` columns the key is the zipped tuple."""
+    columns = (values,) + more
+    keys = zip(*columns) if more else values
+    kinds = []
+    for column in columns:
+        types = set(map(type, column))
+        types.discard(_NONE)
+        if len(types) > 1:
+            # 同一列混有多种类型（如 1 与 1.0）：不走缓存，逐个解析
+            return list(map(cache.parse, keys))
+        kinds.append(types.pop() if types else _NONE)
+    return list(map(cache.typed(tuple(kinds)).__getitem__, keys))
+
+
+def _columns(rows: Iterable[Any]) -> List[List[Any]]:
+    """Raw ``ROW_FIELDS`` columns of a page of dicts or ``PriceRow`` structs."""
+    rows = rows if isinstance(rows, list) else list(rows)
+    if not rows:
+        return [[] for _ in ROW_FIELDS]
+    if isinstance(rows[0], dict):
+        try:
+            return [list(column) for column in zip(*map(_dict_values, rows))]
+        except KeyError:
+            # 有的行缺字段：按 .get() 逐列取
+            return [[row.get(field) for row in rows] for field in ROW_FIELDS]
+    # fast_json.PriceRow 结构体
+    return [list(column) for column in zip(*map(_struct_values, rows))]
+
+
+class PriceColumns:
+    """
+    One page of mofcom price rows as typed columns.
+
+    ``date`` (``datetime.date`` or None) and ``price`` (``Decimal`` / float
+    or None) are typed; ``date_text`` / ``price_text`` hold exactly what
+    :func:`~jiaomei.spiders.mofcom_base.normalize_row` would produce, and
+    :meth:`row` / :meth:`rows` rebuild those dicts.
+    """
+
+    __slots__ = ("date", "date_text", "price", "price_text",
+                 "prod_name", "prod_spec", "unit", "region", "seqno")
+
+    def __init__(self) -> None:
+        self.date: List[Optional[dt.date]] = []
+        self.date_text: List[str] = []
+        self.price: List[Any] = []
+        self.price_text: List[str] = []
+        self.prod_name: List[str] = []
+        self.prod_spec: List[str] = []
+        self.unit: List[str] = []
+        self.region: List[str] = []
+        self.seqno: List[Optional[str]] = []
+
+    def __len__(self) -> int:
+        return len(self.date)
+
+    def row(self, i: int) -> Dict[str, Any]:
+        return {
+            "date": self.date_text[i],
+            "price": self.price_text[i],
+            "prod_name": self.prod_name[i],
+            "prod_spec": self.prod_spec[i],
+            "unit": self.unit[i],
+            "region": self.region[i],
+            "seqno": self.seqno[i],
+        }
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """Per-row dicts identical to :func:`normalize_row` output."""
+        for date, price, name, spec, unit, region, seqno in zip(
+            self.date_text, self.price_text, self.prod_name, self.prod_spec,
+            self.unit, self.region, self.seqno,
+        ):
+            yield {
+                "date": date,
+                "price": price,
+                "prod_name": name,
+                "prod_spec": spec,
+                "unit": unit,
+                "region": region,
+                "seqno": seqno,
+            }
+
+    # ---------- Bulk outputs ----------
+
+    def to_numpy(self) -> Dict[str, Any]:
+        """Columns as NumPy arrays: ``datetime64[D]`` dates (NaT when missing), float64 prices (NaN), object strings."""
+        if np is None:
+            raise ImportError("PriceColumns.to_numpy() requires numpy")
+        arrays = {
+            "date": np.array(self.date, dtype="datetime64[D]"),
+            "price": np.array([np.nan if p is None else float(p) for p in self.price], dtype="float64"),
+            "seqno": np.array(self.seqno, dtype=object),
+        }
+        for name in TEXT_COLUMNS:
+            arrays[name] = np.array(getattr(self, name), dtype=object)
+        return arrays
+
+    def to_arrow(self):
+        """Columns as a ``pyarrow.Table``: date32, inferred decimal / float64 price, dictionary-encoded text."""
+        if pa is None:
+            raise ImportError("PriceColumns.to_arrow() requires pyarrow")
+        columns = {
+            "date": pa.array(self.date, type=pa.date32()),
+            "price": pa.array(self.price),
+            "seqno": pa.array(self.seqno, type=pa.string()),
+        }
+        for name in TEXT_COLUMNS:
+            # 驻留字符串基数很低，字典编码体积小
+            columns[name] = pa.array(getattr(self, name), type=pa.string()).dictionary_encode()
+        return pa.table(columns)
+
+
+def normalize_page(rows: Iterable[Any], price_type: type = Decimal) -> PriceColumns:
+    """Normalize a whole page of API rows (dicts or ``PriceRow`` structs), column by column."""
+    prices = _PRICES.get(price_type)
+    if prices is None:
+        prices = _PRICES[price_type] = _Cache(_price_parser(price_type))
+    yyyy, mm, dd, price, name, spec, unit, region, seqno = _columns(rows)
+
+    cols = PriceColumns()
+    dates = _mapped(_DATES, yyyy, mm, dd)
+    cols.date = [d[0] for d in dates]
+    cols.date_text = [d[1] for d in dates]
+    parsed = _mapped(prices, price)
+    cols.price = [p[1] for p in parsed]
+    cols.price_text = [p[0] for p in parsed]
+    cols.prod_name = _mapped(_TEXTS, name)
+    cols.prod_spec = _mapped(_TEXTS, spec)
+    cols.unit = _mapped(_TEXTS, unit)
+    cols.region = _mapped(_TEXTS, region)
+    cols.seqno = _mapped(_SEQNOS, seqno)
+    return cols
@@ -0,0 +1,70 @@
+# mofcom_shards.py
+# 说明：
+# - 长区间回填时，把一次 startTime/endTime 查询按自然月 / 季度 / 年切成若干互不重叠的子区间，
+#   每个子区间是独立的查询，各自翻页（mofcom_pagination），在同一次运行内并发抓取。
+# - 多进程分摊：-a shard_index=i -a shard_count=n 时只抓第 i、i+n、i+2n... 个子区间，
+#   n 个进程使用相同的区间与宽度即可不重不漏地覆盖整个区间。
+
+from __future__ import annotations
+
+import datetime as dt
+from typing import List, Optional, Sequence, Tuple, TypeVar
+
+
+SHARD_MONTHS = {"month": 1, "quarter": 3, "year": 12}
+
+T = TypeVar("T")
+
+
+def parse_date(value) -> Optional[dt.date]:
+    if isinstance(value, dt.datetime):
+        return value.date()
+    if isinstance(value, dt.date):
+        return value
+    text = str(value or "").strip()[:10]
+    if not text:
+        return None
+    return dt.date.fromisoformat(text)
+
+
+def _period_start(day: dt.date, months: int) -> dt.date:
+    # 按自然月 / 季度 / 年对齐：季度从 1、4、7、10 月开始
+    month = (day.month - 1) // months * months + 1
+    return dt.date(day.year, month, 1)
+
+
+def _add_months(day: dt.date, months: int) -> dt.date:
+    index = day.year * 12 + day.month - 1 + months
+    return dt.date(index // 12, index % 12 + 1, 1)
+
+
+def date_shards(start, end, width: str) -> List[Tuple[str, str]]:
+    """
+    Split the inclusive range ``start``..``end`` into calendar-aligned
+    ``(start, end)`` ISO date pairs of ``width`` (``month``, ``quarter`` or
+    ``year``). The first and last shard are clipped to the range.
+    """
+    months = SHARD_MONTHS.get(str(width).strip().lower())
+    if months is None:
+        raise ValueError(f"unknown shard width {width!r}; expected one of: {', '.join(SHARD_MONTHS)}")
+    first, last = parse_date(start), parse_date(end)
+    if first is None or last is None:
+        raise ValueError("date sharding needs both a start and an end date")
+    if first > last:
+        return []
+
+    shards = []
+    cursor = first
+    while cursor <= last:
+        period_end = _add_months(_period_start(cursor, months), months) - dt.timedelta(days=1)
+        shard_end = min(period_end, last)
+        shards.append((cursor.isoformat(), shard_end.isoformat()))
+        cursor = shard_end + dt.timedelta(days=1)
+    return shards
+
+
+def select_shards(shards: Sequence[T], index: int = 0, count: int = 1) -> List[T]:
+    """The shards process ``index`` of ``count`` is responsible for (round-robin)."""
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"shard_index must be in 0..{count - 1}, got {index}")
+    return list(shards[index::count])
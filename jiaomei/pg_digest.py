@@ -0,0 +1,170 @@
+# pg_digest.py
+# 说明：
+# - PostgresPipeline 的变更检测索引：按表维护 key -> 行内容哈希。
+# - 每次运行只加载一次（来自数据库或本地 sidecar 文件），之后逐行比对，
+#   内容未变化的行不再进入缓冲区，避免重复改写历史数据。
+# - 新哈希先按批暂存（staged），只有确实写入数据库的行才经 commit() 记入索引；进入死信、
+#   转换失败、批内去重丢弃或写库失败（含落 spool）的行下次运行仍会重新写入。
+
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import json
+import logging
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from psycopg.types.json import Json
+
+
+logger = logging.getLogger(__name__)
+
+_DIGEST_SIZE = 16
+_SEP = "\x1f"
+
+
+def digest_token(value: Any) -> str:
+    """Canonical text for one value, stable across client strings and DB types."""
+    if value is None:
+        return "\x00"
+    if isinstance(value, Json):
+        value = value.obj
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, float):
+        value = Decimal(repr(value))
+    if isinstance(value, (int, Decimal)):
+        value = Decimal(value)
+        if not value.is_finite():
+            return str(value)
+        # 1234、1234.0、1234.00 视为同一个数
+        return format(value.normalize(), "f")
+    if isinstance(value, (dt.date, dt.datetime, dt.time)):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+    return str(value)
+
+
+def digest(values: Iterable[Any]) -> bytes:
+    text = _SEP.join(digest_token(v) for v in values)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=_DIGEST_SIZE).digest()
+
+
+class DigestIndex:
+    """
+    Key -> row hash for one table. ``key_columns`` identify a row,
+    ``value_columns`` are the columns whose content is hashed.
+    """
+
+    __slots__ = ("key_columns", "value_columns", "key_pos", "value_pos",
+                 "key_convs", "value_convs", "entries", "staged", "dirty")
+
+    def __init__(
+        self,
+        key_columns: Sequence[str],
+        value_columns: Sequence[str],
+        key_pos: Sequence[int],
+        value_pos: Sequence[int],
+        converter: Callable[[str], Callable[[Any], Any]],
+    ) -> None:
+        self.key_columns = list(key_columns)
+        self.value_columns = list(value_columns)
+        self.key_pos = tuple(key_pos)
+        self.value_pos = tuple(value_pos)
+        self.key_convs = tuple(converter(c) for c in self.key_columns)
+        self.value_convs = tuple(converter(c) for c in self.value_columns)
+        self.entries: Dict[bytes, bytes] = {}
+        # 已进入缓冲区、尚未确认写库的行哈希
+        self.staged: Dict[bytes, bytes] = {}
+        self.dirty = False
+
+    def _project(self, row: Sequence[Any], positions: Sequence[int], convs) -> Optional[List[Any]]:
+        width = len(row)
+        out = []
+        for pos, conv in zip(positions, convs):
+            v = row[pos] if pos < width else None
+            try:
+                out.append(conv(v))
+            except (ValueError, TypeError, ArithmeticError):
+                # 无法转换的值交给 flush 阶段处理（进入死信），这里视为“已变化”
+                return None
+        return out
+
+    def add_stored(self, record: Sequence[Any]) -> None:
+        """Register one ``(key..., value...)`` record loaded from the database."""
+        nk = len(self.key_columns)
+        keys = [conv(v) for conv, v in zip(self.key_convs, record[:nk])]
+        values = [conv(v) for conv, v in zip(self.value_convs, record[nk:])]
+        self.entries[digest(keys)] = digest(values)
+
+    def check(self, row: Sequence[Any]) -> Optional[bool]:
+        """
+        Return ``None`` for a new key, ``False`` for an unchanged row and
+        ``True`` for a changed one. The new hash is only staged; it enters
+        the index once :meth:`commit` confirms the row was written.
+        """
+        keys = self._project(row, self.key_pos, self.key_convs)
+        values = self._project(row, self.value_pos, self.value_convs)
+        if keys is None or values is None:
+            return True
+        kd = digest(keys)
+        vd = digest(values)
+        old = self.staged.get(kd) or self.entries.get(kd)
+        if old == vd:
+            return False
+        self.staged[kd] = vd
+        return None if old is None else True
+
+    def drop_staged(self) -> None:
+        """Forget staged hashes once their rows left the buffer; written rows come back through :meth:`commit`."""
+        self.staged.clear()
+
+    def commit(self, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> None:
+        """Record the hashes of ``rows`` (laid out as ``columns``) that were written to the database."""
+        index = {c: i for i, c in enumerate(columns)}
+        key_idx = [index.get(c) for c in self.key_columns]
+        value_idx = [index.get(c) for c in self.value_columns]
+        for row in rows:
+            try:
+                keys = [conv(None if i is None else row[i]) for conv, i in zip(self.key_convs, key_idx)]
+                values = [conv(None if i is None else row[i]) for conv, i in zip(self.value_convs, value_idx)]
+            except (ValueError, TypeError, ArithmeticError):
+                continue
+            self.entries[digest(keys)] = digest(values)
+            self.dirty = True
+
+    # ---------- sidecar ----------
+
+    def _header(self) -> Dict[str, Any]:
+        return {"keys": self.key_columns, "values": self.value_columns, "digest_size": _DIGEST_SIZE}
+
+    def load_sidecar(self, path: Path) -> bool:
+        """Load entries from ``path``; False when missing or built for other columns."""
+        if not path.exists():
+            return False
+        with path.open("rb") as f:
+            try:
+                header = json.loads(f.readline().decode("utf-8"))
+            except ValueError:
+                return False
+            if header != self._header():
+                logger.info("[PG][Digest] sidecar %s was built for other columns, ignoring", path)
+                return False
+            blob = f.read()
+        step = 2 * _DIGEST_SIZE
+        entries = self.entries
+        for off in range(0, len(blob) - step + 1, step):
+            entries[blob[off:off + _DIGEST_SIZE]] = blob[off + _DIGEST_SIZE:off + step]
+        return True
+
+    def save_sidecar(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with tmp.open("wb") as f:
+            f.write(json.dumps(self._header(), ensure_ascii=False).encode("utf-8") + b"\n")
+            f.write(b"".join(k + v for k, v in self.entries.items()))
+        tmp.replace(path)
+        self.dirty = False
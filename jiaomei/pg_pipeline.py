@@ -3,293 +3,803 @@
 from __future__ import annotations
 
 import datetime as dt
-
-from typing import Any, Dict, Optional, Sequence, List
-
-
+import json
+import logging
+import math
+import queue
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, List
 
 import psycopg
+from psycopg.rows import dict_row, tuple_row
+from psycopg import sql
+from twisted.internet import task
+
+from jiaomei.pg_digest import DigestIndex
+from jiaomei.pg_schema_cache import CATALOG_VERSION_SQL, SchemaCache, catalog_version, schema_cache_key
+from jiaomei.pg_spool import SpoolWriter
+
+
+logger = logging.getLogger(__name__)
+
+# 抓取结果中表示“无数据”的占位值，写入数值/日期列时按 NULL 处理
+_NULL_TOKENS = frozenset({"", "-", "--", "null", "NULL", "None"})
+
+
+def _clean_text(value: Any) -> Optional[str]:
+    text = str(value).strip()
+    return None if text in _NULL_TOKENS else text
+
+
+def _to_decimal(value: Any) -> Any:
+    if value is None or isinstance(value, (Decimal, int, float)) and not isinstance(value, bool):
+        return value
+    text = _clean_text(value)
+    if text is None:
+        return None
+    return Decimal(text.replace(",", ""))
+
+
+def _to_int(value: Any) -> Optional[int]:
+    value = _to_decimal(value)
+    if value is None or isinstance(value, int):
+        return value
+    if value != int(value):
+        raise ValueError(f"not an integer: {value!r}")
+    return int(value)
+
+
+def _to_float(value: Any) -> Optional[float]:
+    value = _to_decimal(value)
+    return None if value is None else float(value)
+
+
+def _to_date(value: Any) -> Optional[dt.date]:
+    if value is None:
+        return None
+    if isinstance(value, dt.datetime):
+        return value.date()
+    if isinstance(value, dt.date):
+        return value
+    text = _clean_text(value)
+    if text is None:
+        return None
+    text = text.split()[0].split("T")[0]
+    if len(text) == 8 and text.isdigit():
+        return dt.date(int(text[:4]), int(text[4:6]), int(text[6:]))
+    parts = text.replace("/", "-").replace(".", "-").split("-")
+    if len(parts) != 3:
+        raise ValueError(f"not a date: {value!r}")
+    return dt.date(int(parts[0]), int(parts[1]), int(parts[2]))
+
+
+def _to_timestamp(value: Any) -> Optional[dt.datetime]:
+    if value is None or isinstance(value, dt.datetime):
+        return value
+    if isinstance(value, dt.date):
+        return dt.datetime.combine(value, dt.time())
+    text = _clean_text(value)
+    if text is None:
+        return None
+    try:
+        return dt.datetime.fromisoformat(text)
+    except ValueError:
+        return dt.datetime.combine(_to_date(text), dt.time())
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, (list, dict)):
+        return psycopg.types.json.Json(value)
+    return value
+
+
+_TYPE_CONVERTERS: Dict[str, Callable[[Any], Any]] = {
+    "numeric": _to_decimal,
+    "decimal": _to_decimal,
+    "smallint": _to_int,
+    "integer": _to_int,
+    "bigint": _to_int,
+    "real": _to_float,
+    "double precision": _to_float,
+    "date": _to_date,
+    "timestamp": _to_timestamp,
+    "timestamp without time zone": _to_timestamp,
+    "timestamp with time zone": _to_timestamp,
+    "timestamptz": _to_timestamp,
+}
+
+
+def converter_for_type(data_type: Optional[str]) -> Callable[[Any], Any]:
+    """
+    Return the client-side converter for a PostgreSQL column type
+    (``information_schema.columns.data_type`` or an inferred DDL type).
+    Unknown types only get list/dict wrapped as JSON, as before.
+    """
+    if not data_type:
+        return _to_json
+    return _TYPE_CONVERTERS.get(data_type.lower(), _to_json)
 
-from psycopg.rows import dict_row
 
-from psycopg import sql
+# 编号类列：即使形如数字也按字符串保存，避免 seqno 被推断成 double
+_ID_COLUMNS = frozenset({"id", "code", "seqno", "编号", "代码"})
+_ID_SUFFIXES = ("_id", "_code", "_no", "_seqno", "编号", "代码")
 
 
+def is_id_column(col: str) -> bool:
+    name = col.lower()
+    return name in _ID_COLUMNS or name.endswith(_ID_SUFFIXES)
 
 
+def infer_value_type(value: Any) -> Optional[str]:
+    """
+    Guess a column type from one crawled value, parsing numeric and date
+    strings (the API spiders yield "1,234" and "2025-09-01" as text).
+    Returns None for empty/null tokens, which say nothing about the type.
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "bigint"
+    if isinstance(value, (float, Decimal)):
+        return "double precision"
+    if isinstance(value, dt.datetime):
+        return "timestamp"
+    if isinstance(value, dt.date):
+        return "date"
+    if isinstance(value, (list, dict)):
+        return "jsonb"
+    text = _clean_text(value)
+    if text is None:
+        return None
+    if ("-" in text[1:] or "/" in text) and text[:1].isdigit():
+        try:
+            _to_date(text)
+        except (ValueError, TypeError):
+            return "text"
+        return "timestamp" if (" " in text or "T" in text) and ":" in text else "date"
+    try:
+        number = _to_decimal(text)
+    except ArithmeticError:
+        return "text"
+    return "double precision" if number.is_finite() else "text"
+
+
+def spider_pg_config(spider, keys: Iterable[str]) -> Dict[str, Any]:
+    """
+    ``pg_*`` options declared by ``spider`` for ``keys``: the ``pg_pipeline``
+    dict (or a callable returning one) first, then same-named attributes.
+    None values are skipped so an unset attribute never hides a dict entry.
+    """
+    keys = list(keys)
+    found: Dict[str, Any] = {}
+    config = getattr(spider, 'pg_pipeline', None)
+    if callable(config):
+        config = config()
+    if isinstance(config, dict):
+        for key in keys:
+            if config.get(key) is not None:
+                found[key] = config[key]
+    for key in keys:
+        value = getattr(spider, key, None)
+        if value is not None:
+            found[key] = value
+    return found
+
+
+# 估算每批发送字节数时最多采样的行数
+_BYTES_SAMPLE = 20
+# 每张表保留最近多少次写库耗时用于 p50/p95，长时间运行时内存不随批次数增长
+_LATENCY_WINDOW = 1024
+
+
+def _percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of ``values`` (sorted ascending)."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
+
+
+def _estimate_bytes(rows: Sequence[tuple]) -> int:
+    """Approximate parameter payload of ``rows``: a sample rendered as text, scaled up."""
+    sample = rows[:_BYTES_SAMPLE]
+    if not sample:
+        return 0
+    size = sum(len(str(v)) for row in sample for v in row if v is not None)
+    return size * len(rows) // len(sample)
+
+
+def dsn_from_settings(s) -> str:
+    """Build the PostgreSQL DSN from PG_DSN or the PG_HOST/PG_DB/... settings."""
+    dsn = s.get("PG_DSN")
+    if not dsn:
+        parts = {
+            "host": s.get("PG_HOST", "localhost"),
+            "port": s.getint("PG_PORT", 5432),
+            "dbname": s.get("PG_DATABASE") or s.get("PG_DB"),
+            "user": s.get("PG_USER"),
+            "password": s.get("PG_PASSWORD"),
+        }
+        if not parts["dbname"]:
+            raise ValueError("PG_DSN or PG_DATABASE/PG_DB must be configured.")
+        dsn = " ".join(f"{k}={v}" for k, v in parts.items() if v is not None)
+    return dsn
+
+
+def _qualified_name(schema: Optional[str], table: str) -> sql.Composable:
+    return (
+        sql.SQL("{}.{}").format(sql.Identifier(schema), sql.Identifier(table))
+        if schema else sql.Identifier(table)
+    )
+
+
+def partition_bounds(day: dt.date, partition_by: str) -> tuple:
+    """``(start, end, suffix)`` of the month/year range partition holding ``day``."""
+    if partition_by == "year":
+        return dt.date(day.year, 1, 1), dt.date(day.year + 1, 1, 1), f"p{day.year:04d}"
+    start = dt.date(day.year, day.month, 1)
+    end = dt.date(day.year + (day.month == 12), day.month % 12 + 1, 1)
+    return start, end, f"p{day.year:04d}{day.month:02d}"
+
+
+def partition_ddl(schema: Optional[str], table: str, start: dt.date, end: dt.date, suffix: str) -> sql.Composable:
+    return sql.SQL(
+        "CREATE TABLE IF NOT EXISTS {part} PARTITION OF {tbl} FOR VALUES FROM ({lo}) TO ({hi})"
+    ).format(
+        part=_qualified_name(schema, f"{table}_{suffix}"),
+        tbl=_qualified_name(schema, table),
+        lo=sql.Literal(start),
+        hi=sql.Literal(end),
+    )
+
+
+_DEAD_LETTER_DDL = (
+    "CREATE TABLE IF NOT EXISTS {tbl} ("
+    "id BIGSERIAL PRIMARY KEY, "
+    "target_table TEXT, "
+    "pgcode TEXT, "
+    "error TEXT, "
+    "row_data JSONB, "
+    "created_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+)
+
+
+def dead_letter_record(
+    schema: Optional[str], table: str, columns: Sequence[str], row: Sequence[Any], error: Exception
+) -> Dict[str, Any]:
+    """The dead-letter record for one rejected row (shared with ``scrapy pg_replay``)."""
+    return {
+        "table": table,
+        "schema": schema,
+        "pgcode": getattr(error, "sqlstate", None),
+        "error": str(error).strip(),
+        "row": {c: (v.obj if isinstance(v, psycopg.types.json.Json) else v) for c, v in zip(columns, row)},
+    }
+
+
+def insert_dead_letter(conn: psycopg.Connection, tbl: sql.Composable, record: Dict[str, Any], create: bool = False) -> None:
+    """Insert ``record`` into the dead-letter table ``tbl``; the caller owns the transaction."""
+    if create:
+        conn.execute(sql.SQL(_DEAD_LETTER_DDL).format(tbl=tbl))
+    conn.execute(
+        sql.SQL(
+            "INSERT INTO {tbl} (target_table, pgcode, error, row_data) VALUES (%s, %s, %s, %s)"
+        ).format(tbl=tbl),
+        (
+            record["table"],
+            record["pgcode"],
+            record["error"],
+            psycopg.types.json.Json(record["row"], dumps=lambda o: json.dumps(o, ensure_ascii=False, default=str)),
+        ),
+    )
+
+
+# 表的分区方式：relkind、分区策略与单列分区键（表达式分区时 partkey 为 NULL）
+_PARTITION_INFO_SQL = """
+    SELECT c.oid, c.relkind, pt.partstrat, pt.partnatts,
+           (SELECT a.attname FROM pg_attribute a
+             WHERE a.attrelid = c.oid AND a.attnum = pt.partattrs[0]) AS partkey
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_partitioned_table pt ON pt.partrelid = c.oid
+    WHERE n.nspname = coalesce(%s, current_schema()) AND c.relname = %s
+"""
+
+_PARTITION_BOUNDS_SQL = """
+    SELECT pg_get_expr(c.relpartbound, c.oid) AS bound
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = %s
+"""
+
+_RANGE_BOUND_RE = re.compile(r"FOR VALUES FROM \((.+)\) TO \((.+)\)")
+
+
+def _bound_date(text: str) -> dt.date:
+    text = text.strip()
+    if text == "MINVALUE":
+        return dt.date.min
+    if text == "MAXVALUE":
+        return dt.date.max
+    return dt.date.fromisoformat(text.strip("'")[:10])
+
+
+def parse_range_bound(bound: Optional[str]) -> Optional[tuple]:
+    """``(start, end)`` dates of a ``FOR VALUES FROM (..) TO (..)`` bound; None for DEFAULT partitions."""
+    m = _RANGE_BOUND_RE.match(bound or "")
+    if not m:
+        return None
+    return _bound_date(m.group(1)), _bound_date(m.group(2))
+
+
+class _ConnectionPool:
+    """
+    Lazily opened connections shared by the flush workers. The number of
+    connections is bounded by the worker count, since a worker holds at most one.
+    """
 
-class PostgresPipeline:
+    def __init__(self, connect: Callable[[], psycopg.Connection]) -> None:
+        self._connect = connect
+        self._idle: "queue.LifoQueue[psycopg.Connection]" = queue.LifoQueue()
+        self._opened: List[psycopg.Connection] = []
+        self._lock = threading.Lock()
 
+    def get(self) -> psycopg.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+            with self._lock:
+                self._opened.append(conn)
+            return conn
+
+    def put(self, conn: psycopg.Connection) -> None:
+        # 断开的连接直接丢弃，下次按需重连
+        if not conn.closed and not conn.broken:
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        with self._lock:
+            opened, self._opened = self._opened, []
+        for conn in opened:
+            try:
+                conn.close()
+            except psycopg.Error:
+                pass
+
+
+class _ProjectionPlan:
+    """
+    Compiled mapping for one (table, incoming key set): which item key lands
+    in which column position, with static field values pre-bound.
     """
 
-    Scrapy item pipeline for PostgreSQL.
+    __slots__ = ("pairs", "template", "positions")
+
+    def __init__(self, pairs: Sequence[tuple], template: Sequence[Any], positions: frozenset) -> None:
+        self.pairs = tuple(pairs)
+        self.template = tuple(template)
+        self.positions = positions
+
+
+class _TableState:
+    """Per-table buffer of row tuples plus the column layout they share."""
+
+    __slots__ = ("name", "buffer", "columns", "col_index", "col_types",
+                 "table_columns", "created", "plans", "pending_positions", "converters",
+                 "digest", "partitions", "partition_key", "partition_ranges", "inflight", "flush_ms", "flush_max_ms")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.buffer: List[tuple] = []
+        self.columns: List[str] = []
+        self.col_index: Dict[str, int] = {}
+        self.col_types: Dict[str, str] = {}
+        self.table_columns: Optional[Dict[str, str]] = None
+        self.created: bool = False
+        self.plans: Dict[tuple, _ProjectionPlan] = {}
+        self.pending_positions: set[int] = set()
+        self.converters: Dict[str, Callable[[Any], Any]] = {}
+        # None: 尚未加载；False: 该表不做变更检测
+        self.digest: Any = None
+        # 已确认存在的分区起始日期；None 表示不是按时间分区的表
+        self.partitions: Optional[set[dt.date]] = None
+        # 分区键列，以及表上已有分区覆盖的 [start, end) 日期范围
+        self.partition_key: Optional[str] = None
+        self.partition_ranges: List[tuple] = []
+        # 正在后台写入的批次；同一张表同一时间只有一个
+        self.inflight: Optional[Future] = None
+        # 最近若干次成功写库的耗时（毫秒），用于 p50/p95；max 覆盖整次运行
+        self.flush_ms: deque = deque(maxlen=_LATENCY_WINDOW)
+        self.flush_max_ms: float = 0.0
+
+    def converter(self, column: str) -> Callable[[Any], Any]:
+        conv = self.converters.get(column)
+        if conv is None:
+            conv = self.converters[column] = converter_for_type(self.col_types.get(column))
+        return conv
+
+    def position(self, column: str) -> int:
+        pos = self.col_index.get(column)
+        if pos is None:
+            pos = len(self.columns)
+            self.columns.append(column)
+            self.col_index[column] = pos
+        return pos
 
 
+class PostgresPipeline:
+    """
+    Scrapy item pipeline for PostgreSQL.
 
     New features:
-
       - PG_USE_EXISTING_TABLE: when True, never create table/index; inspect columns and insert only.
-
       - PG_FIELD_MAP: item_field -> db_column mapping.
-
       - PG_STATIC_FIELDS: extra constant columns to insert.
-
       - PG_STRICT_COLUMNS: only insert columns that exist in table (ignore unknowns if False).
-
+      - PG_DEAD_LETTER_TABLE / PG_DEAD_LETTER_PATH: rows rejected by PostgreSQL are isolated
+        by bisecting the failed batch and written to a dead-letter table or JSONL file
+        instead of aborting the crawl.
+      - PG_PIPELINE_MODE: flush all pending tables in one psycopg pipeline-mode
+        session (executemany) with a single commit.
+      - PG_UPSERT_DEDUP: collapse rows sharing upsert keys inside one batch
+        ("last" wins by default, "first" or "none"), so ON CONFLICT DO UPDATE
+        never sees the same key twice.
+      - PG_CHANGE_DETECTION: keep a key -> row-hash index per table (loaded once
+        per run from the table or a PG_DIGEST_SIDECAR_DIR file) and drop rows
+        whose content is unchanged before they reach the buffer.
+      - Watermarks: spiders defining ``pg_watermark(pipeline)`` are called at
+        open and may ask ``pipeline.fetch_watermark()`` for ``max(date)`` of their
+        rows to crawl incrementally.
+      - PG_SCHEMA_CACHE_PATH: table columns/types are cached per process and on
+        disk, revalidated by a pg_class/pg_attribute version check.
+      - PG_SPOOL_ENABLED: when PostgreSQL is unreachable at open or drops mid-run,
+        batches are appended to local segment files under PG_SPOOL_DIR and can be
+        bulk-loaded later with ``scrapy pg_replay``.
+      - PG_MAX_WRITERS: above 1, table flushes run on a pool of writer threads
+        with their own connections, at most one in flight per table, so
+        multi-table spiders write concurrently. Ignored in pipeline mode.
+      - Stats: per-table ``pg/<table>/*`` counters (rows buffered/flushed/skipped,
+        flushes, flush latency p50/p95/max, approximate bytes sent, retries,
+        fallbacks); every PG_STATS_INTERVAL seconds a rows/sec line is logged.
     """
 
-
-
     def __init__(
-
         self,
-
         dsn: str,
-
         table: Optional[str] = None,
-
         upsert_keys: Optional[Sequence[str]] = None,
-
         schema: Optional[str] = None,
-
         create_index_on_upsert_keys: bool = True,
-
         batch_size: int = 1,
-
         use_existing_table: bool = False,
-
         field_map: Optional[Dict[str, str]] = None,
-
         static_fields: Optional[Dict[str, Any]] = None,
-
         strict_columns: bool = True,
-
+        dead_letter_table: Optional[str] = None,
+        dead_letter_path: Optional[str] = None,
+        pipeline_mode: bool = False,
+        upsert_dedup: str = "last",
+        change_detection: bool = False,
+        change_keys: Optional[Sequence[str]] = None,
+        change_ignore_columns: Optional[Sequence[str]] = None,
+        digest_sidecar_dir: Optional[str] = None,
+        schema_cache_path: Optional[str] = None,
+        partition_by: Optional[str] = None,
+        partition_column: str = "date",
+        spool_enabled: bool = False,
+        spool_dir: str = "outputs/pg_spool",
+        spool_compression: str = "zstd",
+        connect_timeout: int = 10,
+        statement_timeout_ms: int = 0,
+        max_writers: int = 1,
+        stats_interval: float = 60.0,
+        stats=None,
     ) -> None:
-
         self.dsn = dsn
-
         self.table = table
-
         self.upsert_keys = list(upsert_keys) if upsert_keys else None
-
         self.schema = schema
-
         self.create_index_on_upsert_keys = create_index_on_upsert_keys
-
         self.batch_size = max(1, batch_size)
 
-
-
         self.use_existing_table = use_existing_table
-
         self.field_map = field_map or {}
-
         self.static_fields = static_fields or {}
-
         self.strict_columns = strict_columns
 
-
+        self.dead_letter_table = dead_letter_table
+        self.dead_letter_path = dead_letter_path
+        self.pipeline_mode = pipeline_mode
+        self.upsert_dedup = upsert_dedup
+        self.change_detection = change_detection
+        self.change_keys = list(change_keys) if change_keys else None
+        self.change_ignore_columns = list(change_ignore_columns or ())
+        self.digest_sidecar_dir = digest_sidecar_dir
+        self.schema_cache = SchemaCache(schema_cache_path)
+        self.partition_by = partition_by
+        self.partition_column = partition_column
+        self.spool_enabled = spool_enabled
+        self.spool_dir = spool_dir
+        self.spool_compression = spool_compression
+        self.connect_timeout = connect_timeout
+        self.statement_timeout_ms = statement_timeout_ms
+        self.max_writers = max(1, max_writers)
+        self.stats_interval = stats_interval
+        self.stats = stats
 
         self.conn: Optional[psycopg.Connection] = None
-
         self.cur: Optional[psycopg.Cursor] = None
 
+        self._table_states: Dict[str, _TableState] = {}
 
+        self._dead_letter_file = None
+        self._dead_letter_table_ready: bool = False
 
-        self._created: bool = False
-
-        self._col_types: Dict[str, str] = {}
-
-        self._buffer: List[Dict[str, Any]] = []
-
-        self._table_columns: Optional[set[str]] = None
-
-        self._table_states: Dict[str, Dict[str, Any]] = {}
-
-        self.target_table: Optional[str] = None
+        self._spool: Optional[SpoolWriter] = None
+        self._spool_prefix = "pg"
 
+        # 后台写入：统计、死信与 spool 文件在多个线程间共享，统一用一把锁
+        self._lock = threading.RLock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pool: Optional[_ConnectionPool] = None
+        self._writer_error: Optional[Exception] = None
 
+        self._stats_task: Optional[task.LoopingCall] = None
+        self._rows_in = 0
+        self._rows_out = 0
+        self._last_tick = (time.monotonic(), 0, 0)
 
     def _apply_spider_overrides(self, spider) -> None:
-
         """Allow spiders to override PG* settings via attributes or a dict."""
-
         attr_map = {
-
             'pg_dsn': 'dsn',
-
             'pg_table': 'table',
-
             'pg_schema': 'schema',
-
             'pg_upsert_keys': 'upsert_keys',
-
             'pg_create_index_on_upsert_keys': 'create_index_on_upsert_keys',
-
             'pg_batch_size': 'batch_size',
-
             'pg_use_existing_table': 'use_existing_table',
-
             'pg_field_map': 'field_map',
-
             'pg_static_fields': 'static_fields',
-
             'pg_strict_columns': 'strict_columns',
-
+            'pg_dead_letter_table': 'dead_letter_table',
+            'pg_dead_letter_path': 'dead_letter_path',
+            'pg_pipeline_mode': 'pipeline_mode',
+            'pg_upsert_dedup': 'upsert_dedup',
+            'pg_change_detection': 'change_detection',
+            'pg_change_keys': 'change_keys',
+            'pg_change_ignore_columns': 'change_ignore_columns',
+            'pg_digest_sidecar_dir': 'digest_sidecar_dir',
+            'pg_partition_by': 'partition_by',
+            'pg_partition_column': 'partition_column',
+            'pg_spool_enabled': 'spool_enabled',
+            'pg_spool_dir': 'spool_dir',
+            'pg_max_writers': 'max_writers',
         }
 
-
-
         def apply(attr: str, value):
-
-            if value is None:
-
-                return
-
-            if attr == 'upsert_keys' and value is not None:
-
+            if attr in {'upsert_keys', 'change_keys', 'change_ignore_columns'}:
                 value = list(value) if value else []
-
-            elif attr == 'batch_size':
-
+            elif attr in {'batch_size', 'max_writers'}:
                 value = max(1, int(value))
-
             elif attr in {'field_map', 'static_fields'}:
-
                 value = dict(value)
-
+            elif attr == 'partition_by':
+                value = str(value).lower() or None
+                if value not in {None, 'month', 'year'}:
+                    raise ValueError(f"pg_partition_by must be 'month' or 'year', got {value!r}")
+            elif attr == 'upsert_dedup':
+                value = str(value).lower()
+                if value not in {'last', 'first', 'none'}:
+                    raise ValueError(f"pg_upsert_dedup must be 'last', 'first' or 'none', got {value!r}")
             setattr(self, attr, value)
 
-
-
-        config = getattr(spider, 'pg_pipeline', None)
-
-        if callable(config):
-
-            config = config()
-
-        if isinstance(config, dict):
-
-            for key, attr in attr_map.items():
-
-                if key in config:
-
-                    apply(attr, config[key])
-
-
-
-        for key, attr in attr_map.items():
-
-            if hasattr(spider, key):
-
-                apply(attr, getattr(spider, key))
-
-
+        for key, value in spider_pg_config(spider, attr_map).items():
+            apply(attr_map[key], value)
 
     @classmethod
-
     def from_crawler(cls, crawler):
-
         s = crawler.settings
-
-
-
-        dsn = s.get("PG_DSN")
-
-        if not dsn:
-
-            parts = {
-
-                "host": s.get("PG_HOST", "localhost"),
-
-                "port": s.getint("PG_PORT", 5432),
-
-                "dbname": s.get("PG_DATABASE") or s.get("PG_DB"),
-
-                "user": s.get("PG_USER"),
-
-                "password": s.get("PG_PASSWORD"),
-
-            }
-
-            if not parts["dbname"]:
-
-                raise ValueError("PG_DSN or PG_DATABASE/PG_DB must be configured.")
-
-            dsn = " ".join(f"{k}={v}" for k, v in parts.items() if v is not None)
-
-
-
         return cls(
-
-            dsn=dsn,
-
+            dsn=dsn_from_settings(s),
             table=s.get("PG_TABLE"),
-
             upsert_keys=s.getlist("PG_UPSERT_KEYS") or None,
-
             schema=s.get("PG_SCHEMA"),
-
             create_index_on_upsert_keys=s.getbool("PG_CREATE_INDEX_ON_UPSERT_KEYS", True),
-
             batch_size=s.getint("PG_BATCH_SIZE", 1),
-
             use_existing_table=s.getbool("PG_USE_EXISTING_TABLE", False),
-
             field_map=s.getdict("PG_FIELD_MAP", {}),
-
             static_fields=s.getdict("PG_STATIC_FIELDS", {}),
-
             strict_columns=s.getbool("PG_STRICT_COLUMNS", True),
-
+            dead_letter_table=s.get("PG_DEAD_LETTER_TABLE"),
+            dead_letter_path=s.get("PG_DEAD_LETTER_PATH"),
+            pipeline_mode=s.getbool("PG_PIPELINE_MODE", False),
+            upsert_dedup=s.get("PG_UPSERT_DEDUP", "last"),
+            change_detection=s.getbool("PG_CHANGE_DETECTION", False),
+            change_keys=s.getlist("PG_CHANGE_KEYS") or None,
+            change_ignore_columns=s.getlist("PG_CHANGE_IGNORE_COLUMNS", ["created", "updated"]),
+            digest_sidecar_dir=s.get("PG_DIGEST_SIDECAR_DIR"),
+            schema_cache_path=s.get("PG_SCHEMA_CACHE_PATH"),
+            partition_by=s.get("PG_PARTITION_BY") or None,
+            partition_column=s.get("PG_PARTITION_COLUMN", "date"),
+            spool_enabled=s.getbool("PG_SPOOL_ENABLED", False),
+            spool_dir=s.get("PG_SPOOL_DIR", "outputs/pg_spool"),
+            spool_compression=s.get("PG_SPOOL_COMPRESSION", "zstd"),
+            connect_timeout=s.getint("PG_CONNECT_TIMEOUT", 10),
+            statement_timeout_ms=s.getint("PG_STATEMENT_TIMEOUT_MS", 0),
+            max_writers=s.getint("PG_MAX_WRITERS", 1),
+            stats_interval=s.getfloat("PG_STATS_INTERVAL", 60.0),
+            stats=crawler.stats,
         )
 
-
-
     # ---------- Scrapy lifecycle ----------
 
     def open_spider(self, spider):
         self._apply_spider_overrides(spider)
         if not self.dsn:
             raise ValueError("PG_DSN must be configured via settings or spider overrides.")
-        self.conn = psycopg.connect(self.dsn, autocommit=False, row_factory=dict_row)
-        self.cur = self.conn.cursor()
         self._table_states = {}
-        self.target_table = self.table or spider.name
+        self._spool_prefix = spider.name
+        self._writer_error = None
+        try:
+            self.conn = self._open_connection()
+            self.cur = self.conn.cursor()
+        except psycopg.OperationalError as e:
+            if not self.spool_enabled:
+                raise
+            self._enter_spool_mode(e)
+
+        if self.conn is not None and self.max_writers > 1 and not self.pipeline_mode:
+            self._pool = _ConnectionPool(self._open_connection)
+            self._executor = ThreadPoolExecutor(max_workers=self.max_writers, thread_name_prefix="pg-writer")
+
+        self._rows_in = self._rows_out = 0
+        self._last_tick = (time.monotonic(), 0, 0)
+        if self.stats_interval > 0:
+            self._stats_task = task.LoopingCall(self._log_throughput)
+            self._stats_task.start(self.stats_interval, now=False)
+
+        if self.partition_by and not self.use_existing_table and self.upsert_keys \
+                and self.partition_column not in self.upsert_keys:
+            # 分区表上的唯一索引必须包含分区键，ON CONFLICT 目标随之扩展
+            logger.warning(
+                "[PG][Partition] adding partition column %r to upsert keys %s",
+                self.partition_column, self.upsert_keys,
+            )
+            self.upsert_keys = self.upsert_keys + [self.partition_column]
+
+        hook = getattr(spider, 'pg_watermark', None)
+        if callable(hook):
+            hook(self)
+
+    def _open_connection(self) -> psycopg.Connection:
+        kwargs: Dict[str, Any] = {"autocommit": False, "row_factory": dict_row}
+        if self.connect_timeout:
+            kwargs["connect_timeout"] = self.connect_timeout
+        if self.statement_timeout_ms:
+            kwargs["options"] = f"-c statement_timeout={int(self.statement_timeout_ms)}"
+        return psycopg.connect(self.dsn, **kwargs)
+
+    def _enter_spool_mode(self, error: Exception) -> None:
+        """Stop talking to PostgreSQL for the rest of the run; batches go to local segments."""
+        logger.warning(
+            "[PG][Spool] PostgreSQL unavailable (%s: %s), spooling batches to %s",
+            type(error).__name__, str(error).strip(), self.spool_dir,
+        )
+        self._stat_inc("pg/spool_activations")
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except psycopg.Error:
+                pass
+        self.conn = None
+        self.cur = None
 
-    def _ensure_table_state(self, table: str) -> Dict[str, Any]:
+    def fetch_watermark(
+        self,
+        table: Optional[str] = None,
+        column: str = "date",
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        """
+        Return ``max(column)`` of ``table`` (default: the configured table),
+        restricted to rows matching ``filters`` (default: the static fields,
+        e.g. ``source``). Filters on columns the table lacks are ignored.
+        Returns None when the table is missing or empty, and when PostgreSQL
+        is unreachable (spool mode), which is logged as a warning.
+        """
+        table = table or self.table
+        if self.cur is None:
+            logger.warning(
+                "[PG][Spool] PostgreSQL unavailable, no stored watermark for %s; "
+                "incremental spiders crawl their full history this run",
+                table,
+            )
+            self._stat_inc("pg/watermark_unavailable")
+            return None
+        if not table:
+            return None
+        columns = self._fetch_table_columns(table)
+        if column not in columns:
+            return None
+        if filters is None:
+            filters = self.static_fields
+        filters = {k: v for k, v in filters.items() if k in columns}
+
+        query = sql.SQL("SELECT max({col}) AS mark FROM {tbl}").format(
+            col=sql.Identifier(column),
+            tbl=self._qualified(table),
+        )
+        if filters:
+            query = sql.Composed([
+                query,
+                sql.SQL(" WHERE "),
+                sql.SQL(" AND ").join(
+                    sql.SQL("{} = %s").format(sql.Identifier(k)) for k in filters
+                ),
+            ])
+        self.cur.execute(query, list(filters.values()))
+        mark = self.cur.fetchone()["mark"]
+        self.conn.commit()
+        return mark
+
+    def _ensure_table_state(self, table: str) -> _TableState:
         state = self._table_states.get(table)
         if state is None:
-            state = {"buffer": [], "col_types": {}, "table_columns": None, "created": False}
+            state = _TableState(table)
+            if self.use_existing_table:
+                cols = self._fetch_table_columns(table)
+                if cols:
+                    state.table_columns = cols
+                    state.col_types = dict(cols)
+                elif self.conn is not None:
+                    raise RuntimeError(f"Table not found or has no columns: {self.schema or 'public'}.{table}")
+                else:
+                    # 离线且没有缓存的表结构：不裁剪列，回放时再按实际表结构过滤
+                    logger.warning("[PG][Spool] no cached columns for %s, spooling unpruned rows", table)
+                if self.cur is not None:
+                    self._load_partitions(state)
+                state.created = True
             self._table_states[table] = state
-        if self.use_existing_table and state["table_columns"] is None:
-            cols = self._fetch_table_columns(table)
-            if not cols:
-                raise RuntimeError(f"Table not found or has no columns: {self.schema or 'public'}.{table}")
-            state["table_columns"] = cols
-            state["created"] = True
-        self.target_table = table
-        self._buffer = state["buffer"]
-        self._col_types = state["col_types"]
-        self._table_columns = state["table_columns"]
-        self._created = state["created"]
         return state
 
-    def _sync_state(self, table: str) -> None:
-        state = self._table_states[table]
-        state["buffer"] = self._buffer
-        state["col_types"] = self._col_types
-        state["table_columns"] = self._table_columns
-        state["created"] = self._created
-
-
     def close_spider(self, spider):
+        if self._stats_task is not None and self._stats_task.running:
+            self._stats_task.stop()
+        self._stats_task = None
         try:
-            for table in list(self._table_states.keys()):
-                self._ensure_table_state(table)
-                self._flush()
-                self._sync_state(table)
+            try:
+                self._flush_all()
+            finally:
+                self._wait_writers()
+            self._log_throughput()
+            self._save_digest_sidecars()
+            self.schema_cache.save()
         finally:
+            if self._dead_letter_file is not None:
+                self._dead_letter_file.close()
+                self._dead_letter_file = None
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
+            if self._spool is not None:
+                self._spool.close()
+                logger.warning(
+                    "[PG][Spool] %s rows spooled to %s; load them with `scrapy pg_replay`",
+                    self._spool.rows_written, self.spool_dir,
+                )
+                self._spool = None
             if self.cur:
                 self.cur.close()
             if self.conn:
@@ -308,372 +818,843 @@ class PostgresPipeline:
         if not target_table:
             return item
 
-        self._ensure_table_state(target_table)
-
-        # Apply mapping
-        mapped: Dict[str, Any] = {}
-        for k, v in data.items():
-            col = self.field_map.get(k, k)
-            mapped[col] = v
+        state = self._ensure_table_state(target_table)
+        keys = tuple(data)
+        plan = state.plans.get(keys)
+        if plan is None:
+            plan = self._compile_plan(state, keys)
+        if not plan.positions:
+            return item
 
-        # Add static fields
-        for k, v in self.static_fields.items():
-            mapped[k] = v
+        row = list(plan.template)
+        for key, pos in plan.pairs:
+            row[pos] = data[key]
 
-        # If using existing table, prune to available columns
-        if self.use_existing_table:
-            assert self._table_columns is not None
-            if self.strict_columns:
-                mapped = {k: mapped[k] for k in list(mapped.keys()) if k in self._table_columns}
+        if not state.created:
+            self._infer_column_types(state, dict(zip(state.columns, row)))
+            if self.conn is not None:
+                self._ensure_schema_and_table_exists(state)
             else:
-                mapped = {k: v for k, v in mapped.items() if k in self._table_columns}
+                state.created = True
 
-        if not mapped:
-            self._sync_state(target_table)
+        row = tuple(row)
+        if self.change_detection and not self._row_changed(state, plan, row):
             return item
 
-        if not self.use_existing_table and not self._created:
-            self._infer_column_types(mapped)
-            self._ensure_schema_and_table_exists()
-        self._sync_state(target_table)
-
-        self._buffer.append(mapped)
-        if len(self._buffer) >= self.batch_size:
-            self._flush()
-        self._sync_state(target_table)
+        state.buffer.append(row)
+        state.pending_positions |= plan.positions
+        self._rows_in += 1
+        self._table_stat(state.name, "rows_buffered")
+        if len(state.buffer) >= self.batch_size:
+            if self.pipeline_mode:
+                self._flush_all()
+            else:
+                self._flush(state)
         return item
 
+    def _compile_plan(self, state: _TableState, keys: tuple) -> _ProjectionPlan:
+        """
+        Resolve field_map, static_fields and (for existing tables) the column
+        whitelist once per incoming key set; later items reuse the plan.
+        """
+        allowed = state.table_columns
+
+        # 后出现的键覆盖先出现的键，静态列优先级最高（与逐条映射时的 dict 语义一致）
+        sources: Dict[str, str] = {}
+        for key in keys:
+            col = self.field_map.get(key, key)
+            if col in self.static_fields:
+                continue
+            if allowed is not None and col not in allowed:
+                continue
+            sources[col] = key
+
+        statics = {
+            col: value for col, value in self.static_fields.items()
+            if allowed is None or col in allowed
+        }
+
+        pairs = [(key, state.position(col)) for col, key in sources.items()]
+        bound = [(state.position(col), value) for col, value in statics.items()]
+
+        template: List[Any] = [None] * len(state.columns)
+        for pos, value in bound:
+            template[pos] = value
+
+        plan = _ProjectionPlan(
+            pairs,
+            template,
+            frozenset(pos for _, pos in pairs) | frozenset(pos for pos, _ in bound),
+        )
+        state.plans[keys] = plan
+        return plan
+
+    # ---------- Change detection ----------
+
+    def _row_changed(self, state: _TableState, plan: _ProjectionPlan, row: tuple) -> bool:
+        index = state.digest
+        if index is None:
+            index = state.digest = self._load_digest_index(state, plan)
+        if index is False:
+            return True
+        result = index.check(row)
+        if result is False:
+            self._stat_inc("pg/rows_unchanged_skipped")
+            self._table_stat(state.name, "rows_skipped")
+            return False
+        self._stat_inc("pg/rows_new" if result is None else "pg/rows_changed")
+        return True
+
+    def _digest_sidecar_path(self, table: str) -> Optional[Path]:
+        if not self.digest_sidecar_dir:
+            return None
+        return Path(self.digest_sidecar_dir) / f"{self.schema or 'public'}.{table}.digest"
+
+    def _load_digest_index(self, state: _TableState, plan: _ProjectionPlan) -> Any:
+        """
+        Build the key -> row-hash index for ``state`` once per run. Hashed
+        columns are those of the first plan seen, minus keys and ignored columns.
+        """
+        keys = self.change_keys or self.upsert_keys
+        if not keys:
+            logger.warning("[PG][Digest] table=%s has no PG_CHANGE_KEYS/PG_UPSERT_KEYS, change detection off", state.name)
+            return False
+        ignore = set(keys) | set(self.change_ignore_columns)
+        value_cols = sorted(state.columns[p] for p in plan.positions if state.columns[p] not in ignore)
+        index = DigestIndex(
+            keys,
+            value_cols,
+            [state.position(c) for c in keys],
+            [state.position(c) for c in value_cols],
+            state.converter,
+        )
+
+        sidecar = self._digest_sidecar_path(state.name)
+        if sidecar is not None and index.load_sidecar(sidecar):
+            logger.info("[PG][Digest] table=%s loaded %s hashes from %s", state.name, len(index.entries), sidecar)
+            return index
+        if self.conn is None:
+            return False
+        select = sql.SQL("SELECT {cols} FROM {tbl}").format(
+            cols=sql.SQL(", ").join(sql.Identifier(c) for c in list(keys) + value_cols),
+            tbl=self._qualified(state.name),
+        )
+        try:
+            with self.conn.cursor(name=f"digest_{state.name}", row_factory=tuple_row) as cur:
+                cur.itersize = 10000
+                cur.execute(select)
+                for record in cur:
+                    index.add_stored(record)
+            self.conn.commit()
+        except psycopg.Error as e:
+            self.conn.rollback()
+            if self.conn.broken:
+                raise
+            logger.warning("[PG][Digest] table=%s cannot load hashes (%s), change detection off", state.name, e)
+            return False
+        index.dirty = True
+        logger.info("[PG][Digest] table=%s loaded %s hashes from database", state.name, len(index.entries))
+        return index
+
+    def _save_digest_sidecars(self) -> None:
+        for state in self._table_states.values():
+            index = state.digest
+            sidecar = self._digest_sidecar_path(state.name)
+            if sidecar is not None and index and index.dirty:
+                index.save_sidecar(sidecar)
+
     # ---------- Internals ----------
 
-    def _fetch_table_columns(self, table: str) -> set[str]:
+    def _stat_inc(self, key: str, count: int = 1) -> None:
+        if self.stats is not None:
+            with self._lock:
+                self.stats.inc_value(key, count)
+
+    def _table_stat(self, table: str, key: str, count: int = 1) -> None:
+        self._stat_inc(f"pg/{table}/{key}", count)
+
+    # ---------- Throughput / latency ----------
+
+    def _record_written(self, table: str, count: int) -> None:
+        self._stat_inc("pg/rows_written", count)
+        self._table_stat(table, "rows_flushed", count)
+        with self._lock:
+            self._rows_out += count
+
+    def _record_flush(self, state: _TableState, rows: Sequence[tuple], started: float) -> None:
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        with self._lock:
+            state.flush_ms.append(elapsed_ms)
+            state.flush_max_ms = max(state.flush_max_ms, elapsed_ms)
+        self._table_stat(state.name, "flushes")
+        self._table_stat(state.name, "bytes_sent", _estimate_bytes(rows))
+
+    def _publish_latency(self) -> tuple:
+        """
+        Set per-table flush latency percentiles (over the recent window) and
+        maxima (over the run); return ``(recent latencies sorted, max)``.
+        """
+        overall: List[float] = []
+        overall_max = 0.0
+        for state in list(self._table_states.values()):
+            with self._lock:
+                values = sorted(state.flush_ms)
+                peak = state.flush_max_ms
+            if not values:
+                continue
+            overall.extend(values)
+            overall_max = max(overall_max, peak)
+            if self.stats is not None:
+                prefix = f"pg/{state.name}/flush_ms_"
+                self.stats.set_value(prefix + "p50", round(_percentile(values, 0.50), 1))
+                self.stats.set_value(prefix + "p95", round(_percentile(values, 0.95), 1))
+                self.stats.set_value(prefix + "max", round(peak, 1))
+        overall.sort()
+        return overall, overall_max
+
+    def _log_throughput(self) -> None:
+        """
+        Periodic rows/sec line: a growing buffer with ``out`` below ``in`` means
+        the database is the bottleneck, idle writers mean the crawl is.
+        """
+        now = time.monotonic()
+        last_t, last_in, last_out = self._last_tick
+        with self._lock:
+            rows_out = self._rows_out
+        self._last_tick = (now, self._rows_in, rows_out)
+        elapsed = max(now - last_t, 1e-6)
+        latencies, peak = self._publish_latency()
+        states = list(self._table_states.values())
+        logger.info(
+            "[PG][Stats] in %.1f rows/s, out %.1f rows/s, buffered %d, writers busy %d, "
+            "flush p50 %.1f ms p95 %.1f ms max %.1f ms",
+            (self._rows_in - last_in) / elapsed,
+            (rows_out - last_out) / elapsed,
+            sum(len(st.buffer) for st in states),
+            sum(1 for st in states if st.inflight is not None and not st.inflight.done()),
+            _percentile(latencies, 0.50),
+            _percentile(latencies, 0.95),
+            peak,
+        )
+
+    def _qualified(self, table: str):
+        return _qualified_name(self.schema, table)
+
+    def _fetch_table_columns(self, table: str) -> Dict[str, str]:
+        """
+        Return ``{column_name: data_type}`` for an existing table, served from
+        the schema cache while the table's catalog version is unchanged.
+        """
+        key = schema_cache_key(self.dsn, self.schema, table)
+        cached = self.schema_cache.lookup(key)
+        if self.cur is None:
+            return dict(cached["columns"]) if cached else {}
+
+        self.cur.execute(CATALOG_VERSION_SQL, (self.schema, table))
+        version = catalog_version(self.cur.fetchone())
+        if version is None:
+            return {}
+        if cached and cached["version"] == version:
+            self._stat_inc("pg/schema_cache_hits")
+            return dict(cached["columns"])
+
+        self._stat_inc("pg/schema_cache_misses")
+        columns = self._query_table_columns(table)
+        if columns:
+            self.schema_cache.store(key, version, columns)
+        return columns
+
+    def _query_table_columns(self, table: str) -> Dict[str, str]:
         assert self.cur is not None
         if self.schema:
             q = """
-                SELECT column_name
+                SELECT column_name, data_type
                 FROM information_schema.columns
                 WHERE table_schema = %s AND table_name = %s
             """
             self.cur.execute(q, (self.schema, table))
         else:
             q = """
-                SELECT column_name
+                SELECT column_name, data_type
                 FROM information_schema.columns
                 WHERE table_schema = current_schema() AND table_name = %s
             """
             self.cur.execute(q, (table,))
         rows = self.cur.fetchall()
-        return {r["column_name"] for r in rows}
-
-
-    def _infer_column_types(self, sample: Dict[str, Any]) -> None:
-
-        def guess(v: Any) -> str:
-
-            if isinstance(v, bool):
-
-                return "BOOLEAN"
-
-            if isinstance(v, int) and not isinstance(v, bool):
-
-                return "BIGINT"
-
-            if isinstance(v, float):
-
-                return "DOUBLE PRECISION"
-
-            if isinstance(v, dt.datetime):
-
-                return "TIMESTAMP"
-
-            if isinstance(v, dt.date):
-
-                return "DATE"
-
-            if isinstance(v, (list, dict)):
-
-                return "JSONB"
-
-            return "TEXT"
-
-
+        return {r["column_name"]: r["data_type"] for r in rows}
 
+    def _infer_column_types(self, state: _TableState, sample: Dict[str, Any]) -> None:
+        # 数值 / 日期字符串（"1,234"、"2025-09-01"）建成对应类型的列，flush 时按列类型转换；
+        # 编号类列与空值（无法推断）建成 TEXT
         for k, v in sample.items():
-
-            self._col_types[k] = guess(v)
-
-
+            data_type = None if is_id_column(k) else infer_value_type(v)
+            state.col_types[k] = (data_type or "text").upper()
 
         # Ensure upsert keys exist as columns if needed
-
         if self.upsert_keys:
-
             for k in self.upsert_keys:
+                if k not in state.col_types:
+                    state.col_types[k] = "TEXT"
 
-                if k not in self._col_types:
-
-                    self._col_types[k] = "TEXT"
-
-
-
-    def _ensure_schema_and_table_exists(self) -> None:
+        # 分区列按日期建表，字符串日期在 flush 时转换
+        if self.partition_by:
+            state.col_types[self.partition_column] = "DATE"
 
+    def _ensure_schema_and_table_exists(self, state: _TableState) -> None:
         # Legacy: only when not using existing table
-
         assert self.cur is not None
-
         schema = self.schema
-
-        table = self.target_table
-
-
+        table = state.name
 
         if schema:
-
             self.cur.execute(
-
                 sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(sql.Identifier(schema))
-
             )
 
-
+        # 表已存在（早先运行建的表可能全是 TEXT 列）时按实际列类型转换，而不是按推断
+        existing = self._fetch_table_columns(table)
+        for name, typ in existing.items():
+            if name in state.col_types:
+                state.col_types[name] = typ
 
         cols_def = sql.SQL(", ").join(
-
             sql.SQL("{} {}").format(sql.Identifier(name), sql.SQL(typ))
-
-            for name, typ in self._col_types.items()
-
+            for name, typ in state.col_types.items()
         )
 
-
-
         create_stmt = sql.SQL("CREATE TABLE IF NOT EXISTS {tbl} ({cols})").format(
-
-            tbl=sql.SQL("{}.{}").format(sql.Identifier(schema), sql.Identifier(table))
-
-            if schema else sql.Identifier(table),
-
+            tbl=self._qualified(table),
             cols=cols_def,
-
         )
-
+        if self.partition_by:
+            create_stmt = sql.Composed([
+                create_stmt,
+                sql.SQL(" PARTITION BY RANGE ({})").format(sql.Identifier(self.partition_column)),
+            ])
         self.cur.execute(create_stmt)
 
-
+        if self.partition_by:
+            self._init_partitioned_table(state)
 
         if self.upsert_keys and self.create_index_on_upsert_keys:
-
             idx = f"ux_{(schema + '_' if schema else '')}{table}_" + "_".join(self.upsert_keys)
-
             self.cur.execute(
-
                 sql.SQL("CREATE UNIQUE INDEX IF NOT EXISTS {} ON {tbl} ({cols})").format(
-
                     sql.Identifier(idx),
-
-                    tbl=sql.SQL("{}.{}").format(sql.Identifier(schema), sql.Identifier(table))
-
-                    if schema else sql.Identifier(table),
-
+                    tbl=self._qualified(table),
                     cols=sql.SQL(", ").join(sql.Identifier(k) for k in self.upsert_keys),
-
                 )
-
             )
 
-
-
         self.conn.commit()
+        state.created = True
 
-        self._created = True
-
-
-
-    def _flush(self) -> None:
-
-        if not self._buffer:
-
-            return
+    # ---------- Time partitions ----------
 
+    def _load_partitions(self, state: _TableState) -> bool:
+        """
+        Detect a table partitioned by RANGE on a single date column and load
+        the ranges its partitions already cover. Leaves ``state.partitions``
+        as None (no partition management) for any other table.
+        """
         assert self.cur is not None
+        table = state.name
+        self.cur.execute(_PARTITION_INFO_SQL, (self.schema, table))
+        row = self.cur.fetchone()
+        if not row or row["relkind"] != "p":
+            return False
+        if row["partstrat"] != "r" or row["partnatts"] != 1 or not row["partkey"]:
+            logger.info("[PG][Partition] table=%s is not range-partitioned on one column, writing as-is", table)
+            return False
+
+        self.cur.execute(_PARTITION_BOUNDS_SQL, (row["oid"],))
+        ranges = []
+        try:
+            for r in self.cur.fetchall():
+                rng = parse_range_bound(r["bound"])
+                if rng is not None:
+                    ranges.append(rng)
+        except ValueError:
+            logger.info("[PG][Partition] table=%s is not partitioned by date, writing as-is", table)
+            return False
+
+        state.partition_key = row["partkey"]
+        state.partition_ranges = ranges
+        state.partitions = set()
+        logger.info(
+            "[PG][Partition] table=%s partitioned by %s, %s existing range partitions",
+            table, state.partition_key, len(ranges),
+        )
+        return True
 
+    def _init_partitioned_table(self, state: _TableState) -> None:
+        """Default partition (NULL dates) and a BRIN index on the partition column."""
+        assert self.cur is not None
+        table = state.name
+        if not self._load_partitions(state):
+            logger.warning("[PG][Partition] table=%s already exists and is not partitioned, writing as-is", table)
+            return
 
-
-        rows = list(self._buffer)
-
-        self._buffer.clear()
-
-
-
-        # 统一列集合（防止每行字段不一致）
-
-        all_cols = set()
-
-        for r in rows:
-
-            all_cols.update(r.keys())
-
-        columns = sorted(all_cols)
-
-
-
-        # 参数矩阵，自动把 list/dict 转成 JSON
-
-        values_matrix = []
-
-        for r in rows:
-
-            row_vals = []
-
-            for c in columns:
-
-                v = r.get(c)
-
-                if isinstance(v, (list, dict)):
-
-                    row_vals.append(psycopg.types.json.Json(v))
-
-                else:
-
-                    row_vals.append(v)
-
-            values_matrix.append(tuple(row_vals))
-
-
-
-        tbl = (
-
-            sql.SQL("{}.{}").format(sql.Identifier(self.schema), sql.Identifier(self.target_table))
-
-            if self.schema else sql.Identifier(self.target_table)
-
+        self.cur.execute(
+            sql.SQL("CREATE TABLE IF NOT EXISTS {part} PARTITION OF {tbl} DEFAULT").format(
+                part=self._qualified(f"{table}_default"),
+                tbl=self._qualified(table),
+            )
+        )
+        self.cur.execute(
+            sql.SQL("CREATE INDEX IF NOT EXISTS {idx} ON {tbl} USING brin ({col})").format(
+                idx=sql.Identifier(f"brin_{table}_{state.partition_key}"),
+                tbl=self._qualified(table),
+                col=sql.Identifier(state.partition_key),
+            )
         )
 
+    def _ensure_partitions(
+        self, conn: psycopg.Connection, state: _TableState, columns: Sequence[str], rows: Sequence[tuple]
+    ) -> None:
+        """
+        Create the range partitions needed by ``rows`` that no partition covers
+        yet. Existing tables get partitions of ``partition_by`` granularity
+        (month by default); ranges overlapping partitions created by someone
+        else are left alone.
+        """
+        if state.partitions is None or not rows:
+            return
+        try:
+            idx = list(columns).index(state.partition_key)
+        except ValueError:
+            return
+        granularity = self.partition_by or "month"
+        needed = {}
+        for row in rows:
+            day = row[idx]
+            if isinstance(day, dt.date):
+                start, end, suffix = partition_bounds(day, granularity)
+                if start not in state.partitions:
+                    needed[start] = (end, suffix)
+        if not needed:
+            return
 
+        for start, (end, suffix) in sorted(needed.items()):
+            overlap = [(lo, hi) for lo, hi in state.partition_ranges if lo < end and start < hi]
+            if overlap:
+                if not any(lo <= start and end <= hi for lo, hi in overlap):
+                    logger.warning(
+                        "[PG][Partition] table=%s: %s..%s overlaps existing partitions %s, not adding one",
+                        state.name, start, end, overlap,
+                    )
+                continue
+            try:
+                with conn.transaction():
+                    conn.execute(partition_ddl(self.schema, state.name, start, end, suffix))
+            except psycopg.errors.CheckViolation as e:
+                # 默认分区里已有这段日期的行，新分区无法挂上；这些行继续写进默认分区
+                logger.warning(
+                    "[PG][Partition] table=%s: cannot add partition %s..%s (%s), rows go to the default partition",
+                    state.name, start, end, str(e).strip(),
+                )
+            else:
+                self._stat_inc("pg/partitions_ensured")
+            state.partition_ranges.append((start, end))
+        conn.commit()
+        state.partitions.update(needed)
 
+    def _build_insert(self, table: str, columns: Sequence[str], n_rows: int) -> sql.Composable:
         ins = sql.SQL("INSERT INTO {tbl} ({cols}) VALUES {vals}").format(
-
-            tbl=tbl,
-
+            tbl=self._qualified(table),
             cols=sql.SQL(", ").join(sql.Identifier(c) for c in columns),
-
             vals=sql.SQL(", ").join(
-
                 sql.SQL("({})").format(sql.SQL(", ").join(sql.Placeholder() for _ in columns))
-
-                for _ in values_matrix
-
+                for _ in range(n_rows)
             ),
-
         )
 
-
-
-        # 保留你原本的 UPSERT 行为（如果设置了 upsert_keys）
-
-        if getattr(self, "upsert_keys", None):
-
+        # 保留原本的 UPSERT 行为（如果设置了 upsert_keys）
+        if self.upsert_keys:
             set_clause_parts = []
-
             for c in columns:
-
                 if c in self.upsert_keys:
-
                     continue
-
                 set_clause_parts.append(
-
                     sql.SQL("{} = EXCLUDED.{}").format(sql.Identifier(c), sql.Identifier(c))
-
                 )
-
             if set_clause_parts:
-
                 on_conflict = sql.SQL(" ON CONFLICT ({keys}) DO UPDATE SET {setc}").format(
-
                     keys=sql.SQL(", ").join(sql.Identifier(k) for k in self.upsert_keys),
-
                     setc=sql.SQL(", ").join(set_clause_parts),
-
                 )
-
             else:
-
                 on_conflict = sql.SQL(" ON CONFLICT ({keys}) DO NOTHING").format(
-
                     keys=sql.SQL(", ").join(sql.Identifier(k) for k in self.upsert_keys)
-
                 )
-
             ins = sql.Composed([ins, on_conflict])
+        return ins
+
+    def _flush_all(self) -> None:
+        """
+        Flush every table with pending rows. In pipeline mode all statements
+        travel in one psycopg pipeline with a single commit, so latency is
+        paid once per flush cycle instead of once per table and statement.
+        """
+        states = [state for state in self._table_states.values() if state.buffer]
+        if not states:
+            return
+        if not self.pipeline_mode or self.conn is None:
+            # 某张表写入失败时其余表照常写入，最后抛出第一个错误
+            error = None
+            for state in states:
+                try:
+                    self._flush(state)
+                except Exception as e:
+                    error = error or e
+            if error is not None:
+                raise error
+            return
 
+        batches = []
+        for state in states:
+            columns, rows = self._prepare_batch(state)
+            if rows:
+                batches.append((state, columns, rows))
+        if not batches:
+            return
 
-
-        # ====== 新增：批量失败时自动回滚并逐条定位坏数据 ======
-
+        self._stat_inc("pg/pipeline_flushes")
+        started = time.perf_counter()
         try:
-
-            # 尝试批量插入
-
-            flat_params = []
-
-            for tup in values_matrix:
-
-                flat_params.extend(tup)
-
-            self.cur.execute(ins, flat_params)
-
+            for state, columns, rows in batches:
+                self._ensure_partitions(self.conn, state, columns, rows)
+            with self.conn.pipeline():
+                for state, columns, rows in batches:
+                    # executemany 在 pipeline 中按行各发一条 INSERT
+                    self._stat_inc("pg/statements", len(rows))
+                    self.cur.executemany(self._build_insert(state.name, columns, 1), rows)
             self.conn.commit()
-
-        except Exception as e:
-
-            # 事务已失败，先回滚以解除 "current transaction is aborted"
-
+        except psycopg.Error as e:
+            if self.spool_enabled and isinstance(e, psycopg.OperationalError):
+                self._spool_after_error(self.conn, e)
+                for state, columns, rows in batches:
+                    self._spool_batch(state, columns, rows)
+                return
             self.conn.rollback()
+            if self.conn.broken:
+                raise
+            self._stat_inc("pg/pipeline_fallbacks")
+            for state, _, _ in batches:
+                self._table_stat(state.name, "fallbacks")
+            logger.warning(
+                "[PG][PipelineFlushError] %s %s: %s; retrying tables one by one",
+                type(e).__name__, getattr(e, "sqlstate", None), str(e).strip(),
+            )
+            for state, columns, rows in batches:
+                self._write_batch(self.conn, state, columns, rows)
+            return
+        for state, columns, rows in batches:
+            self._record_written(state.name, len(rows))
+            self._record_flush(state, rows, started)
+            self._commit_digests(state, columns, rows)
+
+    def _flush(self, state: _TableState) -> None:
+        # 先等本表上一批写完再取缓冲区：保证同一张表的批次按顺序落库，
+        # 上一批失败时本批的行仍留在缓冲区里
+        self._wait_inflight(state)
+        if self._writer_error is not None and self.conn is not None:
+            # 后台写入线程发现数据库已断开，主线程随之切换到 spool
+            self._enter_spool_mode(self._writer_error)
+        columns, rows = self._prepare_batch(state)
+        if not rows:
+            return
+        if self._executor is None or self.conn is None:
+            self._write_batch(self.conn, state, columns, rows)
+        else:
+            state.inflight = self._executor.submit(self._writer_task, state, columns, rows)
+
+    def _wait_inflight(self, state: _TableState) -> None:
+        future, state.inflight = state.inflight, None
+        if future is not None:
+            future.result()
+
+    def _wait_writers(self) -> None:
+        error = None
+        for state in self._table_states.values():
+            try:
+                self._wait_inflight(state)
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+
+    def _writer_task(self, state: _TableState, columns: Sequence[str], rows: List[tuple]) -> None:
+        """Runs on a writer thread with a pooled connection."""
+        assert self._pool is not None
+        try:
+            conn = self._pool.get()
+        except psycopg.OperationalError as e:
+            if not self.spool_enabled:
+                raise
+            self._writer_error = e
+            self._spool_batch(state, columns, rows)
+            return
+        try:
+            self._write_batch(conn, state, columns, rows)
+        finally:
+            self._pool.put(conn)
 
-            # 打印批量错误的关键信息
-
-            print("[PG][BatchInsertError]", type(e).__name__, getattr(e, "pgcode", None), getattr(e, "pgerror", str(e)))
-
-
-
-            # 逐条尝试，找到第一条真正的坏数据
-
-            single_ins = sql.SQL("INSERT INTO {tbl} ({cols}) VALUES ({vals})").format(
+    def _write_batch(
+        self, conn: Optional[psycopg.Connection], state: _TableState, columns: Sequence[str], rows: List[tuple]
+    ) -> None:
+        """Write one prepared batch, spooling it locally when PostgreSQL is unreachable."""
+        if conn is None:
+            self._spool_batch(state, columns, rows)
+            return
+        started = time.perf_counter()
+        written: List[tuple] = []
+        settled: List[tuple] = []
+        try:
+            self._ensure_partitions(conn, state, columns, rows)
+            self._write_rows(conn, state.name, columns, rows, written, settled)
+        except psycopg.OperationalError as e:
+            if not self.spool_enabled:
+                raise
+            self._spool_after_error(conn, e)
+            # 二分过程中已提交或进入死信的行不再落盘，避免回放时重复写入
+            done = {id(r) for r in settled}
+            rest = [r for r in rows if id(r) not in done]
+            if rest:
+                self._spool_batch(state, columns, rest)
+            return
+        finally:
+            self._commit_digests(state, columns, written)
+        self._record_flush(state, rows, started)
 
-                tbl=tbl,
+    def _commit_digests(self, state: _TableState, columns: Sequence[str], rows: Sequence[tuple]) -> None:
+        """Move the hashes of rows that reached the database into the change-detection index."""
+        if state.digest and rows:
+            with self._lock:
+                state.digest.commit(columns, rows)
 
-                cols=sql.SQL(", ").join(sql.Identifier(c) for c in columns),
+    # ---------- Local spool ----------
 
-                vals=sql.SQL(", ").join(sql.Placeholder() for _ in columns),
+    def _spool_after_error(self, conn: psycopg.Connection, error: Exception) -> None:
+        if conn.broken:
+            if conn is self.conn:
+                self._enter_spool_mode(error)
+            else:
+                self._writer_error = error
+            return
+        # 语句超时等：连接仍可用，本批次落盘，后续批次继续写库
+        conn.rollback()
+        logger.warning(
+            "[PG][Spool] %s: %s; spooling this batch",
+            type(error).__name__, str(error).strip(),
+        )
 
+    def _spool_batch(self, state: _TableState, columns: Sequence[str], rows: List[tuple]) -> None:
+        with self._lock:
+            if self._spool is None:
+                self._spool = SpoolWriter(self.spool_dir, prefix=self._spool_prefix, compression=self.spool_compression)
+            self._spool.write_batch(
+                self.schema,
+                state.name,
+                columns,
+                rows,
+                upsert_keys=self.upsert_keys,
+                partition_by=None if self.use_existing_table else self.partition_by,
+                partition_column=state.partition_key or self.partition_column,
             )
+        self._stat_inc("pg/rows_spooled", len(rows))
+        self._table_stat(state.name, "rows_spooled", len(rows))
+        self._table_stat(state.name, "fallbacks")
+
+    def _prepare_batch(self, state: _TableState) -> tuple:
+        """Drain ``state.buffer`` into ``(columns, rows)`` ready for INSERT."""
+        if not state.buffer:
+            return [], []
+
+        rows = state.buffer
+        state.buffer = []
+        positions = sorted(state.pending_positions)
+        state.pending_positions = set()
+        if state.digest:
+            # 暂存的哈希随缓冲区一起清空，写库成功的行再经 _commit_digests 记入索引
+            state.digest.drop_staged()
+
+        # 只写本批次实际出现过的列；较早编译的行元组可能比当前列布局短
+        width = len(state.columns)
+        columns = [state.columns[p] for p in positions]
+        full = len(positions) == width
 
-            if getattr(self, "upsert_keys", None):
-
-                single_ins = sql.Composed([single_ins, on_conflict])
-
-
-
-            for row in values_matrix:
+        values_matrix = []
+        for r in rows:
+            if len(r) < width:
+                r = r + (None,) * (width - len(r))
+            if not full:
+                r = tuple(r[p] for p in positions)
+            values_matrix.append(r)
+
+        values_matrix = self._coerce_rows(state, columns, values_matrix)
+        n_rows = len(values_matrix)
+        values_matrix = self._dedup_rows(columns, values_matrix)
+        if len(values_matrix) < n_rows:
+            self._table_stat(state.name, "rows_deduplicated", n_rows - len(values_matrix))
+        return columns, values_matrix
+
+    def _dedup_rows(self, columns: Sequence[str], rows: List[tuple]) -> List[tuple]:
+        """
+        Collapse rows that share the upsert key within one batch; PostgreSQL
+        rejects ``ON CONFLICT DO UPDATE`` that affects the same row twice.
+        Runs after coercion so "1,234" and "1234" count as the same key.
+        """
+        if not self.upsert_keys or self.upsert_dedup == "none" or len(rows) < 2:
+            return rows
+        try:
+            key_idx = [columns.index(k) for k in self.upsert_keys]
+        except ValueError:
+            return rows
 
+        unique: Dict[tuple, tuple] = {}
+        try:
+            if self.upsert_dedup == "first":
+                for row in rows:
+                    unique.setdefault(tuple(row[i] for i in key_idx), row)
+            else:
+                for row in rows:
+                    unique[tuple(row[i] for i in key_idx)] = row
+        except TypeError:
+            # 不可哈希的键值（如 JSON 列）交给数据库处理
+            return rows
+
+        collapsed = len(rows) - len(unique)
+        if not collapsed:
+            return rows
+        self._stat_inc("pg/rows_deduplicated", collapsed)
+        return list(unique.values())
+
+    def _coerce_rows(self, state: _TableState, columns: Sequence[str], rows: List[tuple]) -> List[tuple]:
+        """
+        Convert values column by column according to the table's column types
+        (numeric/date/timestamp/JSON), so that strings such as "1,234" or
+        "2025-09-01" never reach PostgreSQL as text. Rows with values that
+        cannot be converted go to the dead-letter sink instead of failing the batch.
+        """
+        data = [list(col) for col in zip(*rows)]
+        bad: Dict[int, str] = {}
+        for j, column in enumerate(columns):
+            conv = state.converter(column)
+            values = data[j]
+            for i, v in enumerate(values):
                 try:
+                    values[i] = conv(v)
+                except (ValueError, TypeError, ArithmeticError) as e:
+                    bad.setdefault(i, f"cannot convert column {column!r} ({state.col_types.get(column)}): {v!r}: {e}")
+        converted = list(zip(*data))
+        if not bad:
+            return converted
+
+        self._stat_inc("pg/rows_coerce_failed", len(bad))
+        for i, message in bad.items():
+            self._dead_letter(state.name, columns, rows[i], ValueError(message))
+        return [row for i, row in enumerate(converted) if i not in bad]
+
+    def _write_rows(
+        self,
+        conn: psycopg.Connection,
+        table: str,
+        columns: Sequence[str],
+        rows: Sequence[tuple],
+        written: Optional[List[tuple]] = None,
+        settled: Optional[List[tuple]] = None,
+    ) -> None:
+        """
+        Insert ``rows`` in one statement; on failure bisect the batch so that
+        k bad rows cost O(k log n) statements instead of one per row.
+        Rows that fail on their own go to the dead-letter sink; committed
+        rows are appended to ``written``, committed and dead-lettered rows
+        to ``settled``.
+        """
+        self._stat_inc("pg/statements")
+        try:
+            flat_params = []
+            for tup in rows:
+                flat_params.extend(tup)
+            conn.execute(self._build_insert(table, columns, len(rows)), flat_params)
+            conn.commit()
+        except psycopg.Error as e:
+            if conn.broken:
+                # 连接级错误无法靠拆分批次解决
+                raise
+            # 事务已失败，先回滚以解除 "current transaction is aborted"
+            conn.rollback()
+            if isinstance(e, psycopg.errors.QueryCanceled):
+                # 语句超时同样与具体行无关
+                raise
+            self._stat_inc("pg/batch_failures")
+            if len(rows) == 1:
+                self._dead_letter(table, columns, rows[0], e, conn)
+                if settled is not None:
+                    settled.append(rows[0])
+                return
+            self._table_stat(table, "retries")
+            logger.warning(
+                "[PG][BatchInsertError] table=%s rows=%s %s %s: %s; bisecting",
+                table, len(rows), type(e).__name__,
+                getattr(e, "sqlstate", None), str(e).strip(),
+            )
+            mid = len(rows) // 2
+            self._write_rows(conn, table, columns, rows[:mid], written, settled)
+            self._write_rows(conn, table, columns, rows[mid:], written, settled)
+            return
+        self._record_written(table, len(rows))
+        if written is not None:
+            written.extend(rows)
+        if settled is not None:
+            settled.extend(rows)
 
-                    self.cur.execute(single_ins, row)
-
-                    self.conn.commit()
-
-                except Exception as ee:
-
-                    self.conn.rollback()
-
-                    # 打印问题数据和真正错误
-
-                    print("[PG][BadRow]", dict(zip(columns, row)))
-
-                    print("[PG][BadRowError]", type(ee).__name__, getattr(ee, "pgcode", None), getattr(ee, "pgerror", str(ee)))
-
-                    # 抛出让 Scrapy 显示，方便你看到
+    # ---------- Dead-letter sink ----------
 
+    def _dead_letter(
+        self,
+        table: str,
+        columns: Sequence[str],
+        row: tuple,
+        error: Exception,
+        conn: Optional[psycopg.Connection] = None,
+    ) -> None:
+        record = dead_letter_record(self.schema, table, columns, row, error)
+        self._stat_inc("pg/rows_dead_lettered")
+        logger.error(
+            "[PG][BadRow] table=%s pgcode=%s error=%s row=%s",
+            record["table"], record["pgcode"], record["error"], record["row"],
+        )
+        conn = conn or self.conn
+        if self.dead_letter_table and conn is not None:
+            try:
+                self._write_dead_letter_table(conn, record)
+                return
+            except psycopg.Error as e:
+                conn.rollback()
+                logger.error("[PG][DeadLetterError] %s: %s", type(e).__name__, e)
+                if conn.broken:
                     raise
-
+        if self.dead_letter_path:
+            with self._lock:
+                self._write_dead_letter_file(record)
+
+    def _write_dead_letter_table(self, conn: psycopg.Connection, record: Dict[str, Any]) -> None:
+        tbl = self._qualified(self.dead_letter_table)
+        with self._lock:
+            if not self._dead_letter_table_ready:
+                conn.execute(sql.SQL(_DEAD_LETTER_DDL).format(tbl=tbl))
+                conn.commit()
+                self._dead_letter_table_ready = True
+        insert_dead_letter(conn, tbl, record)
+        conn.commit()
+
+    def _write_dead_letter_file(self, record: Dict[str, Any]) -> None:
+        if self._dead_letter_file is None:
+            path = Path(self.dead_letter_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._dead_letter_file = path.open("a", encoding="utf-8")
+        record = dict(record, failed_at=dt.datetime.now(dt.timezone.utc).isoformat())
+        self._dead_letter_file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self._dead_letter_file.flush()
@@ -0,0 +1,81 @@
+# pg_schema_cache.py
+# 说明：
+# - 缓存 PostgresPipeline 需要的表结构（列名 -> data_type），按 DSN / schema / 表名区分。
+# - 进程内字典 + 可选的本地 JSON 文件；每次使用前只查一次 pg_class/pg_attribute 的
+#   版本号（oid、relfilenode、xmin），未变化时不再查询 information_schema 视图。
+# - 数据库不可达时仍可直接返回磁盘缓存的列信息。
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# 进程级缓存：同一进程内多个 spider / 多次 open_spider 共享
+_PROCESS_CACHE: Dict[str, Dict[str, Any]] = {}
+_LOADED_PATHS: set[str] = set()
+
+CATALOG_VERSION_SQL = """
+    SELECT c.oid::bigint AS oid,
+           c.relfilenode::bigint AS relfilenode,
+           c.xmin::text AS class_xmin,
+           (SELECT max(a.xmin::text::bigint) FROM pg_attribute a WHERE a.attrelid = c.oid) AS attr_xmin
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = coalesce(%s, current_schema()) AND c.relname = %s
+"""
+
+
+def schema_cache_key(dsn: str, schema: Optional[str], table: str) -> str:
+    # DSN 里可能带密码，只保存其摘要
+    dsn_digest = hashlib.sha1((dsn or "").encode("utf-8")).hexdigest()[:16]
+    return f"{dsn_digest}/{schema or ''}/{table}"
+
+
+def catalog_version(row: Optional[Dict[str, Any]]) -> Optional[str]:
+    if not row:
+        return None
+    return f"{row['oid']}:{row['relfilenode']}:{row['class_xmin']}:{row['attr_xmin']}"
+
+
+class SchemaCache:
+    """Process-level (and optionally on-disk) cache of table columns and types."""
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = Path(path) if path else None
+        self._dirty = False
+        if self.path is not None and str(self.path) not in _LOADED_PATHS:
+            _LOADED_PATHS.add(str(self.path))
+            self._load()
+
+    def _load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning("[PG][SchemaCache] ignoring unreadable cache %s: %s", self.path, e)
+            return
+        for key, entry in data.items():
+            _PROCESS_CACHE.setdefault(key, entry)
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        return _PROCESS_CACHE.get(key)
+
+    def store(self, key: str, version: str, columns: Dict[str, str]) -> None:
+        _PROCESS_CACHE[key] = {"version": version, "columns": dict(columns)}
+        self._dirty = True
+
+    def save(self) -> None:
+        if self.path is None or not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(_PROCESS_CACHE, ensure_ascii=False, indent=2, sort_keys=True), encoding="utf-8")
+        tmp.replace(self.path)
+        self._dirty = False
@@ -0,0 +1,197 @@
+# pg_spool.py
+# 说明：
+# - PostgreSQL 不可达（open_spider 连接失败或运行中断线）时，PostgresPipeline 把待写批次
+#   追加到本地分段文件（JSONL，安装了 zstandard 时为 .jsonl.zst），爬取不受影响。
+# - 之后用 `scrapy pg_replay` 通过 COPY 批量回灌（带 upsert 键的批次先 COPY 到临时表再合并）。
+# - 正在写入的分段以 .part 结尾，关闭/轮转后才改名，回放只处理已完成的分段。
+
+from __future__ import annotations
+
+import datetime as dt
+import io
+import itertools
+import json
+import logging
+import os
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from psycopg import sql
+from psycopg.types.json import Json
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖：未安装时写普通 JSONL
+    zstandard = None
+
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIXES = (".jsonl", ".jsonl.zst")
+
+_stage_ids = itertools.count(1)
+# 进程内全局递增，同一秒内多个 SpoolWriter 也不会生成同名分段
+_segment_ids = itertools.count(1)
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Json):
+        return value.obj
+    if isinstance(value, (dt.date, dt.datetime, dt.time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return str(value)
+
+
+class SpoolWriter:
+    """Append row batches to rotating local segment files."""
+
+    def __init__(self, directory: str, prefix: str = "pg", compression: str = "zstd", segment_rows: int = 100_000) -> None:
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.compress = compression == "zstd" and zstandard is not None
+        if compression == "zstd" and zstandard is None:
+            logger.warning("[PG][Spool] zstandard not installed, writing plain JSONL segments")
+        self.segment_rows = max(1, segment_rows)
+        self.rows_written = 0
+        self.segments: List[Path] = []
+
+        self._raw = None
+        self._out = None
+        self._path: Optional[Path] = None
+        self._segment_count = 0
+
+    def _open(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = dt.datetime.now().strftime("%Y%m%dT%H%M%S")
+        suffix = ".jsonl.zst" if self.compress else ".jsonl"
+        self._path = self.directory / f"{self.prefix}-{stamp}-{os.getpid()}-{next(_segment_ids):04d}{suffix}"
+        self._raw = open(str(self._path) + ".part", "wb")
+        if self.compress:
+            self._out = zstandard.ZstdCompressor().stream_writer(self._raw, closefd=False)
+        else:
+            self._out = self._raw
+        self._segment_count = 0
+
+    def write_batch(
+        self,
+        schema: Optional[str],
+        table: str,
+        columns: Sequence[str],
+        rows: Sequence[Sequence[Any]],
+        upsert_keys: Optional[Sequence[str]] = None,
+        partition_by: Optional[str] = None,
+        partition_column: Optional[str] = None,
+    ) -> None:
+        if not rows:
+            return
+        if self._out is None:
+            self._open()
+        record = {
+            "schema": schema,
+            "table": table,
+            "columns": list(columns),
+            "upsert_keys": list(upsert_keys or []),
+            "partition_by": partition_by,
+            "partition_column": partition_column,
+            "rows": [list(r) for r in rows],
+        }
+        line = json.dumps(record, ensure_ascii=False, default=_json_default) + "\n"
+        self._out.write(line.encode("utf-8"))
+        self._out.flush()
+        self.rows_written += len(rows)
+        self._segment_count += len(rows)
+        if self._segment_count >= self.segment_rows:
+            self._finish()
+
+    def _finish(self) -> None:
+        if self._out is None:
+            return
+        if self._out is not self._raw:
+            self._out.close()
+        self._raw.close()
+        os.replace(str(self._path) + ".part", self._path)
+        self.segments.append(self._path)
+        self._out = self._raw = None
+
+    def close(self) -> None:
+        self._finish()
+
+
+def iter_segments(directory: str) -> List[Path]:
+    """Completed segment files in ``directory``, oldest first."""
+    root = Path(directory)
+    if not root.is_dir():
+        return []
+    return sorted(p for p in root.iterdir() if p.is_file() and p.name.endswith(SEGMENT_SUFFIXES))
+
+
+def read_segment(path: Path) -> Iterator[Dict[str, Any]]:
+    with path.open("rb") as raw:
+        if path.name.endswith(".zst"):
+            if zstandard is None:
+                raise RuntimeError(f"zstandard is required to read {path}")
+            stream = io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw), encoding="utf-8")
+        else:
+            stream = io.TextIOWrapper(raw, encoding="utf-8")
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _qualified(schema: Optional[str], table: str) -> sql.Composable:
+    return (
+        sql.SQL("{}.{}").format(sql.Identifier(schema), sql.Identifier(table))
+        if schema else sql.Identifier(table)
+    )
+
+
+def copy_rows(
+    cur,
+    schema: Optional[str],
+    table: str,
+    columns: Sequence[str],
+    rows: Sequence[Sequence[Any]],
+    upsert_keys: Optional[Sequence[str]] = None,
+) -> int:
+    """
+    Bulk-load ``rows`` with COPY. With ``upsert_keys`` the rows are copied to
+    a temporary staging table and merged with ``INSERT ... ON CONFLICT``.
+    The caller owns the transaction.
+    """
+    if not rows:
+        return 0
+    tbl = _qualified(schema, table)
+    cols = sql.SQL(", ").join(sql.Identifier(c) for c in columns)
+    target = tbl
+    if upsert_keys:
+        target = sql.Identifier(f"_pg_stage_{next(_stage_ids)}")
+        cur.execute(
+            sql.SQL("CREATE TEMP TABLE {stage} (LIKE {tbl} INCLUDING DEFAULTS) ON COMMIT DROP").format(
+                stage=target, tbl=tbl,
+            )
+        )
+
+    with cur.copy(sql.SQL("COPY {tbl} ({cols}) FROM STDIN").format(tbl=target, cols=cols)) as copy:
+        for row in rows:
+            copy.write_row([Json(v) if isinstance(v, (list, dict)) else v for v in row])
+
+    if upsert_keys:
+        updates = [c for c in columns if c not in upsert_keys]
+        merge = sql.SQL("INSERT INTO {tbl} ({cols}) SELECT {cols} FROM {stage} ON CONFLICT ({keys}) ").format(
+            tbl=tbl, cols=cols, stage=target,
+            keys=sql.SQL(", ").join(sql.Identifier(k) for k in upsert_keys),
+        )
+        if updates:
+            merge = sql.Composed([merge, sql.SQL("DO UPDATE SET {}").format(
+                sql.SQL(", ").join(
+                    sql.SQL("{} = EXCLUDED.{}").format(sql.Identifier(c), sql.Identifier(c)) for c in updates
+                )
+            )])
+        else:
+            merge = sql.Composed([merge, sql.SQL("DO NOTHING")])
+        cur.execute(merge)
+    return len(rows)
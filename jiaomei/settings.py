@@ -28,6 +28,8 @@ RETRY_TIMES = 2
 RETRY_HTTP_CODES = [403, 429, 503]
 
 DOWNLOADER_MIDDLEWARES = {
+    # 商务部接口翻页提前停止后，丢弃已排队的多余页（对其他请求无影响）
+    "jiaomei.mofcom_pagination.MofcomPagerMiddleware": 50,
     "jiaomei.middlewares.SeleniumCdpMiddleware": 543,
 }
 
@@ -60,3 +62,70 @@ PG_STATIC_FIELDS = {}
 PG_UPSERT_KEYS = []
 PG_CREATE_INDEX_ON_UPSERT_KEYS = False
 PG_BATCH_SIZE = 50
+
+# 批量写入失败时二分定位坏行，坏行写入死信表或 JSONL 文件，爬取继续
+PG_DEAD_LETTER_TABLE = None
+PG_DEAD_LETTER_PATH = "outputs/pg_dead_letter.jsonl"
+# True 时所有待写表在同一个 psycopg pipeline 会话中 executemany，并只提交一次
+PG_PIPELINE_MODE = False
+# 同批次内 upsert 键重复时的合并策略：last / first / none
+PG_UPSERT_DEDUP = "last"
+# 变更检测：按 key（默认 upsert 键）比对行哈希，内容未变的行不再重写
+PG_CHANGE_DETECTION = False
+PG_CHANGE_KEYS = []
+PG_CHANGE_IGNORE_COLUMNS = ["created", "updated"]
+PG_DIGEST_SIDECAR_DIR = None  # 例如 "outputs/pg_digest"，设置后优先从本地文件加载哈希索引
+# 表结构缓存（列名/类型），按 pg_class 版本号校验失效；设为 None 仅使用进程内缓存
+PG_SCHEMA_CACHE_PATH = "outputs/pg_schema_cache.json"
+# 自动建表（PG_USE_EXISTING_TABLE=False）时按日期范围分区：None / "month" / "year"
+PG_PARTITION_BY = None
+PG_PARTITION_COLUMN = "date"
+# 连接超时（秒）；语句超时（毫秒，0 表示不限制），超时的批次会落到本地 spool
+PG_CONNECT_TIMEOUT = 10
+PG_STATEMENT_TIMEOUT_MS = 0
+# PostgreSQL 不可达时把批次写入本地分段文件，之后用 `scrapy pg_replay` 回灌
+PG_SPOOL_ENABLED = False
+PG_SPOOL_DIR = "outputs/pg_spool"
+PG_SPOOL_COMPRESSION = "zstd"  # 未安装 zstandard 时自动退回普通 JSONL
+
+COMMANDS_MODULE = "jiaomei.commands"
+# 并发写入线程数上限（每个线程一条连接，同一张表同时只有一个批次在写）；默认 1 在主线程串行写入，
+# 多表 spider 可用 -s PG_MAX_WRITERS=4 或在 spider 上设置 pg_max_writers 调大
+PG_MAX_WRITERS = 1
+# 每隔多少秒输出一次 PG 写入吞吐（rows/s、缓冲行数、刷新耗时分位数）；0 关闭
+PG_STATS_INTERVAL = 60
+
+# Parquet 导出（jiaomei.arrow_pipeline.ArrowPipeline，需 pyarrow，默认未启用；启用时放在 PG 管道之前）
+ARROW_OUTPUT_DIR = "outputs/parquet"
+ARROW_ROW_GROUP_SIZE = 50000
+ARROW_PARTITION_COLUMN = "date"
+ARROW_COMPRESSION = "zstd"
+ARROW_COLUMN_TYPES = {}  # 例如 {"seqno": "text"}，固定列类型而不按首个值推断
+
+# 本地落库（jiaomei.sqlalchemy_pipeline.SqlAlchemyPipeline，默认未启用）；为空时使用 database.py 的 engine
+SQLALCHEMY_DATABASE_URL = None
+SQLALCHEMY_BATCH_SIZE = 500
+
+# 商务部价格接口翻页：第 1 页返回 maxPageNum 后，每个查询最多同时在途的页请求数（-a page_concurrency 覆盖）
+MOFCOM_PAGE_CONCURRENCY = 4
+# 自适应 pageSize：第 1 页依次尝试比 spider 默认值更大的候选值，按返回行数与 maxPageNum 判断服务端
+# 实际接受的大小，按接口缓存到本地 JSON（过期后重新探测）；-a page_size=N 时固定使用 N，不探测
+MOFCOM_PAGE_SIZE_PROBE = True
+MOFCOM_PAGE_SIZE_CANDIDATES = [500, 200, 100]
+MOFCOM_PAGE_SIZE_CACHE_PATH = "outputs/mofcom_page_size.json"
+MOFCOM_PAGE_SIZE_TTL_DAYS = 7
+# 提前停止（-a early_stop=1/0 覆盖）：接口按日期倒序返回，某一页的行全部已知（本次已见过，或早于库中
+# 已存的最新日期）时不再请求更后面的页，已排队的页被丢弃；行键字段见 spider 的 known_key_fields
+MOFCOM_EARLY_STOP = False
+# 品种目录（jiaomei.mofcom_catalog，由 `scrapy crawl mofcom_catalog` 生成）：开启后目录未过期时按品名检索的
+# spider 把品名解析成 seqno，改走 priceQueryList（-a catalog_resolve=1/0 覆盖）；目录只收录扫描窗口内有报价的
+# 品种，过期、缺失或查不到该品名时照旧走检索接口
+MOFCOM_CATALOG_PATH = "outputs/mofcom_catalog.json"
+MOFCOM_CATALOG_TTL_DAYS = 7
+MOFCOM_CATALOG_RESOLVE = False
+
+# 跨运行去重（jiaomei.dedup_store，spider 传 -a dedup_store=1 或共享名时启用）：行键摘要存本地 SQLite，
+# 前置固定大小的 Bloom 过滤器（位数决定内存占用，约每键 16 位时误判率 < 0.1%）
+DEDUP_STORE_PATH = "outputs/dedup_store.sqlite3"
+DEDUP_STORE_BLOOM_BITS = 1 << 24
+DEDUP_STORE_BLOOM_HASHES = 7
@@ -6,6 +6,9 @@ from datetime import datetime, timezone
 
 import scrapy
 
+from jiaomei.dedup_store import PersistentDedupMixin
+from jiaomei.fast_json import response_json
+
 CAR_FIELD_MAP: Dict[str, str] = {
     "price": "price",
     "date": "date",
@@ -97,7 +100,7 @@ def _coerce_payload(data: Any) -> List[Dict[str, Any]]:
     return []
 
 
-class CarTotalMarketSpider(scrapy.Spider):
+class CarTotalMarketSpider(PersistentDedupMixin, scrapy.Spider):
     name = "car_total_market"
     allowed_domains = ["cpcadata.com", "cpcaauto.com"]
     start_urls = ["http://data.cpcadata.com/TotalMarket"]
@@ -175,8 +178,8 @@ class CarTotalMarketSpider(scrapy.Spider):
 
     def parse_api(self, response, origin: str = "manual"):
         try:
-            data = json.loads(response.text)
-        except json.JSONDecodeError as exc:
+            data = response_json(response)
+        except ValueError as exc:
             self.logger.error("JSON decode error: %s", exc)
             return
         yield from self._handle_payload(data, origin=origin or "api")
@@ -210,6 +213,8 @@ class CarTotalMarketSpider(scrapy.Spider):
         data_list = block.get("dataList") or []
         if not isinstance(data_list, list):
             return
+        # -a dedup_store=1 时同时跨运行去重
+        store = self.persistent_dedup()
         for entry in data_list:
             if not isinstance(entry, dict):
                 continue
@@ -231,6 +236,8 @@ class CarTotalMarketSpider(scrapy.Spider):
                     if unique in self._seen:
                         continue
                     self._seen.add(unique)
+                    if store is not None and not store.add(unique):
+                        continue
                     now = datetime.now(timezone.utc)
                     item = {
                         "category": category,
@@ -155,17 +155,15 @@ class PriceSpiderxx2(scrapy.Spider):
 
 
 
-import json
-from urllib.parse import urlencode
-
-import scrapy
+from jiaomei.spiders.mofcom_base import PRICE_QUERY, MofcomPriceBaseSpider, quotation_item
 
 
-class PriceApiSpider(scrapy.Spider):
+class PriceApiSpider(MofcomPriceBaseSpider):
     name = "price_api"
-    allowed_domains = ["price.mofcom.gov.cn"]
+    # 落地检索页拿 Cookie 后，对 priceQuery 接口分页 POST（均由基类处理）
+    endpoint = PRICE_QUERY
 
-    # 1) 可按需替换检索条件（保持与站内检索一致）
+    # 可按需替换检索条件（保持与站内检索一致）
     pro_name = "焦煤"      # 商品名
     pro_trade = ""         # 交易所
     pro_region = ""        # 市场/地区
@@ -174,178 +172,11 @@ class PriceApiSpider(scrapy.Spider):
     pro_type = ""          # 行业/类型
     page_size = 20         # 每页条数：与你给的 JSON 一致
 
-    # 2) 页面与接口地址
-    search_page_url = (
-        "https://price.mofcom.gov.cn/price_2021/pricequotation/priceSearchdetail.shtml?"
-        + urlencode({
-            "pro_name": pro_name,
-            "pro_trade": pro_trade,
-            "pro_region": pro_region,
-            "startTime": startTime,
-            "endTime": endTime,
-            "pro_type": pro_type,
-        })
-    )
-    api_url = "https://price.mofcom.gov.cn/datamofcom/front/price/pricequotation/priceQuery"
-
     pg_pipeline = {
         "pg_table": "zonal_crawler_coking_coal_price",
         "pg_field_map": PRICE_FIELD_MAP,
         "pg_static_fields": {"source": "coking_coal_api"},
     }
 
-    def start_requests(self):
-        """
-        第一步：先访问一次检索页，拿到站点 Cookie/会话。
-        站点若有 Referer/防盗链校验，这一步能明显提高成功率。
-        """
-        yield scrapy.Request(
-            self.search_page_url,
-            callback=self.after_landing,
-            headers={
-                "Accept-Language": "zh-CN,zh;q=0.9",
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-                "Connection": "keep-alive",
-                "Upgrade-Insecure-Requests": "1",
-            },
-            dont_filter=True,
-        )
-
-    def after_landing(self, response):
-        """
-        第二步：带着上一步的 Cookie，对接口发 Page 1 的 JSON 请求。
-        """
-        yield self.make_api_request(page_number=1)
-
-    def make_api_request(self, page_number: int):
-        form = {
-            "pro_name": self.pro_name,
-            "pro_trade": self.pro_trade,
-            "pro_region": self.pro_region,
-            "startTime": self.startTime,
-            "endTime": self.endTime,
-            "pro_type": self.pro_type,
-            "pageNumber": str(page_number),  # 用字符串更保险
-            "pageSize": str(self.page_size),
-        }
-        return scrapy.FormRequest(
-            url=self.api_url,
-            method="POST",
-            formdata=form,
-            headers={
-                "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
-                "Accept": "application/json, text/plain, */*",
-                "Origin": "https://price.mofcom.gov.cn",
-                "Referer": self.search_page_url,
-            },
-            callback=self.parse_api,
-            meta={"page": page_number},
-            dont_filter=True,  # 同一URL不同页码，仍需允许重复
-        )
-
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._seen_keys = set()        # 去重哨兵：跨页记录唯一键
-        self._max_guard = 2000         # 硬上限，保险丝，避免意外无限循环
-
-    def parse_api(self, response):
-        req_page = int(response.meta.get("page", 1))
-        try:
-            data = json.loads(response.text)
-        except Exception as e:
-            self.logger.error("JSON parse error on page %s: %s", req_page, e)
-            return
-
-        # 读分页字段
-        cur_page = int(data.get("pageNumber") or req_page)
-        next_page = data.get("nextPage")
-        try:
-            next_page = int(next_page) if next_page is not None else None
-        except Exception:
-            next_page = None
-
-        max_pages = data.get("maxPageNum") or data.get("totalPages") or data.get("pages") or 1
-        try:
-            max_pages = int(max_pages)
-            if max_pages <= 0:
-                max_pages = 1
-        except Exception:
-            max_pages = 1
-
-        rows = data.get("rows") or []
-        self.logger.info("page=%s rows=%s max=%s next=%s", cur_page, len(rows), max_pages, next_page)
-
-        # 产出本页
-        for r in rows:
-            yyyy = str(r.get("yyyy") or "").strip()
-            mm = str(r.get("mm") or "").strip().zfill(2)
-            dd = str(r.get("dd") or "").strip().zfill(2)
-            date_str = "-".join([yyyy, mm, dd]) if yyyy and mm and dd else ""
-
-            unique_key = (yyyy, mm, dd, str(r.get("seqno")), str(r.get("price")))
-            self._seen_keys.add(unique_key)
-
-            item = {
-                "商品名称": str(r.get("prod_name") or "").strip(),
-                "交易时间": date_str,
-                "规格": str(r.get("prod_spec") or "").strip(),
-                "单位名称": str(r.get("unit") or "").strip(),
-                "价格": str(r.get("price") or "").replace(",", "").strip(),
-                "_page": cur_page,
-                "_source": "api",
-            }
-            if r.get("seqno") is not None:
-                item["详情链接"] = response.urljoin(
-                    f"/price_2021/pricequotation/pricequotationdetail.shtml?seqno={r['seqno']}"
-                )
-            yield item
-
-        # ==== 停止条件（任一满足即停止派发下一页）====
-        # 1) 空页
-        if not rows:
-            return
-        # 2) 已到最后一页
-        if cur_page >= max_pages:
-            return
-        # 3) 服务端不再推进（有 nextPage 字段且不大于当前页）
-        if isinstance(next_page, int) and next_page <= cur_page:
-            return
-        # 4) 保险丝：超出合理范围（防误循环）
-        if cur_page >= self._max_guard:
-            self.logger.warning("Hit hard guard %s, stopping.", self._max_guard)
-            return
-
-        # 5) 软去重：若下一页返回的全是已见记录（如下实现需要读取下一页后判断；
-        #    若你想做严格去重，可在 parse 下一页时比对并据此停止。这里直接派发下一页。)
-
-        # 派发下一页
-        yield self.make_api_request(page_number=cur_page + 1)
-
-
-    # 备用：如果服务端不接受 JSON POST（返回 415/400），可改用表单：
-    # def make_api_request(self, page_number: int):
-    #     form = {
-    #         "pro_name": self.pro_name,
-    #         "pro_trade": self.pro_trade,
-    #         "pro_region": self.pro_region,
-    #         "startTime": self.startTime,
-    #         "endTime": self.endTime,
-    #         "pro_type": self.pro_type,
-    #         "pageNumber": page_number,
-    #         "pageSize": self.page_size,
-    #     }
-    #     return scrapy.FormRequest(
-    #         url=self.api_url,
-    #         formdata={k: str(v) for k, v in form.items()},
-    #         method="POST",
-    #         headers={
-    #             "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
-    #             "Accept": "application/json, text/plain, */*",
-    #             "Origin": "https://price.mofcom.gov.cn",
-    #             "Referer": self.search_page_url,
-    #         },
-    #         callback=self.parse_api,
-    #         meta={"page": page_number},
-    #         dont_filter=True,
-    #     )
+    def build_item(self, row, page, response):
+        return quotation_item(row, page)
@@ -0,0 +1,580 @@
+# mofcom_base.py
+# 说明：
+# - 商务部价格接口（price.mofcom.gov.cn）API spider 的公共基类：落地页取 Cookie、构造表单、
+#   并发翻页（mofcom_pagination）、行归一化与跨页去重都在这里，子类只声明接口与参数并实现
+#   build_item() 产出各自原有形状的 item。
+# - 两种接口：
+#   1) priceQuery：按 pro_name / pro_trade / pro_region / pro_type 检索，落地页为检索页；
+#   2) priceQueryList：按 seqno 查询单个品种，落地页为详情页。
+# - 自适应 pageSize：第 1 页兼作探测，依次尝试 MOFCOM_PAGE_SIZE_CANDIDATES 中比默认值更大的
+#   pageSize，按返回行数与 maxPageNum 确定服务端实际接受的大小，按接口缓存（PageSizeCache），
+#   其余页都用这个大小；-a page_size=N 时固定使用 N。
+# - 分片回填：-a shard=month|quarter|year 时把起止日期切成自然月 / 季度 / 年的子查询
+#   （mofcom_shards），各自翻页、并发抓取；-a shard_index / shard_count 把子查询分给多个进程。
+# - 提前停止（MOFCOM_EARLY_STOP / -a early_stop=1）：接口按日期倒序返回，某页的行全部已知（本次
+#   已见过，或早于库中已存的最新日期 stored_through）时停止该查询的翻页，已排队的页被丢弃。
+# - 行归一化：每页 rows 经 jiaomei.mofcom_rows.normalize_page() 按列处理一次（日期 / 价格 / 文本
+#   值缓存解析），得到的行与 normalize_row() 完全一致；normalize_row() 保留作单行参考实现。
+# - 品种目录（jiaomei.mofcom_catalog，MOFCOM_CATALOG_RESOLVE 开启时）：priceQuery 按品名检索的 spider 在本地目录未过期时把品名
+#   解析成 seqno，改走 priceQueryList；目录由 `scrapy crawl mofcom_catalog` 生成。
+# - 跨运行去重（-a dedup_store=1 或共享名）：产出过的行键写入 jiaomei.dedup_store，之后的运行不再
+#   产出；提前停止也把这些键视为已知。
+# - 本类没有 name，不会被 Scrapy 当作可运行的 spider 注册。
+
+import datetime as dt
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+
+import scrapy
+
+from jiaomei.dedup_store import PersistentDedupMixin
+from jiaomei.fast_json import price_page
+from jiaomei.mofcom_catalog import DEFAULT_CATALOG_TTL_DAYS, CatalogIndex
+from jiaomei.mofcom_pagination import (
+    DEFAULT_PAGE_SIZE_CANDIDATES,
+    DEFAULT_PAGE_SIZE_TTL_DAYS,
+    MofcomPaginationMixin,
+    PageSizeCache,
+    parse_page_info,
+    to_int,
+)
+from jiaomei.mofcom_rows import PriceColumns, normalize_page
+from jiaomei.mofcom_shards import SHARD_MONTHS, date_shards, select_shards
+from jiaomei.watermark import _truthy
+
+
+PRICE_QUERY = "priceQuery"
+PRICE_QUERY_LIST = "priceQueryList"
+
+API_ROOT = "https://price.mofcom.gov.cn/datamofcom/front/price/pricequotation/"
+SEARCH_PAGE_URL = "https://price.mofcom.gov.cn/price_2021/pricequotation/priceSearchdetail.shtml"
+DETAIL_PAGE_URL = "https://price.mofcom.gov.cn/price_2021/pricequotation/pricequotationdetail.shtml"
+
+# 提前停止判断“行已知”、跨运行去重时默认使用的归一化字段
+DEFAULT_KNOWN_KEY_FIELDS = ("date", "prod_name", "prod_spec", "region", "price")
+
+LANDING_HEADERS = {
+    "Accept-Language": "zh-CN,zh;q=0.9",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+}
+
+
+def detail_url(seqno: Any) -> str:
+    return f"{DETAIL_PAGE_URL}?{urlencode({'seqno': seqno})}"
+
+
+def query_endpoint(params: Dict[str, str]) -> str:
+    """The API endpoint a query's params belong to: priceQueryList when they carry a ``seqno``."""
+    return PRICE_QUERY_LIST if "seqno" in params else PRICE_QUERY
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value.strip()
+    return str(value).strip()
+
+
+def normalize_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalize one API row: ``date`` as ``YYYY-MM-DD`` (empty unless
+    yyyy/mm/dd are all present), ``price`` without thousands separators
+    (empty for a falsy price such as ``0``, as the per-commodity spiders
+    did), stripped text fields and ``seqno`` as text (None when absent).
+    """
+    get = row.get
+    yyyy, mm, dd = _text(get("yyyy")), _text(get("mm")), _text(get("dd"))
+    seqno = get("seqno")
+    return {
+        # 与旧 spider 的差异：缺月 / 日时旧代码会补成 "2024-00-00"（铝为 "00-00"），写库时必然转换失败，这里留空
+        "date": f"{yyyy}-{mm.zfill(2)}-{dd.zfill(2)}" if yyyy and mm and dd else "",
+        "price": _text(get("price") or "").replace(",", ""),
+        "prod_name": _text(get("prod_name")),
+        "prod_spec": _text(get("prod_spec")),
+        "unit": _text(get("unit")),
+        "region": _text(get("region")),
+        "seqno": _text(seqno) if seqno is not None else None,
+    }
+
+
+def quotation_item(row: Dict[str, Any], page: int, source: str = "api") -> Dict[str, Any]:
+    """The 商品名称 / 交易时间 / 规格 / 单位名称 / 价格 / 详情链接 item shared by the priceQuery spiders."""
+    item = {
+        "商品名称": row["prod_name"],
+        "交易时间": row["date"],
+        "规格": row["prod_spec"],
+        "单位名称": row["unit"],
+        "价格": row["price"],
+        "_page": page,
+        "_source": source,
+    }
+    if row["seqno"] is not None:
+        item["详情链接"] = detail_url(row["seqno"])
+    return item
+
+
+class MofcomPriceBaseSpider(MofcomPaginationMixin, PersistentDedupMixin, scrapy.Spider):
+    """
+    Base class for the mofcom price API spiders.
+
+    Subclasses set ``endpoint`` (``priceQuery`` or ``priceQueryList``), the
+    query attributes (``pro_name``... or ``seqno``) and implement
+    ``build_item(row, page, response)`` for rows normalized by
+    :func:`normalize_row`. ``start_attr`` / ``end_attr`` name the attributes
+    holding the date range, so existing ``-a`` arguments keep working.
+    ``dedup_fields`` drops rows whose normalized values were already seen.
+
+    Unless ``page_size`` was passed explicitly (``page_size_pinned``), page 1
+    is first requested with the largest ``MOFCOM_PAGE_SIZE_CANDIDATES`` value
+    and falls back to smaller ones when the server answers with nothing; the
+    size it honors is cached per endpoint and used for the remaining pages.
+
+    ``shard`` (``month`` / ``quarter`` / ``year``) splits the date range into
+    sub-queries paginated independently; ``shard_index`` / ``shard_count``
+    keep only this process's share of them.
+
+    With ``early_stop`` (or ``MOFCOM_EARLY_STOP``) a query stops paginating
+    at the first page whose rows are all known: keyed by
+    ``known_key_fields`` and already seen in this run, or dated before
+    ``stored_through`` (set by the PG watermark).
+
+    ``dedup_store`` keeps the keys of emitted rows (``dedup_fields`` or
+    ``DEFAULT_KNOWN_KEY_FIELDS``) across runs; rows found there are neither
+    emitted again nor treated as unknown by the early stop.
+
+    With ``MOFCOM_CATALOG_RESOLVE`` (or ``-a catalog_resolve=1``),
+    ``priceQuery`` searches by ``pro_name`` are resolved to seqnos through
+    the local catalog (``MOFCOM_CATALOG_PATH``) while it is fresh and then
+    run as ``priceQueryList`` queries, one per seqno; names the catalog
+    does not know are still searched by name.
+    """
+
+    allowed_domains = ["price.mofcom.gov.cn"]
+
+    endpoint = PRICE_QUERY_LIST
+
+    # 查询参数（可用 -a 覆盖）
+    seqno = ""
+    pro_name = ""
+    pro_trade = ""
+    pro_region = ""
+    pro_type = ""
+    startTime = ""
+    endTime = ""
+    start_attr = "startTime"
+    end_attr = "endTime"
+    page_size = 20
+    max_pages = None
+
+    # 分片回填（可用 -a 覆盖）：shard=month|quarter|year，多进程时再加 shard_index / shard_count
+    shard = ""
+    shard_index = 0
+    shard_count = 1
+
+    # 例如 ("date", "price")：按归一化后的这些字段跨页去重
+    dedup_fields: Optional[Sequence[str]] = None
+
+    # 提前停止（-a early_stop=1/0 覆盖 MOFCOM_EARLY_STOP）；行键默认取 dedup_fields 或 DEFAULT_KNOWN_KEY_FIELDS
+    early_stop = None
+    known_key_fields: Optional[Sequence[str]] = None
+
+    # 按品名检索时经本地目录解析成 seqno 走 priceQueryList（-a catalog_resolve=1/0 覆盖 MOFCOM_CATALOG_RESOLVE）
+    catalog_resolve = None
+
+    # 防御性上限，避免异常循环
+    _max_guard = 2000
+
+    def __init__(self, *args, **kwargs):
+        # 与原各 spider 一致：-a 传空值（如 -a pro_name=）不覆盖类上的默认值
+        kwargs = {k: v for k, v in kwargs.items() if v is not None and str(v) != ""}
+        super().__init__(*args, **kwargs)
+        self.page_size = to_int(self.page_size) or type(self).page_size
+        self.max_pages = to_int(self.max_pages)
+        self.shard = str(self.shard or "").strip().lower()
+        if self.shard and self.shard not in SHARD_MONTHS:
+            raise ValueError(f"unknown shard width {self.shard!r}; expected one of: {', '.join(SHARD_MONTHS)}")
+        self.shard_index = to_int(self.shard_index) or 0
+        self.shard_count = to_int(self.shard_count) or 1
+        # 显式传入有效的 page_size 时不做探测
+        self.page_size_pinned = to_int(kwargs.get("page_size")) is not None
+        # 第 1 页探测时尚未尝试的 pageSize（最后一个是 spider 默认值）；None 表示不在探测中
+        self._page_size_probe: Optional[List[int]] = None
+        # 探测中默认 pageSize 已确认有数据：之后的空页说明候选值被拒绝，而不是没有数据
+        self._page_size_confirmed = False
+        # 因上次探测没有数据而跳过了探测；本次第 1 页有数据时清掉该记录，下次运行重新探测
+        self._page_size_after_empty = False
+        # 探测 pageSize 期间暂缓派发的其余分片：[(pager key, params)]
+        self._pending_queries: List[Tuple[str, Dict[str, str]]] = []
+        self._seen_keys = set()
+        self._known_keys = set()
+
+    @property
+    def api_url(self) -> str:
+        return API_ROOT + self.endpoint
+
+    @property
+    def landing_url(self) -> str:
+        # 每次按当前参数生成：水位线会在 open_spider 阶段改写起始日期
+        return self.landing_url_for(self.query_params())
+
+    @property
+    def detail_page_url(self) -> str:
+        return detail_url(self.seqno)
+
+    @property
+    def early_stop_enabled(self) -> bool:
+        if self.early_stop not in (None, ""):
+            return _truthy(self.early_stop)
+        settings = getattr(self, "settings", None)
+        return settings is not None and settings.getbool("MOFCOM_EARLY_STOP", False)
+
+    @property
+    def catalog_resolve_enabled(self) -> bool:
+        if self.catalog_resolve not in (None, ""):
+            return _truthy(self.catalog_resolve)
+        settings = getattr(self, "settings", None)
+        return settings is not None and settings.getbool("MOFCOM_CATALOG_RESOLVE", False)
+
+    # ---------- Query ----------
+
+    def query_params(self) -> Dict[str, str]:
+        start = _text(getattr(self, self.start_attr, ""))
+        end = _text(getattr(self, self.end_attr, ""))
+        if self.endpoint == PRICE_QUERY:
+            return {
+                "pro_name": self.pro_name,
+                "pro_trade": self.pro_trade,
+                "pro_region": self.pro_region,
+                "startTime": start,
+                "endTime": end,
+                "pro_type": self.pro_type,
+            }
+        return {"seqno": str(self.seqno), "startTime": start, "endTime": end}
+
+    def landing_url_for(self, params: Dict[str, str]) -> str:
+        if query_endpoint(params) == PRICE_QUERY:
+            return f"{SEARCH_PAGE_URL}?{urlencode(params)}"
+        return detail_url(params["seqno"])
+
+    # ---------- Requests ----------
+
+    async def start(self):
+        for request in self.start_requests():
+            yield request
+
+    def start_requests(self):
+        # 先落地一次检索页 / 详情页，拿 Cookie；站点有 Referer 校验时能明显提高成功率
+        yield scrapy.Request(
+            self.landing_url,
+            callback=self.after_landing,
+            headers=LANDING_HEADERS,
+            dont_filter=True,
+        )
+
+    def after_landing(self, response):
+        yield from self.start_queries(self)
+
+    def query_shards(self, commodity: "MofcomPriceBaseSpider") -> List[Dict[str, str]]:
+        """``commodity.query_params()``, split by ``self.shard`` into this process's date sub-ranges."""
+        params = commodity.query_params()
+        if not self.shard:
+            return [params]
+        end = params["endTime"] or dt.date.today().isoformat()
+        if not params["startTime"]:
+            self.logger.warning("[Shard] %s has no start date, crawling it as a single query", commodity.name)
+            return [params]
+        try:
+            shards = date_shards(params["startTime"], end, self.shard)
+        except ValueError as e:
+            self.logger.warning("[Shard] %s: %s, crawling it as a single query", commodity.name, e)
+            return [params]
+        mine = select_shards(shards, self.shard_index, self.shard_count)
+        self.logger.info(
+            "[Shard] %s %s..%s by %s: %s shards, %s for shard %s/%s",
+            commodity.name, params["startTime"], end, self.shard, len(shards), len(mine),
+            self.shard_index, self.shard_count,
+        )
+        return [dict(params, startTime=start, endTime=stop) for start, stop in mine]
+
+    def resolve_seqnos(self, commodity: "MofcomPriceBaseSpider") -> List[str]:
+        """Seqnos of ``commodity``'s priceQuery search from the local catalog; [] keeps the search endpoint."""
+        if commodity.endpoint != PRICE_QUERY or not self.catalog_resolve_enabled:
+            return []
+        params = commodity.query_params()
+        if not params["pro_name"] or params["pro_trade"] or params["pro_type"]:
+            # 目录不记录交易所 / 行业，带这些条件时只能走检索接口
+            return []
+        index = self._catalog_index()
+        if not index.fresh:
+            if index.path is not None and len(index):
+                self.logger.info("[Catalog] %s is stale, searching %s by name", index.path, params["pro_name"])
+            return []
+        seqnos = index.seqnos(params["pro_name"], params["pro_region"])
+        if seqnos:
+            self.logger.info("[Catalog] %s %s -> seqno %s", commodity.name, params["pro_name"], ",".join(seqnos))
+            self._stat_inc_pager("mofcom/catalog_resolved")
+        else:
+            self.logger.info("[Catalog] %s %s not in catalog, searching by name", commodity.name, params["pro_name"])
+            self._stat_inc_pager("mofcom/catalog_unresolved")
+        return seqnos
+
+    def _catalog_index(self) -> CatalogIndex:
+        index = self.__dict__.get("_mofcom_catalog")
+        if index is None:
+            settings = getattr(self, "settings", None)
+            path = settings.get("MOFCOM_CATALOG_PATH") if settings is not None else None
+            ttl = settings.getfloat("MOFCOM_CATALOG_TTL_DAYS", DEFAULT_CATALOG_TTL_DAYS) \
+                if settings is not None else DEFAULT_CATALOG_TTL_DAYS
+            index = self.__dict__["_mofcom_catalog"] = CatalogIndex(path, ttl)
+        return index
+
+    def start_queries(self, commodity: "MofcomPriceBaseSpider", key: str = "default"):
+        """Yield the page-1 request of every (sharded, catalog-resolved) query of ``commodity``."""
+        seqnos = self.resolve_seqnos(commodity)
+        self.prepare_page_size(commodity, PRICE_QUERY_LIST if seqnos else commodity.endpoint)
+        self.persistent_dedup(commodity)
+        keyed = []
+        for params in self.query_shards(commodity):
+            query_key = f"{key}:{params['startTime']}" if self.shard else key
+            if not seqnos:
+                keyed.append((query_key, params))
+                continue
+            # 品名对应多个 seqno 时各自成为一个查询
+            for seqno in seqnos:
+                keyed.append((
+                    f"{query_key}:{seqno}" if len(seqnos) > 1 else query_key,
+                    {"seqno": seqno, "startTime": params["startTime"], "endTime": params["endTime"]},
+                ))
+        if commodity._page_size_probe is not None and len(keyed) > 1:
+            # 先用最近的分片探测 pageSize（最可能有数据），确定后再派发其余分片
+            commodity._pending_queries = keyed[:-1]
+            keyed = keyed[-1:]
+        for query_key, params in keyed:
+            yield self._start_query(commodity, params, query_key)
+
+    def _start_query(self, commodity: "MofcomPriceBaseSpider", params: Dict[str, str], key: str):
+        return self.start_pagination(
+            lambda page: self._commodity_request(commodity, params, page),
+            key=key,
+            max_pages=commodity.max_pages,
+        )
+
+    def _release_queries(self, commodity: "MofcomPriceBaseSpider") -> List[scrapy.Request]:
+        pending, commodity._pending_queries = commodity._pending_queries, []
+        return [self._start_query(commodity, params, key) for key, params in pending]
+
+    def _commodity_request(self, commodity: "MofcomPriceBaseSpider", params: Dict[str, str], page: int):
+        return commodity.make_api_request(params, page)
+
+    def make_api_request(self, params: Dict[str, str], page_number: int) -> scrapy.FormRequest:
+        form = dict(params)
+        form["pageNumber"] = str(page_number)
+        form["pageSize"] = str(self.page_size)
+        return scrapy.FormRequest(
+            url=API_ROOT + query_endpoint(params),
+            method="POST",
+            formdata=form,
+            headers={
+                "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
+                "Accept": "application/json, text/plain, */*",
+                "Origin": "https://price.mofcom.gov.cn",
+                "Referer": self.landing_url_for(params),
+            },
+            callback=self.parse_api,
+            meta={"page": page_number, "page_size": self.page_size, "mofcom_query": params},
+            dont_filter=True,
+        )
+
+    # ---------- Parsing ----------
+
+    def parse_api(self, response):
+        req_page = int(response.meta.get("page", 1))
+        try:
+            # 直接解析 body 字节（orjson / msgspec 可用时更快）；rows 为 dict 或 PriceRow 结构体
+            data = price_page(response)
+        except ValueError as e:
+            self.logger.error("JSON parse error on page %s: %s", req_page, e)
+            yield from self.page_failed(response.request)
+            return
+
+        cur_page, next_page, max_pages = parse_page_info(data, req_page)
+        rows = data.get("rows") or []
+        self.logger.debug("page=%s rows=%s max=%s next=%s", cur_page, len(rows), max_pages, next_page)
+
+        commodity = self.commodity_for(response)
+        if req_page == 1 and commodity._page_size_probe is not None:
+            retry = self._settle_page_size(commodity, response, rows, max_pages)
+            if retry is not None:
+                yield retry
+                return
+            yield from self._release_queries(commodity)
+        elif req_page == 1 and rows and commodity._page_size_after_empty:
+            commodity._page_size_after_empty = False
+            params = response.meta.get("mofcom_query")
+            self._page_size_cache().forget(query_endpoint(params) if params else commodity.endpoint)
+
+        # 整页按列归一化一次，提前停止判断与 item 构造共用
+        cols = normalize_page(rows)
+        known = bool(rows) and self.early_stop_enabled and commodity.page_known(cols)
+        for item in commodity.iter_items(cols, cur_page, response):
+            yield self.route_item(item, commodity)
+
+        pager = self.pager_for(response.request)
+        if known and pager is not None:
+            # 倒序返回：后面的页只会更旧，全部已知
+            pager.stop(cur_page, f"all {len(rows)} rows already known")
+            self._stat_inc_pager("mofcom/early_stops")
+
+        # 停止条件（空页 / nextPage 不前进 / maxPageNum / 保险丝）与后续页派发由翻页引擎统一处理
+        yield from self.paginate(response, data, rows)
+
+    # ---------- Page size ----------
+
+    def _page_size_cache(self) -> PageSizeCache:
+        cache = self.__dict__.get("_mofcom_page_size_cache")
+        if cache is None:
+            settings = getattr(self, "settings", None)
+            path = settings.get("MOFCOM_PAGE_SIZE_CACHE_PATH") if settings is not None else None
+            ttl = settings.getfloat("MOFCOM_PAGE_SIZE_TTL_DAYS", DEFAULT_PAGE_SIZE_TTL_DAYS) \
+                if settings is not None else DEFAULT_PAGE_SIZE_TTL_DAYS
+            cache = self.__dict__["_mofcom_page_size_cache"] = PageSizeCache(path, ttl)
+        return cache
+
+    def prepare_page_size(self, commodity: "MofcomPriceBaseSpider", endpoint: Optional[str] = None) -> None:
+        """Pick ``commodity.page_size`` for this crawl: pinned, cached, or probed on page 1."""
+        settings = getattr(self, "settings", None)
+        if commodity.page_size_pinned or (settings is not None and not settings.getbool("MOFCOM_PAGE_SIZE_PROBE", True)):
+            return
+        cache = self._page_size_cache()
+        cached = cache.get(endpoint or commodity.endpoint)
+        if cached:
+            commodity.page_size = cached
+            self.logger.info("[Pager] %s pageSize=%s (cached)", commodity.name, cached)
+            return
+        if cache.empty(endpoint or commodity.endpoint):
+            # 上次探测时没有数据（如增量运行没有新报价）：有效期内不再探测，直接用默认值
+            self.logger.info("[Pager] %s pageSize=%s (last probe found no rows)", commodity.name, commodity.page_size)
+            commodity._page_size_after_empty = True
+            return
+        raw = settings.getlist("MOFCOM_PAGE_SIZE_CANDIDATES", DEFAULT_PAGE_SIZE_CANDIDATES) if settings is not None else DEFAULT_PAGE_SIZE_CANDIDATES
+        larger = sorted({size for size in map(to_int, raw or ()) if size and size > commodity.page_size}, reverse=True)
+        if not larger:
+            return
+        # 从大到小尝试，最后退回 spider 自己的默认值
+        commodity._page_size_probe = larger[1:] + [commodity.page_size]
+        commodity._page_size_confirmed = False
+        commodity.page_size = larger[0]
+
+    def _settle_page_size(self, commodity: "MofcomPriceBaseSpider", response, rows, max_pages: int):
+        """
+        Judge the page-1 probe; return a retry request with another pageSize,
+        or None once settled. An empty page 1 is first re-checked at the
+        spider's default size: still empty means there is nothing to crawl
+        (cached, no further probing); rows there mean the larger size was
+        refused and the remaining candidates are tried.
+        """
+        requested = int(response.meta.get("page_size") or commodity.page_size)
+        probe = commodity._page_size_probe or []
+        default = probe[-1] if probe else requested
+        params = response.meta.get("mofcom_query")
+        endpoint = query_endpoint(params) if params else commodity.endpoint
+
+        if not rows and probe and requested != default and not commodity._page_size_confirmed:
+            return self._retry_page_size(
+                commodity, response.request, f"page 1 empty at pageSize={requested}", size=default,
+            )
+        if not rows and requested == default and not commodity._page_size_confirmed:
+            commodity.page_size = requested
+            commodity._page_size_probe = None
+            self._page_size_cache().put_empty(endpoint)
+            self.logger.info("[Pager] %s no rows at pageSize=%s either, nothing to probe", commodity.name, requested)
+            return None
+        if rows and requested == default and len(probe) > 1:
+            # 默认值有数据而更大的候选值返回空页：服务端拒绝了大 pageSize，继续试其余候选值
+            commodity._page_size_confirmed = True
+            return self._retry_page_size(commodity, response.request, f"page 1 has rows at pageSize={requested}")
+        if not rows and probe:
+            return self._retry_page_size(commodity, response.request, f"page 1 empty at pageSize={requested}")
+
+        # maxPageNum > 1 说明数据没取完：返回行数少于请求值即为服务端上限
+        n = len(rows)
+        size = n if max_pages > 1 and 0 < n < requested else requested
+        commodity.page_size = size
+        commodity._page_size_probe = None
+        if max_pages > 1:
+            self._page_size_cache().put(endpoint, size)
+        self.logger.info(
+            "[Pager] %s pageSize=%s (requested %s, rows=%s, maxPageNum=%s)",
+            commodity.name, size, requested, n, max_pages,
+        )
+        return None
+
+    def _retry_page_size(self, commodity: "MofcomPriceBaseSpider", request, reason: str, size: Optional[int] = None):
+        pager = self.pager_for(request)
+        if pager is None:
+            return None
+        # 第 1 页仍占着翻页窗口的位置，直接换 pageSize 重发；size 为空时取下一个候选值
+        commodity.page_size = size if size is not None else commodity._page_size_probe.pop(0)
+        self.logger.info("[Pager] %s %s, retrying with pageSize=%s", commodity.name, reason, commodity.page_size)
+        self._stat_inc_pager("mofcom/page_size_probes")
+        return pager.make_request(1)
+
+    def page_failed(self, request):
+        # 探测中第 1 页失败（大 pageSize 可能被拒绝）：换下一个候选值重试，而不是放弃整个查询
+        commodity = self.commodity_for(request)
+        if int(request.meta.get("page", 1)) == 1 and commodity._page_size_probe is not None:
+            if commodity._page_size_probe:
+                retry = self._retry_page_size(commodity, request, f"page 1 failed at pageSize={request.meta.get('page_size')}")
+                if retry is not None:
+                    return [retry]
+            commodity._page_size_probe = None
+            return self._release_queries(commodity) + super().page_failed(request)
+        return super().page_failed(request)
+
+    def commodity_for(self, response) -> "MofcomPriceBaseSpider":
+        """The spider whose item shape applies to ``response`` (itself, unless it crawls several commodities)."""
+        return self
+
+    def route_item(self, item: Dict[str, Any], commodity: "MofcomPriceBaseSpider") -> Dict[str, Any]:
+        return item
+
+    def iter_items(self, rows, page: int, response):
+        """Items for a page; ``rows`` are raw API rows or an already normalized :class:`PriceColumns`."""
+        cols = rows if isinstance(rows, PriceColumns) else normalize_page(rows)
+        dedup = self.dedup_fields
+        store = self.persistent_dedup()
+        store_fields = dedup or DEFAULT_KNOWN_KEY_FIELDS
+        for row in cols.rows():
+            item = self.build_item(row, page, response)
+            if item is None:
+                continue
+            if dedup:
+                key = tuple(row[f] for f in dedup)
+                if key in self._seen_keys:
+                    continue
+                self._seen_keys.add(key)
+            if store is not None and not store.add(tuple(row[f] for f in store_fields)):
+                continue
+            yield item
+
+    def page_known(self, rows) -> bool:
+        """True when every row was already seen in this run or predates ``stored_through``."""
+        fields = self.known_key_fields or self.dedup_fields or DEFAULT_KNOWN_KEY_FIELDS
+        stored = getattr(self, "stored_through", None)
+        store = self.persistent_dedup()
+        store_fields = self.dedup_fields or DEFAULT_KNOWN_KEY_FIELDS
+        cols = rows if isinstance(rows, PriceColumns) else normalize_page(rows)
+        known = True
+        for row in cols.rows():
+            key = tuple(row[f] for f in fields)
+            if key not in self._known_keys and not (stored and row["date"] and row["date"] < stored) \
+                    and not (store is not None and tuple(row[f] for f in store_fields) in store):
+                known = False
+            self._known_keys.add(key)
+        return known
+
+    def build_item(self, row: Dict[str, Any], page: int, response) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
@@ -0,0 +1,77 @@
+# mofcom_catalog.py
+# 说明：
+# - 商务部价格品种目录爬虫：用 priceQuery 检索接口、不带品名，翻遍最近 days 天（默认 30）的全部报价，
+#   把出现过的 seqno 与品名 / 规格 / 单位 / 地区写入本地目录索引（jiaomei.mofcom_catalog），
+#   供按品名检索的 spider 解析成 seqno、改走 priceQueryList。
+# - 目录未过期（MOFCOM_CATALOG_TTL_DAYS）时直接结束，可放进定时任务；-a force=1 强制刷新。
+# - 只有完整扫完（没有被 _max_guard / -a max_pages 截断、没有失败页）才刷新构建时间；
+#   不完整的扫描只合并条目，下次运行仍会重新扫描。
+# - -a pro_trade / pro_type 可只刷新某一交易所 / 行业；本爬虫不产出 item。
+#
+# 用法：
+#   scrapy crawl mofcom_catalog
+#   scrapy crawl mofcom_catalog -a days=90 -a force=1
+
+import datetime as dt
+import time
+
+from jiaomei.mofcom_catalog import DEFAULT_CATALOG_DAYS, CatalogIndex
+from jiaomei.mofcom_pagination import to_int
+from jiaomei.spiders.mofcom_base import PRICE_QUERY, MofcomPriceBaseSpider
+from jiaomei.watermark import _truthy
+
+
+class MofcomCatalogSpider(MofcomPriceBaseSpider):
+    name = "mofcom_catalog"
+    endpoint = PRICE_QUERY
+
+    # 目录本身只能走检索接口；也不能因“整页已知”提前停止，否则扫描不完整
+    catalog_resolve = "0"
+    early_stop = "0"
+
+    # 可用 -a 覆盖
+    pro_name = ""
+    days = DEFAULT_CATALOG_DAYS
+    force = ""
+    page_size = 20
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.days = to_int(self.days) or DEFAULT_CATALOG_DAYS
+        if not self.startTime:
+            self.startTime = (dt.date.today() - dt.timedelta(days=self.days)).isoformat()
+        # 本次扫到的条目，正常结束后并入已有目录
+        self._scanned = CatalogIndex()
+
+    async def start(self):
+        index = self._catalog_index()
+        if index.fresh and not _truthy(self.force or "0"):
+            self.logger.info(
+                "[Catalog] %s is fresh (%s series, built %s), nothing to do; -a force=1 to rebuild",
+                index.path, len(index), time.strftime("%Y-%m-%d %H:%M", time.localtime(index.built)),
+            )
+            return
+        async for request in super().start():
+            yield request
+
+    def build_item(self, row, page, response):
+        self._scanned.add(row)
+        return None
+
+    def closed(self, reason):
+        index = self._catalog_index()
+        index.merge(self._scanned)
+        scanned = reason == "finished" and len(self._scanned) > 0
+        complete = scanned and self.pagination_complete()
+        # 中途退出或扫描被截断时只合并条目，不刷新构建时间：下次运行仍会重新扫描
+        index.save(built=time.time() if complete else None)
+        if scanned and not complete:
+            self.logger.warning(
+                "[Catalog] scan since %s was incomplete (page cap or failed pages), index not marked fresh",
+                self.startTime,
+            )
+        self.logger.info(
+            "[Catalog] %s: %s series seen since %s, %s in index (%s)",
+            index.path, len(self._scanned), self.startTime, len(index), reason,
+        )
+        super().closed(reason)
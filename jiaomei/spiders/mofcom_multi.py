@@ -0,0 +1,126 @@
+# mofcom_multi.py
+# 说明：
+# - 一次运行抓取多个商务部价格品种，替代逐个 `scrapy crawl`：
+#     scrapy crawl mofcom_multi -a pro_names=焦煤,铁矿石 -a seqnos=387,289,350
+#   都不传时抓取下方登记的全部品种。
+# - 只落地一次（同一站点共享 Cookie 会话），各品种的翻页在同一个调度器中交错进行，每个品种
+#   各有一个 MOFCOM_PAGE_CONCURRENCY 翻页窗口。
+# - item 形状、去重与增量水位线沿用各品种原来的 spider；每条 item 按该品种自己的 pg_field_map
+#   改名后写入该品种的 `_pg_table` 与静态列（如 source），PG / Parquet / SQLite 管道据此分表。
+#   各品种的字段映射互不影响（如镁没有映射“商品名称”，就不会被铁矿石的映射改名）。
+
+from typing import Any, Dict, List
+
+from jiaomei.pg_pipeline import spider_pg_config
+from jiaomei.spiders.aluminium_price import AluminiumPriceSpider
+from jiaomei.spiders.iron_ore_mofcom import IronOreApiSpider
+from jiaomei.spiders.jiaomei333 import PriceApiSpider
+from jiaomei.spiders.magnesium_mofcom import MagnesiumMofcomSpider
+from jiaomei.spiders.mofcom_base import MofcomPriceBaseSpider
+from jiaomei.spiders.thermal_coal_mofcom import ThermalCoalApiSpider
+from jiaomei.watermark import PgWatermarkMixin
+
+
+# 品名 / seqno → 提供该品种查询参数、item 形状与 pg 表配置的 spider
+COMMODITIES = {
+    "焦煤": PriceApiSpider,
+    "铁矿石": IronOreApiSpider,
+    "动力煤": ThermalCoalApiSpider,
+    "387": ThermalCoalApiSpider,
+    "铝": AluminiumPriceSpider,
+    "289": AluminiumPriceSpider,
+    "镁": MagnesiumMofcomSpider,
+    "350": MagnesiumMofcomSpider,
+}
+
+DEFAULT_COMMODITIES = ("焦煤", "铁矿石", "387", "289", "350")
+
+
+def _split(value: Any) -> List[str]:
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [v.strip() for v in str(value).replace("，", ",").split(",") if v.strip()]
+
+
+class MofcomMultiSpider(MofcomPriceBaseSpider):
+    name = "mofcom_multi"
+
+    # 统一的起止日期参数，传给每个品种各自的日期属性（startTime / start_date / start_time）
+    start_attr = "start_date"
+    end_attr = "end_date"
+    start_date = ""
+    end_date = ""
+
+    def __init__(self, pro_names=None, seqnos=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        keys = _split(pro_names) + _split(seqnos) or list(DEFAULT_COMMODITIES)
+
+        self.commodities: Dict[str, MofcomPriceBaseSpider] = {}
+        for key in keys:
+            spider_cls = COMMODITIES.get(key)
+            if spider_cls is None:
+                raise ValueError(f"unknown mofcom commodity {key!r}; known: {', '.join(COMMODITIES)}")
+            if spider_cls.name in self.commodities:
+                continue
+            commodity = spider_cls()
+            if self.start_date:
+                setattr(commodity, commodity.start_attr, self.start_date)
+            if self.end_date:
+                setattr(commodity, commodity.end_attr, self.end_date)
+            # 以基类校验后的参数为准：-a page_size= 之类的空值不固定 pageSize，也不关闭探测
+            if self.page_size_pinned:
+                commodity.page_size = self.page_size
+                commodity.page_size_pinned = True
+            if kwargs.get("incremental") not in (None, ""):
+                commodity.incremental = kwargs["incremental"]
+            self.commodities[spider_cls.name] = commodity
+
+        # 品种名 → (表名, 字段映射, 静态列)，在 route_item 中逐条应用；spider 级别不再配置映射
+        self._routes: Dict[str, tuple] = {}
+        for name, commodity in self.commodities.items():
+            config = spider_pg_config(commodity, ("pg_table", "pg_field_map", "pg_static_fields"))
+            self._routes[name] = (
+                config.get("pg_table") or name,
+                dict(config.get("pg_field_map") or {}),
+                dict(config.get("pg_static_fields") or {}),
+            )
+        self.pg_pipeline = {}
+
+    @property
+    def landing_url(self) -> str:
+        return next(iter(self.commodities.values())).landing_url
+
+    def pg_watermark(self, pipeline):
+        for name, commodity in self.commodities.items():
+            if isinstance(commodity, PgWatermarkMixin):
+                # 品种 spider 没有绑定 crawler，提前停止开关由本 spider 决定
+                commodity.early_stop = self.early_stop_enabled
+                table, _, static_fields = self._routes[name]
+                commodity.pg_watermark(pipeline, table=table, filters=static_fields)
+
+    def after_landing(self, response):
+        for name, commodity in self.commodities.items():
+            yield from self.start_queries(commodity, key=name)
+
+    def _commodity_request(self, commodity: MofcomPriceBaseSpider, params: Dict[str, str], page: int):
+        request = commodity.make_api_request(params, page)
+        request.meta["mofcom_commodity"] = commodity.name
+        return request.replace(callback=self.parse_api)
+
+    def commodity_for(self, response) -> MofcomPriceBaseSpider:
+        return self.commodities[response.meta["mofcom_commodity"]]
+
+    def route_item(self, item, commodity):
+        """Rename ``item`` with the commodity's own field map and tag it with its table and static fields."""
+        table, field_map, static_fields = self._routes[commodity.name]
+        # 与管道对单个 spider 的处理一致：后出现的键覆盖先出现的键，静态列优先
+        routed = {}
+        for key, value in item.items():
+            col = field_map.get(key, key)
+            if col not in static_fields:
+                routed[col] = value
+        routed.update(static_fields)
+        routed["_pg_table"] = table
+        return routed
@@ -2,15 +2,17 @@
 # 用途：
 # - 动力煤（seqno=387）的两种抓取方式：
 #   1) ThermalCoalPageSpider：打开详情页 + 你的 selenium/xhr 中间件抓 XHR(JSON)。
-#   2) ThermalCoalApiSpider：直连 priceQueryList 接口，自动翻页直到 maxPageNum。
+#   2) ThermalCoalApiSpider：基于 MofcomPriceBaseSpider 直连 priceQueryList 接口，第 1 页拿到 maxPageNum 后并发派发其余页。
 # - 字段：商品名称 / 交易时间 / 规格 / 地区 / 单位名称 / 价格 / 详情链接 / _source / _page
 # - 严格不使用 emoji。
 
-import json
 from urllib.parse import urlencode
 
 import scrapy
 
+from jiaomei.spiders.mofcom_base import PRICE_QUERY_LIST, MofcomPriceBaseSpider
+from jiaomei.watermark import PgWatermarkMixin
+
 
 THERMAL_COAL_PG_FIELD_MAP = {
     "交易时间": "date",
@@ -133,9 +135,9 @@ class ThermalCoalPageSpider(scrapy.Spider):
 # 路线 2：直连 API 自动翻页
 # ---------------------------
 
-class ThermalCoalApiSpider(scrapy.Spider):
+class ThermalCoalApiSpider(PgWatermarkMixin, MofcomPriceBaseSpider):
     name = "thermal_coal_api"
-    allowed_domains = ["price.mofcom.gov.cn"]
+    endpoint = PRICE_QUERY_LIST
 
     pg_pipeline = {
         "pg_table": "zonal_crawler_thermal_coal_price",
@@ -149,120 +151,15 @@ class ThermalCoalApiSpider(scrapy.Spider):
     endTime = ""      # 例："2025-09-12"
     page_size = 15
 
-    api_url = "https://price.mofcom.gov.cn/datamofcom/front/price/pricequotation/priceQueryList"
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        for k in ["seqno", "startTime", "endTime", "page_size"]:
-            if k in kwargs and kwargs[k] is not None and str(kwargs[k]) != "":
-                setattr(self, k, kwargs[k] if k != "page_size" else int(kwargs[k]))
-
-        # 用详情页作 Referer，提升成功率
-        self.detail_page_url = (
-            "https://price.mofcom.gov.cn/price_2021/pricequotation/pricequotationdetail.shtml?"
-            + urlencode({"seqno": self.seqno})
-        )
-
-        # 防御性上限，避免异常循环
-        self._max_guard = 2000
-
-    def start_requests(self):
-        # 先落地一次详情页，拿 Cookie
-        yield scrapy.Request(
-            self.detail_page_url,
-            callback=self.after_landing,
-            headers={
-                "Accept-Language": "zh-CN,zh;q=0.9",
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-                "Connection": "keep-alive",
-                "Upgrade-Insecure-Requests": "1",
-            },
-            dont_filter=True,
-        )
-
-    def after_landing(self, response):
-        yield self._make_api_request(page_number=1)
-
-    def _make_api_request(self, page_number: int):
-        form = {
-            "seqno": str(self.seqno),
-            "startTime": self.startTime,
-            "endTime": self.endTime,
-            "pageNumber": str(page_number),
-            "pageSize": str(self.page_size),
+    def build_item(self, row, page, response):
+        return {
+            "商品名称": row["prod_name"] or "动力煤",
+            "交易时间": row["date"],
+            "规格": row["prod_spec"],
+            "地区": row["region"],
+            "单位名称": row["unit"],
+            "价格": row["price"],
+            "详情链接": self.detail_page_url,
+            "_page": page,
+            "_source": "api",
         }
-        return scrapy.FormRequest(
-            url=self.api_url,
-            method="POST",
-            formdata=form,
-            headers={
-                "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
-                "Accept": "application/json, text/plain, */*",
-                "Origin": "https://price.mofcom.gov.cn",
-                "Referer": self.detail_page_url,
-            },
-            callback=self.parse_api,
-            meta={"page": page_number},
-            dont_filter=True,
-        )
-
-    def parse_api(self, response):
-        req_page = int(response.meta.get("page", 1))
-        try:
-            data = json.loads(response.text)
-        except Exception as e:
-            self.logger.error("JSON parse error on page %s: %s", req_page, e)
-            return
-
-        cur_page = int(data.get("pageNumber") or req_page)
-
-        # 翻页信息
-        next_page = data.get("nextPage")
-        try:
-            next_page = int(next_page) if next_page is not None else None
-        except Exception:
-            next_page = None
-
-        max_pages = data.get("maxPageNum") or data.get("totalPages") or data.get("pages") or 1
-        try:
-            max_pages = int(max_pages)
-            if max_pages <= 0:
-                max_pages = 1
-        except Exception:
-            max_pages = 1
-
-        rows = data.get("rows") or []
-
-        # 产出当前页
-        for r in rows:
-            yyyy = str(r.get("yyyy") or "").strip()
-            mm = str(r.get("mm") or "").strip().zfill(2)
-            dd = str(r.get("dd") or "").strip().zfill(2)
-            date_str = "-".join([yyyy, mm, dd]) if yyyy and mm and dd else ""
-
-            item = {
-                "商品名称": str(r.get("prod_name") or "动力煤").strip(),
-                "交易时间": date_str,
-                "规格": str(r.get("prod_spec") or "").strip(),
-                "地区": str(r.get("region") or "").strip(),
-                "单位名称": str(r.get("unit") or "").strip(),
-                "价格": str(r.get("price") or "").replace(",", "").strip(),
-                "详情链接": self.detail_page_url,
-                "_page": cur_page,
-                "_source": "api",
-            }
-            yield item
-
-        # 停止条件
-        if not rows:
-            return
-        if cur_page >= max_pages:
-            return
-        if isinstance(next_page, int) and next_page <= cur_page:
-            return
-        if cur_page >= self._max_guard:
-            self.logger.warning("Hit hard guard %s, stopping.", self._max_guard)
-            return
-
-        # 下一页
-        yield self._make_api_request(page_number=cur_page + 1)
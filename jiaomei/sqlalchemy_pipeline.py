@@ -0,0 +1,296 @@
+# sqlalchemy_pipeline.py
+# 说明：
+# - 离线 / 边缘节点用的本地落库管道：复用仓库根目录 database.py 的 SQLAlchemy engine
+#   （DATABASE_URL，默认 sqlite:///./checkin.db），无需 PostgreSQL。
+# - 与 PostgresPipeline 共用 pg_pipeline 配置：pg_table / `_pg_table` 路由、pg_field_map、
+#   pg_static_fields、pg_upsert_keys、pg_batch_size。
+# - 每个批次一个事务、一次 executemany；SQLite 下开启 WAL 与 synchronous=NORMAL。
+# - 表不存在时按首行推断列类型自动建表；已存在的表只写入既有列。
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from scrapy.exceptions import NotConfigured
+
+from jiaomei.pg_pipeline import converter_for_type, infer_value_type, spider_pg_config
+
+try:
+    import sqlalchemy as sa
+    from sqlalchemy import event
+    from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+except ImportError:  # 可选依赖
+    sa = None
+
+
+logger = logging.getLogger(__name__)
+
+
+def _sqlite_pragmas(dbapi_conn, connection_record) -> None:
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.close()
+
+
+def _column_type(data_type: Optional[str]):
+    return {
+        "boolean": sa.Boolean,
+        "bigint": sa.BigInteger,
+        "double precision": sa.Float,
+        "date": sa.Date,
+        "timestamp": sa.DateTime,
+        "jsonb": sa.JSON,
+    }.get(data_type or "", sa.Text)
+
+
+def _type_name(column) -> Optional[str]:
+    """Map a reflected SQLAlchemy column type to the converter names used by PostgresPipeline."""
+    t = column.type
+    if isinstance(t, sa.Boolean):
+        return None
+    if isinstance(t, sa.DateTime):
+        return "timestamp"
+    if isinstance(t, sa.Date):
+        return "date"
+    if isinstance(t, sa.Integer):
+        return "bigint"
+    if isinstance(t, sa.Float):
+        return "double precision"
+    if isinstance(t, sa.Numeric):
+        return "numeric"
+    return None
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+class _SqlTable:
+    __slots__ = ("name", "table", "converters", "buffer", "ignored")
+
+    def __init__(self, name: str, table) -> None:
+        self.name = name
+        self.table = table
+        self.converters: Dict[str, Callable[[Any], Any]] = {}
+        for column in table.columns:
+            type_name = _type_name(column)
+            self.converters[column.name] = converter_for_type(type_name) if type_name else _identity
+        self.buffer: List[Dict[str, Any]] = []
+        self.ignored: set[str] = set()
+
+
+class SqlAlchemyPipeline:
+    """
+    Scrapy item pipeline persisting items through ``database.engine``.
+
+    Routing and projection follow PostgresPipeline (``_pg_table``,
+    ``pg_field_map``, ``pg_static_fields``). Rows are buffered per table and
+    written with one ``executemany`` per ``pg_batch_size`` rows inside a
+    transaction; with ``pg_upsert_keys`` the insert becomes
+    ``ON CONFLICT DO UPDATE`` on SQLite/PostgreSQL. Numeric and date strings
+    are converted according to the column types before insert.
+    """
+
+    def __init__(
+        self,
+        engine,
+        table: Optional[str] = None,
+        upsert_keys: Optional[Sequence[str]] = None,
+        batch_size: int = 500,
+        field_map: Optional[Dict[str, str]] = None,
+        static_fields: Optional[Dict[str, Any]] = None,
+        stats=None,
+    ) -> None:
+        self.engine = engine
+        self.table = table
+        self.upsert_keys = list(upsert_keys) if upsert_keys else None
+        self.batch_size = max(1, batch_size)
+        self.field_map = field_map or {}
+        self.static_fields = static_fields or {}
+        self.stats = stats
+
+        self._metadata = sa.MetaData()
+        self._tables: Dict[str, _SqlTable] = {}
+
+        if engine.dialect.name == "sqlite" and not event.contains(engine, "connect", _sqlite_pragmas):
+            event.listen(engine, "connect", _sqlite_pragmas)
+            # 已建立的池连接不会再触发 connect 事件，先回收
+            engine.dispose()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if sa is None:
+            raise NotConfigured("SQLAlchemy is not installed")
+        s = crawler.settings
+        url = s.get("SQLALCHEMY_DATABASE_URL")
+        if url:
+            connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+            engine = sa.create_engine(url, connect_args=connect_args)
+        else:
+            # 仓库根目录的 database.py；scrapy 运行时项目目录已在 sys.path 中
+            try:
+                from database import engine
+            except ImportError as e:
+                raise NotConfigured(f"cannot import database.engine: {e}")
+        return cls(
+            engine=engine,
+            table=s.get("PG_TABLE"),
+            upsert_keys=s.getlist("PG_UPSERT_KEYS") or None,
+            batch_size=s.getint("SQLALCHEMY_BATCH_SIZE", 500),
+            field_map=s.getdict("PG_FIELD_MAP", {}),
+            static_fields=s.getdict("PG_STATIC_FIELDS", {}),
+            stats=crawler.stats,
+        )
+
+    # ---------- Scrapy lifecycle ----------
+
+    def open_spider(self, spider):
+        config = spider_pg_config(
+            spider, ("pg_table", "pg_field_map", "pg_static_fields", "pg_upsert_keys", "pg_batch_size"),
+        )
+        if "pg_table" in config:
+            self.table = config["pg_table"]
+        if "pg_field_map" in config:
+            self.field_map = dict(config["pg_field_map"])
+        if "pg_static_fields" in config:
+            self.static_fields = dict(config["pg_static_fields"])
+        if "pg_upsert_keys" in config:
+            self.upsert_keys = list(config["pg_upsert_keys"]) or None
+        if "pg_batch_size" in config:
+            self.batch_size = max(1, int(config["pg_batch_size"]))
+        self._tables = {}
+
+    def close_spider(self, spider):
+        for state in self._tables.values():
+            self._flush(state)
+
+    def process_item(self, item, spider):
+        data = dict(item) if not isinstance(item, dict) else item
+        if data.get("_pg_skip") or data.get("_pg_skip_pg"):
+            return item
+        target = data.get("_pg_table") or self.table or spider.name
+
+        row: Dict[str, Any] = {}
+        for key, value in data.items():
+            if key.startswith("_pg_"):
+                continue
+            col = self.field_map.get(key, key)
+            if col not in self.static_fields:
+                row[col] = value
+        row.update(self.static_fields)
+
+        state = self._tables.get(target)
+        if state is None:
+            state = self._tables[target] = _SqlTable(target, self._load_or_create_table(target, row))
+        state.buffer.append(row)
+        if len(state.buffer) >= self.batch_size:
+            self._flush(state)
+        return item
+
+    # ---------- Tables ----------
+
+    def _load_or_create_table(self, name: str, sample: Dict[str, Any]):
+        if sa.inspect(self.engine).has_table(name):
+            return sa.Table(name, self._metadata, autoload_with=self.engine)
+
+        columns = [sa.Column(col, _column_type(infer_value_type(value))) for col, value in sample.items()]
+        for key in self.upsert_keys or ():
+            if key not in sample:
+                columns.append(sa.Column(key, sa.Text))
+        table = sa.Table(name, self._metadata, *columns)
+        if self.upsert_keys:
+            # ON CONFLICT 需要冲突键上的唯一索引
+            sa.Index(f"ux_{name}_{'_'.join(self.upsert_keys)}", *(table.c[k] for k in self.upsert_keys), unique=True)
+        table.create(self.engine, checkfirst=True)
+        logger.info("[SQL] created table %s (%s)", name, ", ".join(c.name for c in table.columns))
+        return table
+
+    # ---------- Writes ----------
+
+    def _prepare(self, state: _SqlTable, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Project rows to the table's columns and convert values to the column types."""
+        used = []
+        for row in rows:
+            for col in row:
+                if col in state.converters:
+                    if col not in used:
+                        used.append(col)
+                elif col not in state.ignored:
+                    state.ignored.add(col)
+                    logger.warning("[SQL] table=%s has no column %r, ignoring it", state.name, col)
+
+        prepared = []
+        for row in rows:
+            out = {}
+            try:
+                for col in used:
+                    out[col] = state.converters[col](row.get(col))
+            except (ValueError, TypeError, ArithmeticError) as e:
+                self._stat_inc("sql/rows_failed")
+                logger.error("[SQL][BadRow] table=%s error=%s row=%s", state.name, e, row)
+                continue
+            prepared.append(out)
+        return prepared
+
+    def _insert_statement(self, table, columns: Sequence[str]):
+        dialect = self.engine.dialect.name
+        keys = self.upsert_keys
+        if not keys or dialect not in ("sqlite", "postgresql"):
+            return sa.insert(table)
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table)
+        updates = {c: stmt.excluded[c] for c in columns if c not in keys}
+        if updates:
+            return stmt.on_conflict_do_update(index_elements=keys, set_=updates)
+        return stmt.on_conflict_do_nothing(index_elements=keys)
+
+    def _flush(self, state: _SqlTable) -> None:
+        if not state.buffer:
+            return
+        rows, state.buffer = state.buffer, []
+        rows = self._prepare(state, rows)
+        if not rows:
+            return
+        stmt = self._insert_statement(state.table, list(rows[0]))
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(stmt, rows)
+        except DBAPIError as e:
+            # 约束冲突、类型 / 取值错误（如 PostgreSQL 的 DataError）都只与个别行有关，逐行重试定位坏行；
+            # 连接失效则整批失败
+            if e.connection_invalidated:
+                logger.exception("[SQL] table=%s flush of %s rows failed", state.name, len(rows))
+                raise
+            logger.warning("[SQL][BatchInsertError] table=%s rows=%s: %s; retrying row by row", state.name, len(rows), e.orig)
+            self._stat_inc("sql/batch_failures")
+            self._write_one_by_one(state, stmt, rows)
+            return
+        except SQLAlchemyError:
+            logger.exception("[SQL] table=%s flush of %s rows failed", state.name, len(rows))
+            raise
+        self._stat_inc("sql/rows_written", len(rows))
+
+    def _write_one_by_one(self, state: _SqlTable, stmt, rows: List[Dict[str, Any]]) -> None:
+        with self.engine.begin() as conn:
+            for row in rows:
+                savepoint = conn.begin_nested()
+                try:
+                    conn.execute(stmt, row)
+                except DBAPIError as e:
+                    if e.connection_invalidated:
+                        raise
+                    savepoint.rollback()
+                    self._stat_inc("sql/rows_failed")
+                    logger.error("[SQL][BadRow] table=%s error=%s row=%s", state.name, e.orig, row)
+                    continue
+                savepoint.commit()
+                self._stat_inc("sql/rows_written")
+
+    def _stat_inc(self, key: str, count: int = 1) -> None:
+        if self.stats is not None:
+            self.stats.inc_value(key, count)
@@ -0,0 +1,80 @@
+# test_dedup_store.py
+# 说明：DedupStore 的键跨运行持久化、命名空间隔离，以及 Bloom 过滤器失效时按已存键重建。
+
+from jiaomei.dedup_store import DedupStore, open_store, release_store
+
+
+KEYS = [("2025-09-01", "铁矿石", "青岛"), ("2025-09-02", "铁矿石", "青岛"), ("2025-09-01", "焦煤", "山西")]
+
+
+def _store(tmp_path, namespace="iron", **kwargs):
+    return DedupStore(str(tmp_path / "dedup.sqlite3"), namespace, bloom_bits=1 << 12, **kwargs)
+
+
+def test_keys_survive_a_restart(tmp_path):
+    store = _store(tmp_path)
+    assert [store.add(k) for k in KEYS] == [True, True, True]
+    assert not store.add(KEYS[0])
+    store.close()
+
+    store = _store(tmp_path)
+    assert all(k in store for k in KEYS)
+    assert not store.add(KEYS[1])
+    assert store.add(("2025-09-03", "铁矿石", "青岛"))
+    assert store.added == 1
+    store.close()
+
+
+def test_namespaces_are_isolated(tmp_path):
+    store = _store(tmp_path, "iron")
+    store.add(KEYS[0])
+    store.close()
+
+    other = _store(tmp_path, "coal")
+    assert KEYS[0] not in other
+    assert other.add(KEYS[0])
+    other.close()
+
+
+def test_pending_keys_are_flushed_in_batches(tmp_path):
+    store = _store(tmp_path, flush_every=2)
+    store.add(KEYS[0])
+    assert store._pending
+    store.add(KEYS[1])
+    assert not store._pending
+    # 未正常关闭（过滤器未保存）：下次打开按已存摘要重建，已落盘的键仍然有效
+    store.conn.close()
+
+    store = _store(tmp_path)
+    assert KEYS[0] in store and KEYS[1] in store
+    assert KEYS[2] not in store
+    store.close()
+
+
+def test_changed_bloom_size_rebuilds_from_stored_keys(tmp_path):
+    store = _store(tmp_path)
+    for k in KEYS:
+        store.add(k)
+    store.close()
+
+    bigger = DedupStore(str(tmp_path / "dedup.sqlite3"), "iron", bloom_bits=1 << 16)
+    assert len(bigger._bloom) == (1 << 16) // 8
+    assert all(k in bigger for k in KEYS)
+    bigger.close()
+
+
+def test_open_store_shares_one_instance_until_released(tmp_path):
+    path = str(tmp_path / "dedup.sqlite3")
+    first = open_store(path, "iron", bloom_bits=1 << 12)
+    second = open_store(path, "iron", bloom_bits=1 << 12)
+    assert first is second
+    first.add(KEYS[0])
+    release_store(first)
+    # 仍有引用时只刷盘，不关闭
+    assert KEYS[0] in second
+    release_store(second)
+
+    third = open_store(path, "iron", bloom_bits=1 << 12)
+    assert third is not first
+    assert KEYS[0] in third
+    release_store(third)
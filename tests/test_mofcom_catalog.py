@@ -0,0 +1,87 @@
+# test_mofcom_catalog.py
+# 说明：CatalogIndex 的品名 / 地区解析、按 seqno 合并、落盘与有效期判断。
+
+import time
+
+from jiaomei.mofcom_catalog import CatalogIndex
+
+
+def _row(seqno, name, region, date, spec="", unit="元/吨"):
+    return {"seqno": seqno, "prod_name": name, "region": region, "date": date, "prod_spec": spec, "unit": unit}
+
+
+def _index(path=None, ttl_days=7):
+    index = CatalogIndex(path, ttl_days=ttl_days)
+    for row in [
+        _row("102", "铁矿石(进口)", "天津港", "2025-09-02", "PB粉"),
+        _row("101", "铁矿石", "唐山", "2025-09-01", "62%"),
+        _row("101", "铁矿石", "日照", "2025-09-03", "65%"),
+        _row("103", "焦煤", "山西", "2025-09-01"),
+        _row("", "无编号", "北京", "2025-09-01"),
+    ]:
+        index.add(row)
+    return index
+
+
+def test_resolve_matches_names_by_substring_in_seqno_order():
+    index = _index()
+    assert index.seqnos("铁矿石") == ["101", "102"]
+    assert index.seqnos(" 焦煤 ") == ["103"]
+    assert index.seqnos("铝") == []
+    assert index.seqnos("") == []
+    # 没有 seqno 的行不入目录
+    assert len(index) == 3
+
+
+def test_resolve_filters_by_any_region_the_series_was_quoted_in():
+    index = _index()
+    assert index.seqnos("铁矿石", "唐山") == ["101"]
+    assert index.seqnos("铁矿石", "日照") == ["101"]
+    assert index.seqnos("铁矿石", "天津") == ["102"]
+    assert index.seqnos("铁矿石", "青岛") == []
+
+
+def test_latest_quote_wins_for_spec_and_region():
+    entry = _index().resolve("铁矿石", "唐山")[0]
+    assert entry["region"] == "日照"
+    assert entry["prod_spec"] == "65%"
+    assert entry["regions"] == ["唐山", "日照"]
+    assert entry["specs"] == ["62%", "65%"]
+    assert entry["last_date"] == "2025-09-03"
+
+
+def test_merge_keeps_series_the_new_scan_did_not_see():
+    index = _index()
+    scan = CatalogIndex()
+    scan.add(_row("101", "铁矿石", "青岛", "2025-10-01", "61%"))
+    index.merge(scan)
+    assert index.seqnos("铁矿石", "青岛") == ["101"]
+    assert index.seqnos("焦煤") == ["103"]
+    entry = index.entries["101"]
+    assert entry["region"] == "青岛"
+    assert entry["regions"] == ["唐山", "日照", "青岛"]
+
+
+def test_saved_index_round_trips_and_tracks_freshness(tmp_path):
+    path = tmp_path / "catalog.json"
+    index = _index(path)
+    index.save()
+    # 从未完整构建过：有条目也不算新鲜
+    assert not CatalogIndex(str(path)).fresh
+
+    index.save(built=time.time())
+    loaded = CatalogIndex(str(path))
+    assert loaded.fresh
+    assert loaded.seqnos("铁矿石", "天津") == ["102"]
+
+    loaded.save(built=time.time() - 8 * 86400)
+    assert not CatalogIndex(str(path), ttl_days=7).fresh
+    # ttl_days=0 表示永不过期
+    assert CatalogIndex(str(path), ttl_days=0).fresh
+
+
+def test_unreadable_index_is_ignored(tmp_path):
+    path = tmp_path / "catalog.json"
+    path.write_text("{not json", encoding="utf-8")
+    index = CatalogIndex(str(path))
+    assert len(index) == 0 and not index.fresh
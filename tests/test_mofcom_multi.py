@@ -0,0 +1,64 @@
+# test_mofcom_multi.py
+# 说明：mofcom_multi 按品种各自的 pg_field_map / pg_table / 静态列路由 item，映射不在品种间串用。
+
+from jiaomei.spiders.mofcom_base import normalize_row
+from jiaomei.spiders.mofcom_multi import MofcomMultiSpider
+
+
+ROW = {"yyyy": "2025", "mm": "3", "dd": "7", "price": "1,234.5", "prod_name": "商品",
+       "prod_spec": "规格", "unit": "元/吨", "region": "青岛", "seqno": "350"}
+
+
+def _routed(spider, name):
+    commodity = spider.commodities[name]
+    item = commodity.build_item(normalize_row(ROW), 1, None)
+    return spider.route_item(item, commodity)
+
+
+def test_each_commodity_uses_its_own_field_map():
+    spider = MofcomMultiSpider(pro_names="铁矿石", seqnos="350")
+    magnesium = _routed(spider, "magnesium_mofcom")
+    iron_ore = _routed(spider, "iron_ore_api")
+
+    # 铁矿石把“商品名称”“单位名称”映射为 prod_name / unit
+    assert iron_ore["_pg_table"] == "zonal_crawler_iron_ore_price"
+    assert iron_ore["source"] == "iron_ore_api"
+    assert iron_ore["prod_name"] == "商品"
+    assert iron_ore["unit"] == "元/吨"
+    assert "商品名称" not in iron_ore
+
+    # 镁的映射里没有这两个字段，列名保持不变
+    assert magnesium["_pg_table"] == "zonal_crawler_magnesium_price"
+    assert magnesium["source"] == "magnesium_api"
+    assert magnesium["商品名称"] == "商品"
+    assert magnesium["单位名称"] == "元/吨"
+    assert "prod_name" not in magnesium and "unit" not in magnesium
+    assert magnesium["price"] == "1234.5"
+    assert magnesium["date"] == "2025-03-07"
+
+
+def test_spider_level_field_map_is_empty():
+    spider = MofcomMultiSpider(pro_names="铁矿石", seqnos="350")
+    assert not spider.pg_pipeline.get("pg_field_map")
+
+
+def test_static_fields_win_over_item_values():
+    spider = MofcomMultiSpider(seqnos="350")
+    commodity = spider.commodities["magnesium_mofcom"]
+    routed = spider.route_item({"source": "other", "价格": "1"}, commodity)
+    assert routed == {"source": "magnesium_api", "price": "1", "_pg_table": "zonal_crawler_magnesium_price"}
+
+
+def test_blank_page_size_keeps_probing():
+    spider = MofcomMultiSpider(seqnos="350", page_size="")
+    commodity = spider.commodities["magnesium_mofcom"]
+    assert not spider.page_size_pinned
+    assert not commodity.page_size_pinned
+    assert commodity.page_size == type(commodity)().page_size
+
+
+def test_explicit_page_size_is_pinned_for_every_commodity():
+    spider = MofcomMultiSpider(pro_names="铁矿石", seqnos="350", page_size="50")
+    for commodity in spider.commodities.values():
+        assert commodity.page_size_pinned
+        assert commodity.page_size == 50
@@ -0,0 +1,97 @@
+# test_mofcom_pagination.py
+# 说明：PageFanout 滑动窗口派发与停止条件（空页、页码折回、nextPage 不前进、max_pages、保险丝、失败页）。
+
+from jiaomei.mofcom_pagination import PageFanout
+
+
+def _fanout(**kwargs):
+    # make_request 直接返回页码，便于断言派发顺序
+    return PageFanout(lambda page: page, **kwargs)
+
+
+def _page(page, max_pages, next_page=None):
+    return {"pageNumber": page, "maxPageNum": max_pages, "nextPage": page + 1 if next_page is None else next_page}
+
+
+def _drain(pager, pages, max_pages, rows_for=lambda page: [page]):
+    """Answer every in-flight page in order until nothing is left to schedule."""
+    answered = []
+    queue = list(pages)
+    while queue:
+        page = queue.pop(0)
+        answered.append(page)
+        queue.extend(pager.on_page(page, _page(page, max_pages), rows_for(page)))
+    return answered
+
+
+def test_pages_fan_out_within_the_concurrency_window():
+    pager = _fanout(concurrency=3)
+    assert pager.first_request() == 1
+    assert pager.on_page(1, _page(1, 6), [1]) == [2, 3, 4]
+    assert pager.in_flight == {2, 3, 4}
+    # 每完成一页补派一页
+    assert pager.on_page(3, _page(3, 6), [3]) == [5]
+    assert _drain(pager, [2, 4, 5], 6) == [2, 4, 5, 6]
+    assert pager.finished and pager.complete
+    assert pager.done == {1, 2, 3, 4, 5, 6}
+
+
+def test_empty_page_stops_later_pages():
+    pager = _fanout(concurrency=2)
+    pager.first_request()
+    pager.on_page(1, _page(1, 10), [1])
+    _drain(pager, [2, 3], 10, rows_for=lambda page: [] if page == 3 else [page])
+    assert pager.stop_at == 3
+    assert pager.stop_reason == "empty page"
+    assert pager.cancelled(4) and not pager.cancelled(3)
+    assert pager.finished and pager.complete
+
+
+def test_server_folding_back_or_stalled_next_page_stops():
+    pager = _fanout()
+    pager.first_request()
+    pager.on_page(1, _page(1, 5), [1])
+    pager.on_page(2, {"pageNumber": 1, "maxPageNum": 5}, [1])
+    assert pager.stop_at == 2
+
+    pager = _fanout()
+    pager.first_request()
+    pager.on_page(1, _page(1, 5, next_page=1), [1])
+    assert pager.stop_at == 1
+    assert pager.finished
+
+
+def test_max_pages_caps_the_query_and_is_not_complete():
+    pager = _fanout(max_pages=2)
+    pager.first_request()
+    assert pager.on_page(1, _page(1, 5), [1]) == [2]
+    assert pager.on_page(2, _page(2, 5), [2]) == []
+    assert pager.finished
+    assert not pager.complete
+
+
+def test_max_guard_caps_the_query_and_is_not_complete():
+    pager = _fanout(max_guard=3, concurrency=10)
+    pager.first_request()
+    assert pager.on_page(1, _page(1, 50), [1]) == [2, 3]
+    assert pager.bound == 3
+    assert not pager.complete
+
+
+def test_failed_page_frees_its_slot_but_marks_the_query_incomplete():
+    pager = _fanout(concurrency=1)
+    pager.first_request()
+    assert pager.on_page(1, _page(1, 3), [1]) == [2]
+    assert pager.on_failure(2) == [3]
+    pager.on_page(3, _page(3, 3), [3])
+    assert pager.finished
+    assert pager.failed == {2}
+    assert not pager.complete
+
+
+def test_growing_max_page_num_extends_the_query():
+    pager = _fanout(concurrency=1)
+    pager.first_request()
+    pager.on_page(1, _page(1, 2), [1])
+    assert pager.on_page(2, _page(2, 3), [2]) == [3]
+    assert pager.last_page == 3
@@ -0,0 +1,58 @@
+# test_mofcom_rows.py
+# 说明：商务部接口行归一化与旧版各品种 spider 的行为对照（normalize_row / normalize_page）。
+
+from decimal import Decimal
+
+import pytest
+
+from jiaomei.mofcom_rows import normalize_page
+from jiaomei.spiders.iron_ore_mofcom import IronOreApiSpider
+from jiaomei.spiders.magnesium_mofcom import MagnesiumMofcomSpider
+from jiaomei.spiders.mofcom_base import normalize_row
+
+
+ROWS = [
+    {"yyyy": "2025", "mm": "3", "dd": "7", "price": "1,234.50", "prod_name": " 铁矿石 ",
+     "prod_spec": "62%", "unit": "元/吨", "region": "青岛", "seqno": 301},
+    {"yyyy": 2025, "mm": 12, "dd": 1, "price": 0, "prod_name": "镁", "prod_spec": None,
+     "unit": "元/吨", "region": "", "seqno": "350"},
+    {"yyyy": "2025", "mm": "", "dd": "5", "price": "0", "prod_name": "铝"},
+    {"yyyy": "", "mm": "", "dd": "", "price": None},
+]
+
+
+def test_price_zero_is_empty_like_the_old_spiders():
+    # 旧代码 str(row.get("price") or "")：数值 0 视为无价格，字符串 "0" 保留
+    assert normalize_row({"price": 0})["price"] == ""
+    assert normalize_row({"price": 0.0})["price"] == ""
+    assert normalize_row({"price": "0"})["price"] == "0"
+    assert normalize_row({"price": " 1,234.50 "})["price"] == "1234.50"
+
+
+@pytest.mark.parametrize("yyyy, mm, dd", [("2025", "", "5"), ("2025", "3", ""), ("", "", "")])
+def test_partial_dates_are_empty(yyyy, mm, dd):
+    # 有意的改动：旧代码会生成 "2025-00-05"（铝为 "00-00"）这类无法写库的日期
+    assert normalize_row({"yyyy": yyyy, "mm": mm, "dd": dd})["date"] == ""
+
+
+def test_full_date_is_zero_padded():
+    assert normalize_row({"yyyy": 2025, "mm": 3, "dd": 7})["date"] == "2025-03-07"
+
+
+def test_normalize_page_matches_normalize_row():
+    cols = normalize_page(ROWS)
+    assert list(cols.rows()) == [normalize_row(r) for r in ROWS]
+    assert cols.price == [Decimal("1234.50"), None, Decimal("0"), None]
+    assert cols.seqno == ["301", "350", None, None]
+
+
+def test_empty_arguments_keep_defaults():
+    spider = IronOreApiSpider(pro_name="", startTime="", page_size="")
+    assert spider.pro_name == "铁矿石"
+    assert spider.page_size == 20
+    assert not spider.page_size_pinned
+
+    spider = MagnesiumMofcomSpider(seqno="", page_size="")
+    assert spider.seqno == "350"
+    assert spider.page_size == 50
+    assert not spider.page_size_pinned
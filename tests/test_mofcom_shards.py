@@ -0,0 +1,65 @@
+# test_mofcom_shards.py
+# 说明：date_shards 按自然月 / 季度 / 年切分日期区间，select_shards 按进程轮转分摊子区间。
+
+import datetime as dt
+
+import pytest
+
+from jiaomei.mofcom_shards import date_shards, select_shards
+
+
+def test_month_shards_are_calendar_aligned_and_clipped():
+    assert date_shards("2025-01-15", "2025-03-10", "month") == [
+        ("2025-01-15", "2025-01-31"),
+        ("2025-02-01", "2025-02-28"),
+        ("2025-03-01", "2025-03-10"),
+    ]
+
+
+def test_quarter_and_year_shards_cross_year_boundaries():
+    assert date_shards("2024-11-20", "2025-04-02", "quarter") == [
+        ("2024-11-20", "2024-12-31"),
+        ("2025-01-01", "2025-03-31"),
+        ("2025-04-01", "2025-04-02"),
+    ]
+    assert date_shards(dt.date(2023, 6, 1), dt.datetime(2025, 1, 1, 8), "Year") == [
+        ("2023-06-01", "2023-12-31"),
+        ("2024-01-01", "2024-12-31"),
+        ("2025-01-01", "2025-01-01"),
+    ]
+
+
+def test_shards_cover_the_range_without_gaps_or_overlap():
+    shards = date_shards("2020-02-29", "2025-09-17", "month")
+    assert shards[0][0] == "2020-02-29" and shards[-1][1] == "2025-09-17"
+    for (_, end), (start, _) in zip(shards, shards[1:]):
+        assert dt.date.fromisoformat(start) - dt.date.fromisoformat(end) == dt.timedelta(days=1)
+
+
+def test_single_day_and_reversed_ranges():
+    assert date_shards("2025-05-05", "2025-05-05", "month") == [("2025-05-05", "2025-05-05")]
+    assert date_shards("2025-05-06", "2025-05-05", "month") == []
+
+
+@pytest.mark.parametrize("start, end, width", [
+    ("2025-01-01", "2025-02-01", "week"),
+    ("", "2025-02-01", "month"),
+    ("2025-01-01", None, "month"),
+])
+def test_invalid_arguments(start, end, width):
+    with pytest.raises(ValueError):
+        date_shards(start, end, width)
+
+
+def test_select_shards_round_robin_covers_every_shard_once():
+    shards = date_shards("2025-01-01", "2025-12-31", "month")
+    parts = [select_shards(shards, i, 3) for i in range(3)]
+    assert parts[0] == [shards[0], shards[3], shards[6], shards[9]]
+    assert sorted(s for part in parts for s in part) == sorted(shards)
+    assert select_shards(shards) == shards
+
+
+@pytest.mark.parametrize("index, count", [(3, 3), (-1, 2), (0, 0)])
+def test_select_shards_rejects_bad_index(index, count):
+    with pytest.raises(ValueError):
+        select_shards(["a"], index, count)
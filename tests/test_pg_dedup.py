@@ -0,0 +1,57 @@
+# test_pg_dedup.py
+# 说明：PostgresPipeline._dedup_rows 按冲突键合并同一批次内的重复行（PG_UPSERT_DEDUP）。
+
+from jiaomei.pg_pipeline import PostgresPipeline
+
+
+COLUMNS = ["code", "date", "price"]
+ROWS = [
+    ("a", "2025-09-01", 1),
+    ("b", "2025-09-01", 2),
+    ("a", "2025-09-01", 3),
+    ("a", "2025-09-02", 4),
+]
+
+
+class _Stats(dict):
+    def inc_value(self, key, count=1):
+        self[key] = self.get(key, 0) + count
+
+
+def _pipeline(upsert_keys=("code", "date"), mode="last"):
+    return PostgresPipeline("postgresql://unused", upsert_keys=upsert_keys, upsert_dedup=mode, stats=_Stats())
+
+
+def test_last_row_wins_by_default():
+    pipeline = _pipeline()
+    assert pipeline._dedup_rows(COLUMNS, list(ROWS)) == [
+        ("a", "2025-09-01", 3),
+        ("b", "2025-09-01", 2),
+        ("a", "2025-09-02", 4),
+    ]
+    assert pipeline.stats["pg/rows_deduplicated"] == 1
+
+
+def test_first_row_wins():
+    rows = _pipeline(mode="first")._dedup_rows(COLUMNS, list(ROWS))
+    assert rows[0] == ("a", "2025-09-01", 1)
+    assert len(rows) == 3
+
+
+def test_disabled_without_mode_keys_or_key_columns():
+    assert _pipeline(mode="none")._dedup_rows(COLUMNS, list(ROWS)) == ROWS
+    assert _pipeline(upsert_keys=None)._dedup_rows(COLUMNS, list(ROWS)) == ROWS
+    # 批次里缺少冲突键列时交给数据库处理
+    assert _pipeline(upsert_keys=("seqno",))._dedup_rows(COLUMNS, list(ROWS)) == ROWS
+
+
+def test_unhashable_keys_are_left_to_the_database():
+    rows = [({"k": 1}, "2025-09-01", 1), ({"k": 1}, "2025-09-01", 2)]
+    assert _pipeline()._dedup_rows(COLUMNS, rows) == rows
+
+
+def test_unique_batch_is_returned_unchanged():
+    pipeline = _pipeline()
+    rows = ROWS[:2]
+    assert pipeline._dedup_rows(COLUMNS, rows) is rows
+    assert "pg/rows_deduplicated" not in pipeline.stats
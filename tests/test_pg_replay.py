@@ -0,0 +1,101 @@
+# test_pg_replay.py
+# 说明：pg_replay 回灌前按目标表列类型转换离线落盘的值，坏行经二分定位后进入死信，其余行照常回灌。
+
+import contextlib
+import datetime as dt
+import json
+from decimal import Decimal
+
+import psycopg
+import pytest
+
+from jiaomei.commands import pg_replay
+
+
+class _Conn:
+    broken = False
+
+    def __init__(self):
+        self.commits = 0
+
+    def transaction(self):
+        return contextlib.nullcontext()
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+TYPES = {"code": "text", "price": "numeric", "date": "date"}
+COLUMNS = ["code", "price", "date"]
+
+
+def _replayer(tmp_path):
+    return pg_replay._Replayer(_Conn(), dead_letter_path=str(tmp_path / "dead.jsonl"))
+
+
+def _dead_letters(tmp_path):
+    path = tmp_path / "dead.jsonl"
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_spooled_strings_are_converted_to_column_types(tmp_path):
+    replayer = _replayer(tmp_path)
+    rows = replayer._convert(None, "prices", TYPES, COLUMNS, [
+        ["a", "1,000", "2025-09-01"],
+        ["b", "-", "2025/09/02"],
+        ["c", "abc", "2025-09-03"],
+    ])
+    assert rows == [
+        ["a", Decimal("1000"), dt.date(2025, 9, 1)],
+        ["b", None, dt.date(2025, 9, 2)],
+    ]
+    assert replayer.dead_lettered == 1
+    # 死信文件只在分段提交后写入
+    assert _dead_letters(tmp_path) == []
+    replayer.commit()
+    [record] = _dead_letters(tmp_path)
+    assert record["row"]["code"] == "c"
+    assert "price" in record["error"]
+
+
+def test_rolled_back_segment_leaves_no_dead_letters(tmp_path):
+    replayer = _replayer(tmp_path)
+    replayer._convert(None, "prices", TYPES, COLUMNS, [["c", "abc", "2025-09-03"]])
+    replayer.rollback()
+    replayer.commit()
+    assert _dead_letters(tmp_path) == []
+
+
+def test_rejected_rows_are_bisected_out_of_the_copy(tmp_path, monkeypatch):
+    attempts = []
+
+    def copy_rows(cur, schema, table, columns, rows, upsert_keys=None):
+        attempts.append(len(rows))
+        if any(r[0] in ("k3", "k6") for r in rows):
+            raise psycopg.errors.CheckViolation("violates check constraint")
+        return len(rows)
+
+    monkeypatch.setattr(pg_replay, "copy_rows", copy_rows)
+    replayer = _replayer(tmp_path)
+    rows = [[f"k{i}", i, None] for i in range(8)]
+    assert replayer._copy(None, None, "prices", COLUMNS, rows, None) == 6
+    assert replayer.dead_lettered == 2
+    assert len(attempts) < 2 * len(rows)
+    replayer.commit()
+    assert sorted(r["row"]["code"] for r in _dead_letters(tmp_path)) == ["k3", "k6"]
+
+
+def test_statement_timeout_fails_the_segment(tmp_path, monkeypatch):
+    def copy_rows(*args, **kwargs):
+        raise psycopg.errors.QueryCanceled("canceling statement due to statement timeout")
+
+    monkeypatch.setattr(pg_replay, "copy_rows", copy_rows)
+    replayer = _replayer(tmp_path)
+    with pytest.raises(psycopg.errors.QueryCanceled):
+        replayer._copy(None, None, "prices", COLUMNS, [["k0", 1, None], ["k1", 2, None]], None)
+    assert replayer.dead_lettered == 0
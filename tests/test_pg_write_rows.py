@@ -0,0 +1,93 @@
+# test_pg_write_rows.py
+# 说明：PostgresPipeline._write_rows 写库失败时二分定位坏行、坏行进入死信，其余行照常提交。
+
+import json
+
+import psycopg
+import pytest
+
+from jiaomei.pg_pipeline import PostgresPipeline
+
+
+class _Stats(dict):
+    def inc_value(self, key, count=1):
+        self[key] = self.get(key, 0) + count
+
+
+class _Conn:
+    """Minimal stand-in for a psycopg connection: rejects any statement carrying a bad value."""
+
+    broken = False
+
+    def __init__(self, bad=(), error=psycopg.errors.CheckViolation):
+        self.bad = set(bad)
+        self.error = error
+        self.statements = 0
+        self.committed = []
+        self._pending = []
+
+    def execute(self, query, params=()):
+        self.statements += 1
+        if self.bad.intersection(params):
+            raise self.error("new row violates check constraint")
+        self._pending = list(params)
+
+    def commit(self):
+        self.committed.extend(self._pending)
+        self._pending = []
+
+    def rollback(self):
+        self._pending = []
+
+
+def _pipeline(tmp_path):
+    return PostgresPipeline(
+        "postgresql://unused", table="prices",
+        dead_letter_path=str(tmp_path / "dead.jsonl"), stats=_Stats(),
+    )
+
+
+def _rows(n):
+    return [(f"k{i}", i) for i in range(n)]
+
+
+def test_clean_batch_is_one_statement(tmp_path):
+    pipeline, conn = _pipeline(tmp_path), _Conn()
+    written, settled = [], []
+    pipeline._write_rows(conn, "prices", ["code", "price"], _rows(8), written, settled)
+    assert conn.statements == 1
+    assert written == settled == _rows(8)
+    assert pipeline.stats["pg/prices/rows_flushed"] == 8
+    assert not (tmp_path / "dead.jsonl").exists()
+
+
+def test_bad_rows_are_bisected_into_the_dead_letter_file(tmp_path):
+    pipeline, conn = _pipeline(tmp_path), _Conn(bad={"k2", "k13"})
+    rows = _rows(16)
+    written, settled = [], []
+    pipeline._write_rows(conn, "prices", ["code", "price"], rows, written, settled)
+
+    good = [r for r in rows if r[0] not in ("k2", "k13")]
+    assert sorted(written) == sorted(good)
+    # 死信行也算已处理：断线落 spool 时不会再写一遍
+    assert sorted(settled) == sorted(rows)
+    assert conn.committed == [v for r in written for v in r]
+    # 2 个坏行只需 O(k log n) 条语句，而不是逐行重试
+    assert conn.statements < len(rows)
+
+    records = [json.loads(line) for line in (tmp_path / "dead.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert sorted(r["row"]["code"] for r in records) == ["k13", "k2"]
+    assert {r["pgcode"] for r in records} == {"23514"}
+    assert all(r["table"] == "prices" for r in records)
+    assert pipeline.stats["pg/rows_dead_lettered"] == 2
+    assert pipeline.stats["pg/prices/rows_flushed"] == 14
+
+
+def test_statement_timeout_is_not_bisected(tmp_path):
+    pipeline, conn = _pipeline(tmp_path), _Conn(bad={"k1"}, error=psycopg.errors.QueryCanceled)
+    written = []
+    with pytest.raises(psycopg.errors.QueryCanceled):
+        pipeline._write_rows(conn, "prices", ["code", "price"], _rows(4), written)
+    assert conn.statements == 1
+    assert written == []
+    assert not (tmp_path / "dead.jsonl").exists()